@@ -1,6 +1,55 @@
-from fastapi import FastAPI
+"""
+Mock text-to-SQL model.
+
+By default it answers `SELECT 1;` instantly. For load testing it can be configured through
+environment variables:
+
+    MOCK_LATENCY_MS            mean response latency (default 0)
+    MOCK_LATENCY_DISTRIBUTION  fixed, uniform (0 to 2x the mean) or lognormal (default fixed)
+    MOCK_LATENCY_SIGMA         shape of the lognormal distribution (default 0.5)
+    MOCK_ERROR_RATE            fraction of requests answered with HTTP 500 (default 0)
+    MOCK_ANSWERS_PATH          JSONL of {"database", "query", "sql"}: questions found there are
+                               answered with their SQL, others with `SELECT 1;`
+    MOCK_PERTURB_RATE          fraction of questions answered with a wrong result instead (default 0)
+    MOCK_SEED                  seed of the random choices (default 0)
+
+Which questions are perturbed depends only on the seed and the question, so repeated runs
+expect the same accuracy; latencies and errors are drawn per request.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 
+LATENCY_MS = float(os.environ.get("MOCK_LATENCY_MS", "0"))
+LATENCY_DISTRIBUTION = os.environ.get("MOCK_LATENCY_DISTRIBUTION", "fixed")
+LATENCY_SIGMA = float(os.environ.get("MOCK_LATENCY_SIGMA", "0.5"))
+ERROR_RATE = float(os.environ.get("MOCK_ERROR_RATE", "0"))
+PERTURB_RATE = float(os.environ.get("MOCK_PERTURB_RATE", "0"))
+SEED = os.environ.get("MOCK_SEED", "0")
+
+_random = random.Random(SEED)
+
+
+def _load_answers(path: str | None) -> dict[tuple[str, str], str]:
+    answers = {}
+    if path:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    answers[(item["database"], item["query"])] = item["sql"]
+    return answers
+
+
+ANSWERS = _load_answers(os.environ.get("MOCK_ANSWERS_PATH"))
+
 app = FastAPI()
 
 
@@ -13,6 +62,56 @@ class QueryResponse(BaseModel):
     sql: str
 
 
+class BatchQueryRequest(BaseModel):
+    database: str
+    queries: list[str]
+
+
+class BatchQueryResponse(BaseModel):
+    sql: list[str]
+
+
+def _latency() -> float:
+    if LATENCY_MS <= 0:
+        return 0.0
+    if LATENCY_DISTRIBUTION == "uniform":
+        return _random.uniform(0, 2 * LATENCY_MS) / 1000
+    if LATENCY_DISTRIBUTION == "lognormal":
+        # Scaled so the mean stays LATENCY_MS, with a long tail as sigma grows
+        return _random.lognormvariate(0, LATENCY_SIGMA) * LATENCY_MS / math.exp(LATENCY_SIGMA**2 / 2) / 1000
+    return LATENCY_MS / 1000
+
+
+def _perturbed(database: str, query: str) -> bool:
+    digest = hashlib.blake2b(f"{SEED}\0{database}\0{query}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2**64 < PERTURB_RATE
+
+
+def _answer(database: str, query: str) -> str:
+    sql = ANSWERS.get((database, query))
+    if sql is None:
+        return "SELECT 1;"
+    if _perturbed(database, query):
+        # Same columns, no rows: a wrong result unless the expected result is empty too
+        return f"SELECT * FROM ({sql.rstrip().rstrip(';')}) AS perturbed WHERE false;"
+    return sql
+
+
+async def _respond() -> None:
+    latency = _latency()
+    if latency:
+        await asyncio.sleep(latency)
+    if ERROR_RATE and _random.random() < ERROR_RATE:
+        raise HTTPException(status_code=500, detail="Mock model error")
+
+
 @app.post("/", response_model=QueryResponse)
 async def generate_sql(request: QueryRequest):
-    return QueryResponse(sql="SELECT 1;")
+    await _respond()
+    return QueryResponse(sql=_answer(request.database, request.query))
+
+
+@app.post("/batch", response_model=BatchQueryResponse)
+async def generate_sql_batch(request: BatchQueryRequest):
+    await _respond()
+    return BatchQueryResponse(sql=[_answer(request.database, query) for query in request.queries])
@@ -0,0 +1,514 @@
+"""
+Performance suite of the benchmark harness, run against a local Postgres.
+
+Generates a synthetic dataset (instances, ground truth, metadata and the benchmark databases
+themselves), starts the mock model with a configurable latency distribution, error rate and
+share of wrong answers, then measures:
+
+    benchmark   run_benchmark over the whole dataset: instances/sec, per-phase latency percentiles
+    manual      POST /evaluation/manual: requests/sec and latency percentiles
+    metadata    the /metadata endpoints: requests/sec and latency percentiles per route
+
+Each scenario runs in a fresh process, so its peak RSS is its own memory high-water mark. The
+results and benchmark databases are those of DATABASE_URL and BENCHMARK_DB_URL; the synthetic
+databases are created on the benchmark server and reused while their size does not change.
+
+Usage (with `src` on PYTHONPATH):
+    python scripts/perf_suite.py [--instances N] [--databases N] [--rows N] [--concurrency N]
+        [--latency-ms MS] [--latency-distribution fixed|uniform|lognormal] [--error-rate F]
+        [--perturb-rate F] [--scenarios benchmark,manual,metadata] [-o REPORT.json]
+        [--baseline REPORT.json] [--tolerance F]
+
+With --baseline the suite exits with status 1 when a scenario's throughput dropped, or its peak
+RSS grew, by more than the tolerance.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+_BUCKETS = 1000
+_LABELS = 100
+# Tables described in the synthetic metadata only, so the metadata endpoints serve a realistic size
+_METADATA_TABLES = 40
+_METADATA_COLUMNS = 15
+_METADATA_KB_ITEMS = 50
+
+_SCENARIOS = ("benchmark", "manual", "metadata")
+
+
+# Synthetic dataset
+
+
+def _database_name(index: int) -> str:
+    return f"perf_synth_{index}"
+
+
+def _instance(index: int, databases: int, rows: int) -> tuple[dict[str, Any], dict[str, Any]]:
+    """The dataset record and ground truth of synthetic instance `index`."""
+    instance_id = f"perf_{index}"
+    seed = index * 7919
+    category = ("filter", "aggregate", "join", "top_k")[index % 4]
+    if category == "filter":
+        start = seed % rows
+        question = f"Which items have an id between {start} and {start + 99}?"
+        sql = f"SELECT id, label, value FROM items WHERE id BETWEEN {start} AND {start + 99} ORDER BY id;"
+    elif category == "aggregate":
+        bucket, width = seed % _BUCKETS, 1 + index % 20
+        question = f"How many items of each label are in buckets {bucket} to {bucket + width}, and their average value?"
+        sql = (
+            "SELECT label, count(*) AS items, round(avg(value), 2) AS avg_value FROM items "
+            f"WHERE bucket BETWEEN {bucket} AND {bucket + width} GROUP BY label ORDER BY label;"
+        )
+    elif category == "join":
+        modulus = 2 + index % 49
+        remainder = seed % modulus
+        question = f"What is the total value per group, for buckets whose number mod {modulus} is {remainder}?"
+        sql = (
+            "SELECT g.name, sum(i.value) AS total FROM items i JOIN groups g ON g.bucket = i.bucket "
+            f"WHERE i.bucket % {modulus} = {remainder} GROUP BY g.name ORDER BY g.name;"
+        )
+    else:
+        label, limit = seed % _LABELS, 1 + index % 100
+        question = f"What are the {limit} most valuable items labelled label_{label}?"
+        sql = f"SELECT id, value FROM items WHERE label = 'label_{label}' ORDER BY value DESC, id LIMIT {limit};"
+
+    record = {
+        "instance_id": instance_id,
+        "selected_database": _database_name(index % databases),
+        # The instance id keeps questions unique, since the mock model looks answers up by question
+        "query": f"[{instance_id}] {question}",
+        "category": category,
+    }
+    ground_truth = {
+        "instance_id": instance_id,
+        "sol_sql": [sql],
+        "preprocess_sql": [],
+        "clean_up_sqls": [],
+        "test_cases": [],
+    }
+    return record, ground_truth
+
+
+def _schema_ddl() -> str:
+    ddl = [
+        "CREATE TABLE items (\n    id integer PRIMARY KEY,\n    bucket integer NOT NULL,\n"
+        "    label text NOT NULL,\n    value numeric(12, 2) NOT NULL\n);\n",
+        "CREATE TABLE groups (\n    bucket integer PRIMARY KEY,\n    name text NOT NULL\n);\n",
+    ]
+    for table in range(_METADATA_TABLES):
+        columns = ",\n".join(f"    column_{column} text" for column in range(_METADATA_COLUMNS))
+        ddl.append(f"CREATE TABLE extra_{table} (\n    id integer PRIMARY KEY,\n{columns}\n);\n")
+    return "\n".join(ddl)
+
+
+def _write_metadata(path: Path, database_name: str) -> None:
+    path.mkdir(parents=True, exist_ok=True)
+    (path / f"{database_name}_schema.txt").write_text(_schema_ddl())
+    meanings = {
+        f"{database_name}|items|id": "Item identifier",
+        f"{database_name}|items|bucket": "Bucket the item belongs to, see groups",
+        f"{database_name}|items|label": "One of label_0 to label_99",
+        f"{database_name}|items|value": "Item value",
+        f"{database_name}|groups|bucket": "Bucket number",
+        f"{database_name}|groups|name": "Group of the bucket",
+    }
+    for table in range(_METADATA_TABLES):
+        for column in range(_METADATA_COLUMNS):
+            meanings[f"{database_name}|extra_{table}|column_{column}"] = f"Synthetic column {column} of extra_{table}"
+    (path / f"{database_name}_column_meaning_base.json").write_text(json.dumps(meanings, indent=2))
+    with open(path / f"{database_name}_kb.jsonl", "w") as f:
+        for item_id in range(_METADATA_KB_ITEMS):
+            item = {
+                "id": item_id,
+                "knowledge": f"Synthetic knowledge {item_id}",
+                "description": f"Description of synthetic knowledge {item_id}",
+                "definition": f"Items whose bucket is {item_id} mod {_METADATA_KB_ITEMS}",
+                "type": "calculation_knowledge",
+            }
+            f.write(json.dumps(item) + "\n")
+
+
+def write_dataset(workdir: Path, instances: int, databases: int, rows: int) -> None:
+    """
+    Writes the dataset, ground truth, mock answers and metadata files. Left untouched when they
+    already match, so dataset mtimes (and everything keyed on them) survive repeated runs.
+    """
+    spec = {"instances": instances, "databases": databases, "rows": rows}
+    spec_path = workdir / "spec.json"
+    if spec_path.exists() and json.loads(spec_path.read_text()) == spec:
+        return
+
+    workdir.mkdir(parents=True, exist_ok=True)
+    # Metadata of databases from a previous, larger run would still be listed
+    shutil.rmtree(workdir / "metadata", ignore_errors=True)
+    with (
+        open(workdir / "input.jsonl", "w") as input_file,
+        open(workdir / "gt.jsonl", "w") as gt_file,
+        open(workdir / "answers.jsonl", "w") as answers_file,
+    ):
+        for index in range(instances):
+            record, ground_truth = _instance(index, databases, rows)
+            input_file.write(json.dumps(record) + "\n")
+            gt_file.write(json.dumps(ground_truth) + "\n")
+            database, query, sql = record["selected_database"], record["query"], ground_truth["sol_sql"][0]
+            answers_file.write(json.dumps({"database": database, "query": query, "sql": sql}) + "\n")
+    for index in range(databases):
+        _write_metadata(workdir / "metadata" / _database_name(index), _database_name(index))
+    spec_path.write_text(json.dumps(spec))
+
+
+async def prepare_databases(databases: int, rows: int) -> None:
+    """Creates and fills the synthetic benchmark databases, unless they already hold `rows` items."""
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from db.bench_engines import bench_engines
+
+    server = create_async_engine(bench_engines.url_for("postgres"), isolation_level="AUTOCOMMIT")
+    try:
+        async with server.connect() as conn:
+            existing = set((await conn.execute(text("SELECT datname FROM pg_database"))).scalars())
+            for index in range(databases):
+                if _database_name(index) not in existing:
+                    await conn.execute(text(f'CREATE DATABASE "{_database_name(index)}"'))
+    finally:
+        await server.dispose()
+
+    for index in range(databases):
+        engine = create_async_engine(bench_engines.url_for(_database_name(index)))
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(
+                    text(
+                        "CREATE TABLE IF NOT EXISTS items (id integer PRIMARY KEY, bucket integer NOT NULL, "
+                        "label text NOT NULL, value numeric(12, 2) NOT NULL)"
+                    )
+                )
+                await conn.execute(
+                    text("CREATE TABLE IF NOT EXISTS groups (bucket integer PRIMARY KEY, name text NOT NULL)")
+                )
+                if (await conn.execute(text("SELECT count(*) FROM items"))).scalar_one() == rows:
+                    continue
+                await conn.execute(text("TRUNCATE items, groups"))
+                await conn.execute(
+                    text(
+                        "INSERT INTO items SELECT n, n % :buckets, 'label_' || (n * 31 % :labels), "
+                        "round((n * 7919 % 100000) / 100.0, 2) FROM generate_series(0, :rows - 1) AS n"
+                    ),
+                    {"buckets": _BUCKETS, "labels": _LABELS, "rows": rows},
+                )
+                await conn.execute(
+                    text(
+                        "INSERT INTO groups SELECT n, 'group_' || (n % 37) "
+                        "FROM generate_series(0, :buckets - 1) AS n"
+                    ),
+                    {"buckets": _BUCKETS},
+                )
+                await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_items_bucket ON items (bucket)"))
+                await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_items_label ON items (label)"))
+            async with engine.connect() as conn:
+                await conn.execute(text("ANALYZE"))
+        finally:
+            await engine.dispose()
+
+
+# Mock model
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def start_mock_model(args: argparse.Namespace, answers_path: Path) -> tuple[subprocess.Popen[bytes], str]:
+    port = _free_port()
+    env = {
+        **os.environ,
+        "MOCK_LATENCY_MS": str(args.latency_ms),
+        "MOCK_LATENCY_DISTRIBUTION": args.latency_distribution,
+        "MOCK_ERROR_RATE": str(args.error_rate),
+        "MOCK_PERTURB_RATE": str(args.perturb_rate),
+        "MOCK_ANSWERS_PATH": str(answers_path),
+        "MOCK_SEED": str(args.seed),
+    }
+    app_dir = Path(__file__).resolve().parent.parent / "ai_mock"
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(app_dir)]
+    process = subprocess.Popen([*command, "--port", str(port), "--log-level", "warning"], env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The mock model exited during startup")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process, f"http://127.0.0.1:{port}/"
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("The mock model did not start within 30s")
+
+
+# Scenarios (each runs in its own process)
+
+
+def _percentiles(values: list[float]) -> dict[str, float | None]:
+    if len(values) < 2:
+        value = values[0] if values else None
+        return {"p50": value, "p95": value, "p99": value}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": round(cuts[49], 3), "p95": round(cuts[94], 3), "p99": round(cuts[98], 3)}
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+async def _benchmark(endpoint_url: str, concurrency: int, batch_size: int | None) -> dict[str, Any]:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from db.bench_engines import bench_engines
+    from db.session import engine, init_db
+    from models.schemas import BenchmarkCreate
+    from services.benchmark_service import create_job, get_job_with_results, run_benchmark
+    from services.instances import sync_instances
+
+    await init_db()
+    async_session = async_sessionmaker(engine, expire_on_commit=False)
+    try:
+        async with async_session() as session:
+            # Measured apart: it runs once per process and dataset version, not once per job
+            start = time.perf_counter()
+            await sync_instances(session)
+            sync_seconds = time.perf_counter() - start
+            options = BenchmarkCreate(endpoint_url=endpoint_url, concurrency=concurrency, batch_size=batch_size)
+            job = await create_job(session, endpoint_url, options)
+
+        start = time.perf_counter()
+        await run_benchmark(job.id, endpoint_url, options)
+        seconds = time.perf_counter() - start
+
+        async with async_session() as session:
+            detail = await get_job_with_results(session, job.id, percentiles=True)
+        assert detail is not None
+        stats = detail.stats
+        return {
+            "job_id": str(job.id),
+            "status": detail.status,
+            "instances": stats.total,
+            "seconds": round(seconds, 3),
+            "instances_per_second": round(stats.total / seconds, 2) if seconds else None,
+            "accuracy": stats.accuracy_score,
+            "instance_sync_seconds": round(sync_seconds, 3),
+            "model_latency_ms": stats.latency_percentiles.model_dump() if stats.latency_percentiles else None,
+            "phase_latency_ms": {
+                phase: percentiles.model_dump() for phase, percentiles in (stats.phase_latency_ms or {}).items()
+            },
+        }
+    finally:
+        await bench_engines.dispose_all()
+        await engine.dispose()
+
+
+async def _run_requests(
+    requests: list[tuple[str, Callable[[], Awaitable[Any]]]], concurrency: int
+) -> tuple[float, dict[str, list[float]], int]:
+    """Runs (route, request) pairs with `concurrency` in flight; returns seconds, latencies by route, failures."""
+    latencies: dict[str, list[float]] = defaultdict(list)
+    failures = 0
+    pending: Iterator[tuple[str, Callable[[], Awaitable[Any]]]] = iter(requests)
+
+    async def worker() -> None:
+        nonlocal failures
+        for route, send in pending:
+            start = time.perf_counter()
+            response = await send()
+            latencies[route].append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies, failures
+
+
+def _request_report(seconds: float, latencies: dict[str, list[float]], failures: int) -> dict[str, Any]:
+    count = sum(len(values) for values in latencies.values())
+    return {
+        "requests": count,
+        "failures": failures,
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(count / seconds, 2) if seconds else None,
+        "latency_ms": {route: _percentiles(values) for route, values in latencies.items()},
+    }
+
+
+async def _serve_requests(
+    build: Callable[[Any], list[tuple[str, Callable[[], Awaitable[Any]]]]], concurrency: int
+) -> dict[str, Any]:
+    import httpx
+
+    from main import app
+
+    # ASGITransport does not run the lifespan, so it is entered here
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://perf") as client:
+            return _request_report(*await _run_requests(build(client), concurrency))
+
+
+async def _manual(requests: int, concurrency: int) -> dict[str, Any]:
+    from services.dataset import get_benchmark_data
+
+    items = get_benchmark_data()
+
+    def build(client: Any) -> list[tuple[str, Callable[[], Awaitable[Any]]]]:
+        def send(item: dict[str, Any]) -> Callable[[], Awaitable[Any]]:
+            payload = {"instance_id": item["instance_id"], "generated_sql": item["sol_sql"][0]}
+            return lambda: client.post("/evaluation/manual", json=payload)
+
+        return [("/evaluation/manual", send(items[index % len(items)])) for index in range(requests)]
+
+    return await _serve_requests(build, concurrency)
+
+
+async def _metadata(requests: int, concurrency: int, databases: int) -> dict[str, Any]:
+    routes = [
+        ("/metadata/", lambda db: "/metadata/"),
+        ("/metadata/{database_name}", lambda db: f"/metadata/{db}"),
+        ("/metadata/{database_name}?fields&tables", lambda db: f"/metadata/{db}?fields=schema_ddl&tables=items"),
+        ("/metadata/{database_name}?column_format=columnar", lambda db: f"/metadata/{db}?column_format=columnar"),
+        ("/metadata/{database_name}/tables", lambda db: f"/metadata/{db}/tables"),
+        ("/metadata/{database_name}/knowledge_base/{item_id}", lambda db: f"/metadata/{db}/knowledge_base/1"),
+    ]
+
+    def build(client: Any) -> list[tuple[str, Callable[[], Awaitable[Any]]]]:
+        def send(url: str) -> Callable[[], Awaitable[Any]]:
+            return lambda: client.get(url)
+
+        requests_list = []
+        for index in range(requests):
+            route, url = routes[index % len(routes)]
+            requests_list.append((route, send(url(_database_name(index % databases)))))
+        return requests_list
+
+    return await _serve_requests(build, concurrency)
+
+
+def run_scenario(name: str, args: argparse.Namespace, endpoint_url: str) -> dict[str, Any]:
+    """Process entry point of one scenario."""
+    if name == "benchmark":
+        report = asyncio.run(_benchmark(endpoint_url, args.concurrency, args.batch_size))
+    elif name == "manual":
+        report = asyncio.run(_manual(args.requests, args.concurrency))
+    else:
+        report = asyncio.run(_metadata(args.requests, args.concurrency, args.databases))
+    report["peak_rss_mb"] = _peak_rss_mb()
+    return report
+
+
+# Baseline comparison
+
+
+_THROUGHPUT = {"benchmark": "instances_per_second", "manual": "requests_per_second", "metadata": "requests_per_second"}
+
+
+def regressions(report: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    found = []
+    for name, scenario in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        metric = _THROUGHPUT[name]
+        if previous.get(metric) and scenario[metric] < previous[metric] * (1 - tolerance):
+            found.append(f"{name}: {metric} {scenario[metric]} < baseline {previous[metric]}")
+        if previous.get("peak_rss_mb") and scenario["peak_rss_mb"] > previous["peak_rss_mb"] * (1 + tolerance):
+            found.append(f"{name}: peak_rss_mb {scenario['peak_rss_mb']} > baseline {previous['peak_rss_mb']}")
+    return found
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark harness performance suite")
+    parser.add_argument("--instances", type=int, default=1000, help="Synthetic instances (1k-100k)")
+    parser.add_argument("--databases", type=int, default=4, help="Synthetic benchmark databases")
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows of each synthetic database's items table")
+    parser.add_argument("--workdir", default="data/perf", help="Where the synthetic dataset files are written")
+    parser.add_argument("--scenarios", default=",".join(_SCENARIOS), help="Comma-separated subset of the scenarios")
+    parser.add_argument("--concurrency", type=int, default=8, help="Instances or requests in flight")
+    parser.add_argument("--batch-size", type=int, help="Run the benchmark in batch mode")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests of the manual and metadata scenarios")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean mock model latency")
+    parser.add_argument("--latency-distribution", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of mock model requests failing")
+    parser.add_argument("--perturb-rate", type=float, default=0.1, help="Share of questions answered wrongly")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--memo", action="store_true", help="Keep the candidate memo on (off by default)")
+    parser.add_argument("-o", "--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Report of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression vs the baseline")
+    args = parser.parse_args(argv)
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(_SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    workdir = Path(args.workdir).resolve()
+    write_dataset(workdir, args.instances, args.databases, args.rows)
+    # Set before anything imports config; scenario processes inherit them
+    gt_cache_dir = workdir / "gt_cache"
+    shutil.rmtree(gt_cache_dir, ignore_errors=True)
+    os.environ.update(
+        {
+            "BENCHMARK_INPUT_FILE_PATH": str(workdir / "input.jsonl"),
+            "BENCHMARK_GT_FILE_PATH": str(workdir / "gt.jsonl"),
+            "METADATA_PATH": str(workdir / "metadata"),
+            "GROUND_TRUTH_CACHE_DIR": str(gt_cache_dir),
+            "CANDIDATE_MEMO_ENABLED": str(args.memo).lower(),
+            "JOB_EXECUTION_MODE": "background",
+        }
+    )
+    asyncio.run(prepare_databases(args.databases, args.rows))
+
+    mock, endpoint_url = start_mock_model(args, workdir / "answers.jsonl")
+    report: dict[str, Any] = {"config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")}}
+    report["scenarios"] = {}
+    try:
+        context = multiprocessing.get_context("spawn")
+        for name in scenarios:
+            # A fresh process per scenario, so peak RSS and caches start from scratch
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                report["scenarios"][name] = pool.submit(run_scenario, name, args, endpoint_url).result()
+            print(f"{name}: {json.dumps(report['scenarios'][name])}", file=sys.stderr)
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    if args.baseline:
+        found = regressions(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for regression in found:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,26 @@
+import csv
+import io
+import json
+from collections.abc import AsyncGenerator
+from typing import Any, Literal
 from uuid import UUID
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from config import settings
 from db.session import get_session
-from models.schemas import BenchmarkCreate, JobDetail, JobStatus
+from models.schemas import (
+    BenchmarkCreate,
+    BenchmarkResultPage,
+    BenchmarkResultSchema,
+    JobComparison,
+    JobDetail,
+    JobStatus,
+    LeaderboardEntry,
+    ResultFilter,
+)
 from services import benchmark_service
 
 router = APIRouter(prefix="/benchmark", tags=["benchmark"])
@@ -14,8 +30,36 @@ router = APIRouter(prefix="/benchmark", tags=["benchmark"])
 async def start_benchmark(
     payload: BenchmarkCreate, background_tasks: BackgroundTasks, session: AsyncSession = Depends(get_session)
 ):
-    job = await benchmark_service.create_job(session, payload.endpoint_url)
-    background_tasks.add_task(benchmark_service.run_benchmark, job.id, payload.endpoint_url)
+    queued = settings.JOB_EXECUTION_MODE == "queue"
+    job = await benchmark_service.create_job(session, payload.endpoint_url, payload, queued=queued)
+    if not queued:
+        shards = await benchmark_service.get_shard_jobs(session, job.id)
+        if shards:
+            background_tasks.add_task(benchmark_service.run_shards, shards)
+        else:
+            background_tasks.add_task(benchmark_service.run_benchmark, job.id, payload.endpoint_url, payload)
+    return job
+
+
+@router.post("/{job_id}/resume", response_model=JobStatus)
+async def resume_benchmark(
+    job_id: UUID, background_tasks: BackgroundTasks, session: AsyncSession = Depends(get_session)
+):
+    queued = settings.JOB_EXECUTION_MODE == "queue"
+    try:
+        job = await benchmark_service.prepare_resume(session, job_id, queued=queued)
+    except benchmark_service.JobStateError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not queued:
+        background_tasks.add_task(
+            benchmark_service.run_benchmark,
+            job.id,
+            job.endpoint_url,
+            benchmark_service.job_options(job),
+            resume=True,
+        )
     return job
 
 
@@ -24,9 +68,106 @@ async def list_benchmarks(session: AsyncSession = Depends(get_session)):
     return await benchmark_service.get_all_jobs(session)
 
 
+@router.get("/leaderboard", response_model=list[LeaderboardEntry])
+async def get_leaderboard(limit: int = Query(default=50, ge=1, le=1000), session: AsyncSession = Depends(get_session)):
+    """Completed jobs ranked by accuracy, with their accuracy per database and per category."""
+    return await benchmark_service.get_leaderboard(session, limit)
+
+
+@router.get("/compare", response_model=JobComparison)
+async def compare_benchmarks(
+    job_ids: list[UUID] = Query(min_length=2, description="Jobs to compare, as repeated job_ids parameters"),
+    after: str | None = Query(default=None, description="Cursor returned as next_cursor by the previous page"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    session: AsyncSession = Depends(get_session),
+):
+    comparison = await benchmark_service.compare_jobs(session, job_ids, after=after, limit=limit)
+    if comparison is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return comparison
+
+
 @router.get("/{job_id}", response_model=JobDetail)
-async def get_benchmark_status(job_id: UUID, session: AsyncSession = Depends(get_session)):
-    job = await benchmark_service.get_job_with_results(session, job_id)
+async def get_benchmark_status(
+    job_id: UUID,
+    percentiles: bool = Query(
+        default=False, description="Include p50/p95/p99 of the endpoint latency and of every phase"
+    ),
+    session: AsyncSession = Depends(get_session),
+):
+    job = await benchmark_service.get_job_with_results(session, job_id, percentiles=percentiles)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     return job
+
+
+@router.get("/{job_id}/results", response_model=BenchmarkResultPage)
+async def list_benchmark_results(
+    job_id: UUID,
+    after: int | None = Query(default=None, description="Cursor returned as next_cursor by the previous page"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    filters: ResultFilter = Depends(),
+    session: AsyncSession = Depends(get_session),
+):
+    if not await benchmark_service.get_job(session, job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return await benchmark_service.get_job_results_page(session, job_id, filters, after=after, limit=limit)
+
+
+@router.get("/{job_id}/results/export")
+async def export_benchmark_results(
+    job_id: UUID,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    filters: ResultFilter = Depends(),
+    session: AsyncSession = Depends(get_session),
+):
+    if not await benchmark_service.get_job(session, job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    results = benchmark_service.stream_job_results(job_id, filters)
+    if format == "csv":
+        return StreamingResponse(
+            _csv_lines(results),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{job_id}.csv"'},
+        )
+    return StreamingResponse(_ndjson_lines(results), media_type="application/x-ndjson")
+
+
+@router.get("/{job_id}/events")
+async def stream_benchmark_events(job_id: UUID, session: AsyncSession = Depends(get_session)):
+    """Server-Sent Events with the job's status and running stats, until it completes or fails."""
+    if not await benchmark_service.get_job(session, job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return StreamingResponse(
+        _sse_messages(benchmark_service.stream_job_events(job_id)),
+        media_type="text/event-stream",
+        # Proxies must not buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _sse_messages(events: AsyncGenerator[dict[str, Any] | None]) -> AsyncGenerator[str]:
+    async for event in events:
+        if event is None:
+            yield ": keepalive\n\n"
+        else:
+            yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def _ndjson_lines(results: AsyncGenerator[BenchmarkResultSchema]) -> AsyncGenerator[str]:
+    async for result in results:
+        yield result.model_dump_json() + "\n"
+
+
+async def _csv_lines(results: AsyncGenerator[BenchmarkResultSchema]) -> AsyncGenerator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(BenchmarkResultSchema.model_fields))
+    writer.writeheader()
+    async for result in results:
+        writer.writerow(result.model_dump())
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
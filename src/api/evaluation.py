@@ -1,9 +1,23 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from collections.abc import AsyncGenerator
 
-from services.evaluation import manual_evaluate_query
-from services.evaluation import InstanceNotFoundError, GroundTruthQueryError
-from models.schemas import ManualEvaluationStats
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from models.schemas import (
+    BatchEvaluationItem,
+    BatchEvaluationSummary,
+    EvaluationMode,
+    ManualEvaluationStats,
+    PredictionItem,
+)
+from services.evaluation import (
+    GroundTruthQueryError,
+    HarnessError,
+    InstanceNotFoundError,
+    batch_evaluate,
+    manual_evaluate_query,
+)
 
 router = APIRouter()
 
@@ -11,6 +25,8 @@ router = APIRouter()
 class ManualEvaluationRequest(BaseModel):
     instance_id: str
     generated_sql: str
+    # Defaults to settings.EVALUATION_MODE
+    evaluation_mode: EvaluationMode | None = None
 
 
 @router.post("/evaluation/manual", response_model=ManualEvaluationStats)
@@ -20,12 +36,63 @@ async def manual_evaluate(request: ManualEvaluationRequest):
     """
     try:
         stats = await manual_evaluate_query(
-            instance_id=request.instance_id, generated_sql=request.generated_sql
+            instance_id=request.instance_id,
+            generated_sql=request.generated_sql,
+            evaluation_mode=request.evaluation_mode,
         )
         return stats
     except InstanceNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except GroundTruthQueryError as e:
         raise HTTPException(status_code=500, detail=str(e))
+    except HarnessError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
+
+
+_JSONL_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/x-jsonlines")
+
+
+async def _read_predictions(request: Request) -> list[PredictionItem]:
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type not in _JSONL_CONTENT_TYPES:
+        try:
+            return TypeAdapter(list[PredictionItem]).validate_json(body)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    predictions = []
+    for line_number, line in enumerate(body.decode().splitlines(), start=1):
+        if line.strip():
+            try:
+                predictions.append(PredictionItem.model_validate_json(line))
+            except ValidationError as e:
+                raise HTTPException(status_code=422, detail=f"Line {line_number}: {e}")
+    return predictions
+
+
+@router.post("/evaluation/batch")
+async def batch_evaluate_predictions(
+    request: Request,
+    evaluation_mode: EvaluationMode | None = None,
+    concurrency: int | None = Query(default=None, ge=1),
+):
+    """
+    Evaluates many predictions in one request. The body is either a JSON array of
+    `{"instance_id", "generated_sql"}` objects or the same objects as JSONL
+    (Content-Type: application/x-ndjson). Streams NDJSON: one item per prediction as it is
+    scored (with its `index` in the request), then a summary.
+    """
+    predictions = await _read_predictions(request)
+    return StreamingResponse(
+        _ndjson_lines(batch_evaluate(predictions, evaluation_mode, concurrency)), media_type="application/x-ndjson"
+    )
+
+
+async def _ndjson_lines(
+    results: AsyncGenerator[BatchEvaluationItem | BatchEvaluationSummary],
+) -> AsyncGenerator[str]:
+    async for result in results:
+        yield result.model_dump_json() + "\n"
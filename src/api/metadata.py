@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException
+from typing import Literal
 
-from models.schemas import DatabaseMetadata
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+
+from models.schemas import DatabaseMetadata, DatabaseMetadataProjection, KnowledgeBaseItem
 from services import metadata_service
 
 router = APIRouter(prefix="/metadata", tags=["metadata"])
@@ -11,11 +13,84 @@ async def list_databases():
     return metadata_service.list_databases()
 
 
-@router.get("/{database_name}", response_model=DatabaseMetadata)
-async def get_metadata(database_name: str):
+@router.get("/{database_name}", response_model=DatabaseMetadata | DatabaseMetadataProjection)
+async def get_metadata(
+    database_name: str,
+    fields: list[str] | None = Query(default=None, description="schema_ddl, column_meanings, knowledge_base"),
+    tables: list[str] | None = Query(default=None, description="Restrict DDL and column meanings to these tables"),
+    kb_ids: list[str] | None = Query(default=None, description="Restrict the knowledge base to these ids"),
+    column_format: Literal["rows", "columnar"] = "rows",
+    if_none_match: str | None = Header(default=None),
+):
+    fields = _split_values(fields)
+    tables = _split_values(tables)
+    kb_item_ids = _parse_ids(_split_values(kb_ids), "kb_ids")
+    unknown = [name for name in fields or [] if name not in metadata_service.METADATA_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown fields: {', '.join(unknown)}; expected {', '.join(metadata_service.METADATA_FIELDS)}",
+        )
+    entry: metadata_service.SerializedBody | metadata_service.SerializedMetadata
     try:
-        return metadata_service.get_database_metadata(database_name)
+        if fields or tables or kb_item_ids or column_format == "columnar":
+            entry = metadata_service.get_metadata_projection(
+                database_name, fields=fields, tables=tables, kb_ids=kb_item_ids, columnar=column_format == "columnar"
+            )
+        else:
+            entry = metadata_service.get_serialized_metadata(database_name)
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if if_none_match and _etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+@router.get("/{database_name}/tables", response_model=list[str])
+async def list_tables(database_name: str):
+    try:
+        return metadata_service.list_tables(database_name)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/{database_name}/knowledge_base/{item_id}", response_model=KnowledgeBaseItem)
+async def get_knowledge_item(database_name: str, item_id: int):
+    try:
+        item = metadata_service.get_knowledge_item(database_name, item_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if item is None:
+        raise HTTPException(status_code=404, detail="Knowledge base item not found")
+    return item
+
+
+def _split_values(values: list[str] | None) -> list[str] | None:
+    # Accept both repeated parameters and comma-separated lists
+    if not values:
+        return None
+    return [part.strip() for value in values for part in value.split(",") if part.strip()]
+
+
+def _parse_ids(values: list[str] | None, name: str) -> list[int] | None:
+    if values is None:
+        return None
+    ids, invalid = [], []
+    for value in values:
+        try:
+            ids.append(int(value))
+        except ValueError:
+            invalid.append(value)
+    if invalid:
+        raise HTTPException(status_code=422, detail=f"Invalid {name}: {', '.join(invalid)}; expected integers")
+    return ids
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison, so a W/ prefix is ignored
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
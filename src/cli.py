@@ -0,0 +1,119 @@
+"""
+Command line entry point for maintenance tasks that do not need the HTTP server.
+
+Usage (with `src` on PYTHONPATH):
+    python -m cli warm-gt-cache [--concurrency N]
+    python -m cli evaluate PREDICTIONS.jsonl -o RESULTS.jsonl|RESULTS.parquet [--processes N] [--concurrency N]
+        [--evaluation-mode execution|livesqlbench] [--persist LABEL] [--memo]
+    python -m cli archive JOB_ID -o RESULTS.parquet [--prune]
+"""
+
+import argparse
+import asyncio
+from uuid import UUID
+
+from db.bench_engines import bench_engines
+
+
+async def _warm_gt_cache(concurrency: int) -> None:
+    from services.evaluation import warm_ground_truth_cache
+    from services.ground_truth_cache import gt_cache
+
+    try:
+        cached, failed = await warm_ground_truth_cache(concurrency=concurrency)
+    finally:
+        await bench_engines.dispose_all()
+    print(f"Ground truth cache version {gt_cache.version}: {cached} cached, {failed} failed")
+
+
+def _evaluate(args: argparse.Namespace) -> None:
+    # Imported here so the other commands start fast; nothing here imports the web stack
+    from services.offline_evaluation import (
+        JsonlResultWriter,
+        ParquetResultWriter,
+        evaluate_offline,
+        persist_results,
+        read_predictions,
+        summarize,
+    )
+
+    output_format = args.format or ("parquet" if args.output.endswith(".parquet") else "jsonl")
+    writer = ParquetResultWriter(args.output) if output_format == "parquet" else JsonlResultWriter(args.output)
+    predictions = read_predictions(args.predictions)
+
+    items = []
+    try:
+        # The memo is stored in the results database, which a plain file evaluation does not need
+        memo = args.memo or bool(args.persist)
+        for database_items in evaluate_offline(
+            predictions, args.evaluation_mode, args.processes, args.concurrency, memo
+        ):
+            writer.write(database_items)
+            items.extend(database_items)
+    finally:
+        writer.close()
+
+    print(summarize(items).model_dump_json(indent=2))
+    if args.persist:
+        job_id = asyncio.run(persist_results(items, predictions, args.persist))
+        print(f"Stored as job {job_id}")
+
+
+async def _archive(job_id: UUID, output: str, prune: bool) -> None:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from db.session import engine
+    from services.archive import archive_job
+
+    async_session = async_sessionmaker(engine, expire_on_commit=False)
+    try:
+        async with async_session() as session:
+            archived = await archive_job(session, job_id, output, prune=prune)
+    finally:
+        await engine.dispose()
+    print(f"Archived {archived} results of job {job_id} to {output}{' and pruned them' if prune else ''}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="cli", description="T2SQL benchmark maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    warm = subparsers.add_parser("warm-gt-cache", help="Precompute ground-truth results for the current dataset")
+    warm.add_argument("--concurrency", type=int, default=4)
+
+    evaluate = subparsers.add_parser(
+        "evaluate", help="Evaluate a predictions JSONL without the server, one process per benchmark database"
+    )
+    evaluate.add_argument("predictions", help="JSONL file of {instance_id, generated_sql} objects")
+    evaluate.add_argument("-o", "--output", required=True, help="Results file (.jsonl or .parquet)")
+    evaluate.add_argument("--format", choices=["jsonl", "parquet"], help="Defaults to the output file extension")
+    evaluate.add_argument("--processes", type=int, help="Worker processes (default: one per database, up to CPUs)")
+    evaluate.add_argument("--concurrency", type=int, default=4, help="Predictions in flight per process")
+    evaluate.add_argument("--evaluation-mode", choices=["execution", "livesqlbench"])
+    evaluate.add_argument(
+        "--persist", metavar="LABEL", help="Also store the results as a completed job with LABEL as endpoint_url"
+    )
+    evaluate.add_argument(
+        "--memo",
+        action="store_true",
+        help="Reuse and record candidate outcomes in the results database's memo (implied by --persist)",
+    )
+
+    archive = subparsers.add_parser("archive", help="Write a completed job's results to a Parquet file")
+    archive.add_argument("job_id", type=UUID)
+    archive.add_argument("-o", "--output", required=True)
+    archive.add_argument(
+        "--prune", action="store_true", help="Delete the archived results; stats and leaderboard entries are kept"
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "warm-gt-cache":
+        asyncio.run(_warm_gt_cache(args.concurrency))
+    elif args.command == "evaluate":
+        _evaluate(args)
+    elif args.command == "archive":
+        asyncio.run(_archive(args.job_id, args.output, args.prune))
+
+
+if __name__ == "__main__":
+    main()
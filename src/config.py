@@ -1,3 +1,4 @@
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -7,8 +8,103 @@ class Settings(BaseSettings):
     BENCHMARK_INPUT_FILE_PATH: str = "data/livesqlbench-base-full-v1/livesqlbench_data.jsonl"
     BENCHMARK_GT_FILE_PATH: str = "data/livesqlbench_base_full_v1_gt_kg_testcases_0904.jsonl"
     METADATA_PATH: str = "data/livesqlbench-base-full-v1"
+    METADATA_WARMUP_ON_STARTUP: bool = True
+
+    # Pooled connections to the benchmark databases (one engine per database)
+    BENCHMARK_DB_POOL_SIZE: int = 5
+    BENCHMARK_DB_MAX_OVERFLOW: int = 5
+    BENCHMARK_DB_POOL_IDLE_TIMEOUT: float = 300.0
+    BENCHMARK_DB_MAX_CONNECTIONS: int = 50
+
+    # Sandbox for benchmark queries: read-only transaction with these limits (empty = server default).
+    # The client cancels a query QUERY_CANCEL_GRACE seconds after the statement timeout
+    # if the server has not done so already.
+    QUERY_STATEMENT_TIMEOUT_MS: int | None = 30_000
+    QUERY_WORK_MEM: str | None = "64MB"
+    QUERY_MAX_ROWS: int = 100_000
+    QUERY_CANCEL_GRACE: float = 5.0
+    # Queries give up on a lock held by another evaluation (a write-mode instance) after this long
+    QUERY_LOCK_TIMEOUT_MS: int | None = 5_000
+
+    # Ground-truth result cache (in-memory LRU spilled to disk; empty dir disables spilling)
+    GROUND_TRUTH_CACHE_MAX_ENTRIES: int = 2048
+    GROUND_TRUTH_CACHE_DIR: str = "data/.gt_cache"
+    GROUND_TRUTH_CACHE_VERSION: str | None = None
+    # Dumps the benchmark databases are restored from; part of the derived cache version
+    BENCHMARK_DB_DUMP_PATH: str = "data/bird-interact-full-dumps"
+
+    # Maintain a BenchmarkJobSummary row per job, incremented as results land
+    BENCHMARK_JOB_SUMMARY_ENABLED: bool = True
+
+    # Results are written in batches of this size, or at least every flush interval (seconds)
+    BENCHMARK_RESULT_BATCH_SIZE: int = 50
+    BENCHMARK_RESULT_FLUSH_INTERVAL: float = 2.0
+
+    # Rows fetched per round trip when exporting job results
+    RESULT_EXPORT_BATCH_SIZE: int = 500
+
+    # Result comparison: numbers are equal if they round to the same value at this many decimals
+    # (values straddling a rounding boundary differ, however close they are); results larger than
+    # COMPARISON_MAX_ROWS are compared inside Postgres with EXCEPT ALL instead of being streamed,
+    # which only works up to QUERY_MAX_ROWS, so COMPARISON_MAX_ROWS must stay below it
+    COMPARISON_FLOAT_PLACES: int = 6
+    COMPARISON_MAX_ROWS: int = 10_000
+
+    # "background" runs jobs inside the API process; "queue" leaves them for `python -m worker`
+    JOB_EXECUTION_MODE: str = "background"
+    WORKER_POLL_INTERVAL: float = 2.0
+    WORKER_HEARTBEAT_INTERVAL: float = 10.0
+    # Running jobs whose worker has not heartbeated for this long are taken over by another worker
+    WORKER_STALE_AFTER: float = 60.0
+
+    # Model endpoint client; per-job overrides are accepted in BenchmarkCreate
+    MODEL_REQUEST_TIMEOUT: float = 60.0
+    MODEL_CONNECT_TIMEOUT: float = 10.0
+    MODEL_MAX_RETRIES: int = 3
+    MODEL_RETRY_BACKOFF_BASE: float = 0.5
+    MODEL_RETRY_BACKOFF_MAX: float = 30.0
+    MODEL_RATE_LIMIT_PER_SECOND: float | None = None
+    MODEL_RATE_LIMIT_BURST: int = 1
+    MODEL_HTTP2: bool = False
+    MODEL_MAX_CONNECTIONS: int = 100
+    MODEL_MAX_KEEPALIVE_CONNECTIONS: int = 20
+
+    # "execution" compares sol_sql[0] with the candidate on the read-only database;
+    # "livesqlbench" runs preprocess_sql, the candidate and test_cases in a rolled-back transaction
+    EVALUATION_MODE: str = "execution"
+    # Client-side deadline (seconds) for a whole livesqlbench instance: preprocess_sql, every candidate statement
+    # and the test cases. Each statement is still limited by QUERY_STATEMENT_TIMEOUT_MS
+    LIVESQL_INSTANCE_TIMEOUT: float = 300.0
+
+    # Reuse the stored outcome of equivalent candidate SQL (same normalized fingerprint) across jobs
+    CANDIDATE_MEMO_ENABLED: bool = True
+    CANDIDATE_MEMO_MAX_ENTRIES: int = 10000
+
+    # Predictions evaluated in parallel by POST /evaluation/batch (overridable per request)
+    BATCH_EVALUATION_CONCURRENCY: int = 8
+
+    # Seconds without job events after which GET /benchmark/{job_id}/events sends a keepalive comment
+    JOB_EVENTS_KEEPALIVE: float = 15.0
+
+    # Prometheus metrics (requires prometheus_client); the API serves them on /metrics,
+    # workers on WORKER_METRICS_PORT
+    METRICS_ENABLED: bool = False
+    WORKER_METRICS_PORT: int = 9100
+
+    # Benchmark runner concurrency (1 = sequential)
+    BENCHMARK_CONCURRENCY: int = 1
+    BENCHMARK_MAX_CONCURRENT_REQUESTS: int | None = None
+    BENCHMARK_MAX_CONCURRENT_QUERIES: int | None = None
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
+    @model_validator(mode="after")
+    def check_row_caps(self) -> "Settings":
+        if self.COMPARISON_MAX_ROWS >= self.QUERY_MAX_ROWS:
+            raise ValueError(
+                "COMPARISON_MAX_ROWS must be lower than QUERY_MAX_ROWS, or large results can never be compared"
+            )
+        return self
+
 
 settings = Settings()
@@ -0,0 +1,203 @@
+import asyncio
+import re
+import time
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+from sqlalchemy.pool import QueuePool
+
+from config import settings
+
+_WORK_MEM = re.compile(r"^\d+\s*(kB|MB|GB)?$")
+
+
+class InvalidBenchmarkDbUrlError(ValueError):
+    pass
+
+
+@dataclass
+class _EngineEntry:
+    engine: AsyncEngine
+    last_used: float
+    in_use: int = 0
+
+
+class BenchmarkEngineRegistry:
+    """
+    Long-lived registry of pooled engines for the benchmark databases, keyed by database name.
+
+    Engines are created on first use and disposed after `idle_timeout` seconds without activity.
+    A global semaphore caps the number of connections checked out across all databases, and
+    before a new connection would push the connections open across all pools past
+    `max_connections`, the pools of unused databases are disposed (least recently used first).
+    Idle connections of databases in use at that moment (at most `pool_size` each) are the only
+    ones that can exceed the cap.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        pool_size: int = 5,
+        max_overflow: int = 5,
+        idle_timeout: float = 300.0,
+        max_connections: int = 50,
+    ) -> None:
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self._engines: dict[str, _EngineEntry] = {}
+        self._connections = asyncio.Semaphore(max_connections)
+        self._last_sweep = time.monotonic()
+
+    def url_for(self, database_name: str) -> str:
+        # Construct connection string for the specific database
+        if "/postgres" not in self.base_url:
+            raise InvalidBenchmarkDbUrlError(f"Invalid BENCHMARK_DB_URL format: {self.base_url}")
+        return self.base_url.replace("/postgres", f"/{database_name}")
+
+    def get_engine(self, database_name: str) -> AsyncEngine:
+        entry = self._engines.get(database_name)
+        if entry is None:
+            engine = create_async_engine(
+                self.url_for(database_name),
+                echo=False,
+                pool_size=self.pool_size,
+                max_overflow=self.max_overflow,
+                pool_pre_ping=True,
+            )
+            entry = _EngineEntry(engine=engine, last_used=time.monotonic())
+            self._engines[database_name] = entry
+        return entry.engine
+
+    @asynccontextmanager
+    async def connect(self, database_name: str) -> AsyncGenerator[AsyncConnection]:
+        await self._maybe_evict_idle()
+        engine = self.get_engine(database_name)
+        entry = self._engines[database_name]
+        entry.in_use += 1
+        try:
+            async with self._connections:
+                if _pool(engine).checkedin() == 0:
+                    # No idle connection to reuse, so this checkout opens a new one
+                    await self._close_idle_pools(self.max_connections - 1)
+                async with engine.connect() as conn:
+                    yield conn
+        finally:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+
+    @asynccontextmanager
+    async def sandbox(
+        self,
+        database_name: str,
+        *,
+        read_only: bool = True,
+        statement_timeout_ms: int | None = None,
+        lock_timeout_ms: int | None = None,
+        work_mem: str | None = None,
+    ) -> AsyncGenerator[AsyncConnection]:
+        """
+        Connection inside a transaction that is always rolled back, optionally read-only, with
+        `statement_timeout`, `lock_timeout` and `work_mem` set for that transaction only (SET LOCAL),
+        so the limits never leak into other users of the pooled connection.
+        """
+        if work_mem is not None and not _WORK_MEM.match(work_mem):
+            raise ValueError(f"Invalid work_mem: {work_mem}")
+        async with self.connect(database_name) as conn:
+            transaction = await conn.begin()
+            try:
+                if read_only:
+                    await conn.execute(text("SET TRANSACTION READ ONLY"))
+                if statement_timeout_ms:
+                    await conn.execute(text(f"SET LOCAL statement_timeout = {int(statement_timeout_ms)}"))
+                if lock_timeout_ms:
+                    await conn.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+                if work_mem:
+                    await conn.execute(text(f"SET LOCAL work_mem = '{work_mem}'"))
+                yield conn
+            finally:
+                if transaction.is_active:
+                    await transaction.rollback()
+
+    async def _maybe_evict_idle(self) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep < self.idle_timeout / 2:
+            return
+        self._last_sweep = now
+        await self.evict_idle(now)
+
+    def open_connections(self) -> int:
+        return sum(
+            _pool(entry.engine).checkedin() + _pool(entry.engine).checkedout() for entry in self._engines.values()
+        )
+
+    async def _close_idle_pools(self, limit: int) -> None:
+        """Disposes the pools of unused databases, least recently used first, until at most `limit` are open."""
+        excess = self.open_connections() - limit
+        if excess <= 0:
+            return
+        evicted = []
+        for name, entry in sorted(self._engines.items(), key=lambda item: item[1].last_used):
+            if excess <= 0:
+                break
+            idle = _pool(entry.engine).checkedin()
+            if entry.in_use == 0 and idle:
+                evicted.append(name)
+                excess -= idle
+        await self._dispose(evicted)
+
+    async def evict_idle(self, now: float | None = None) -> list[str]:
+        """Disposes engines that have been idle longer than `idle_timeout`. Returns the evicted names."""
+        now = time.monotonic() if now is None else now
+        evicted = [
+            name
+            for name, entry in self._engines.items()
+            if entry.in_use == 0 and now - entry.last_used > self.idle_timeout
+        ]
+        await self._dispose(evicted)
+        return evicted
+
+    async def _dispose(self, names: list[str]) -> None:
+        # Unregistered before the first await, so a concurrent connect() creates a new engine
+        # instead of checking out from one being disposed
+        entries = [self._engines.pop(name) for name in names]
+        for entry in entries:
+            await entry.engine.dispose()
+
+    async def dispose_all(self) -> None:
+        engines = list(self._engines.values())
+        self._engines.clear()
+        for entry in engines:
+            await entry.engine.dispose()
+
+
+def _pool(engine: AsyncEngine) -> QueuePool:
+    # create_async_engine defaults to AsyncAdaptedQueuePool
+    pool = engine.pool
+    assert isinstance(pool, QueuePool)
+    return pool
+
+
+def _max_overflow() -> int:
+    # Enough overflow for every query the configured concurrency can have in flight on a single
+    # database, counting the ground truth and the candidate of an instance separately
+    concurrency = max(
+        settings.BATCH_EVALUATION_CONCURRENCY,
+        settings.BENCHMARK_CONCURRENCY,
+        settings.BENCHMARK_MAX_CONCURRENT_QUERIES or 0,
+    )
+    return max(settings.BENCHMARK_DB_MAX_OVERFLOW, 2 * concurrency - settings.BENCHMARK_DB_POOL_SIZE)
+
+
+bench_engines = BenchmarkEngineRegistry(
+    settings.BENCHMARK_DB_URL,
+    pool_size=settings.BENCHMARK_DB_POOL_SIZE,
+    max_overflow=_max_overflow(),
+    idle_timeout=settings.BENCHMARK_DB_POOL_IDLE_TIMEOUT,
+    max_connections=settings.BENCHMARK_DB_MAX_CONNECTIONS,
+)
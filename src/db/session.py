@@ -1,5 +1,6 @@
 from collections.abc import AsyncGenerator
 
+from sqlalchemy import Connection, text
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlmodel import SQLModel
 
@@ -10,10 +11,67 @@ from config import settings
 engine = create_async_engine(settings.DATABASE_URL, echo=False, future=True)
 
 
+# create_all never alters tables that already exist, so columns and constraints added to existing
+# tables are listed here, in the order they were introduced. Every statement must be idempotent;
+# they run after create_all and before the missing indexes are created.
+SCHEMA_UPGRADES: tuple[str, ...] = (
+    "ALTER TABLE benchmarkresult ADD COLUMN IF NOT EXISTS error_class VARCHAR",
+    "ALTER TABLE benchmarkresult ADD COLUMN IF NOT EXISTS mismatch_reason VARCHAR",
+    "ALTER TABLE benchmarkjob ADD COLUMN IF NOT EXISTS options JSON",
+    "ALTER TABLE benchmarkjob ADD COLUMN IF NOT EXISTS worker_id VARCHAR",
+    "ALTER TABLE benchmarkjob ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP WITH TIME ZONE",
+    # Duplicate results from before the unique index would make creating it fail; keep the first one
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'uq_benchmarkresult_job_id_instance_id') THEN
+            DELETE FROM benchmarkresult AS duplicate USING benchmarkresult AS first
+            WHERE duplicate.job_id = first.job_id
+                AND duplicate.instance_id = first.instance_id
+                AND duplicate.id > first.id;
+        END IF;
+    END $$
+    """,
+    "ALTER TABLE benchmarkresult ADD COLUMN IF NOT EXISTS call_latency_ms FLOAT",
+    "ALTER TABLE benchmarkresult ADD COLUMN IF NOT EXISTS attempts INTEGER",
+    "ALTER TABLE benchmarkresult ADD COLUMN IF NOT EXISTS attempt_latencies_ms JSON",
+    "ALTER TABLE benchmarkresult ADD COLUMN IF NOT EXISTS ground_truth_ms FLOAT",
+    "ALTER TABLE benchmarkresult ADD COLUMN IF NOT EXISTS candidate_ms FLOAT",
+    "ALTER TABLE benchmarkresult ADD COLUMN IF NOT EXISTS compare_ms FLOAT",
+    "ALTER TABLE benchmarkresult ADD COLUMN IF NOT EXISTS category VARCHAR",
+    "ALTER TABLE benchmarkjob ADD COLUMN IF NOT EXISTS parent_id UUID REFERENCES benchmarkjob (id)",
+    # The question now lives in benchmarkinstance, so new result rows leave it empty
+    "ALTER TABLE benchmarkresult ALTER COLUMN question DROP NOT NULL",
+    # NOT VALID: rows older than benchmarkinstance may reference instances that were never synced
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'benchmarkresult_instance_id_fkey') THEN
+            ALTER TABLE benchmarkresult ADD CONSTRAINT benchmarkresult_instance_id_fkey
+                FOREIGN KEY (instance_id) REFERENCES benchmarkinstance (instance_id) NOT VALID;
+        END IF;
+    END $$
+    """,
+)
+
+# Serializes init_db across the API and the workers, which all run it on startup
+_INIT_DB_LOCK_KEY = 7_432_001
+
+
+def _create_missing_indexes(sync_conn: Connection) -> None:
+    # create_all only creates indexes together with new tables, so add the ones missing on existing tables
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
 async def init_db() -> None:
     async with engine.begin() as conn:
+        # Held until the transaction ends, so concurrent CREATE TABLE/INDEX never race
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _INIT_DB_LOCK_KEY})
         # await conn.run_sync(SQLModel.metadata.drop_all)
         await conn.run_sync(SQLModel.metadata.create_all)
+        for statement in SCHEMA_UPGRADES:
+            await conn.execute(text(statement))
+        await conn.run_sync(_create_missing_indexes)
 
 
 async def get_session() -> AsyncGenerator[AsyncSession]:
@@ -1,22 +1,58 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
 from api.benchmark import router as benchmark_router
 from api.evaluation import router as evaluation_router
 from api.metadata import router as metadata_router
-from db.session import init_db
-
-app = FastAPI(title="T2SQL Benchmark Server")
+from config import settings
+from db.bench_engines import bench_engines
+from db.session import engine, init_db
+from services import benchmark_service, metrics
+from services.job_events import job_events
+from services.metadata_service import metadata_cache
 
 
-@app.on_event("startup")
-async def on_startup():
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None]:
     await init_db()
+    if settings.JOB_EXECUTION_MODE == "background":
+        # Background jobs die with the process that ran them
+        async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+            interrupted = await benchmark_service.fail_interrupted_jobs(session)
+        if interrupted:
+            print(f"Marked {interrupted} interrupted benchmark job(s) as failed")
+    if settings.METADATA_WARMUP_ON_STARTUP:
+        await asyncio.to_thread(metadata_cache.warm)
+    yield
+    await job_events.close()
+    await bench_engines.dispose_all()
+
+
+app = FastAPI(title="T2SQL Benchmark Server", lifespan=lifespan)
 
 
 app.include_router(benchmark_router)
 app.include_router(metadata_router)
 app.include_router(evaluation_router)
 
+if metrics.setup():
+    app.mount("/metrics", metrics.asgi_app())
+
+    @app.middleware("http")
+    async def observe_requests(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+        start = time.perf_counter()
+        response = await call_next(request)
+        # The route template keeps label cardinality bounded (no job ids or instance ids)
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        metrics.observe_request(request.method, path, response.status_code, time.perf_counter() - start)
+        return response
+
 
 @app.get("/")
 async def root():
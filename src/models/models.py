@@ -1,7 +1,9 @@
 from datetime import UTC, datetime
+from enum import StrEnum
+from typing import Any
 from uuid import UUID, uuid4
 
-from sqlalchemy import Column, DateTime
+from sqlalchemy import JSON, Column, DateTime, Index
 from sqlmodel import Field, Relationship, SQLModel
 
 
@@ -9,26 +11,110 @@ def utc_now():
     return datetime.now(UTC)
 
 
+class ErrorClass(StrEnum):
+    GENERATION = "generation"  # the model endpoint did not return SQL
+    GROUND_TRUTH = "ground_truth"  # the expected SQL failed, so the instance cannot be evaluated
+    EXECUTION = "execution"  # the generated SQL failed to execute
+    TIMEOUT = "timeout"  # the generated SQL was cancelled by the statement timeout
+    HARNESS = "harness"  # the evaluation itself failed (e.g. no pooled connection), not the SQL
+
+
+# Error classes counted as execution errors (invalid SQL) in job statistics
+EXECUTION_ERROR_CLASSES = (ErrorClass.EXECUTION, ErrorClass.TIMEOUT)
+
+
 class BenchmarkJob(SQLModel, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
-    status: str = Field(default="pending")  # pending, running, completed, failed
+    status: str = Field(default="pending", index=True)  # pending, queued, running, completed, failed
     endpoint_url: str
+    # BenchmarkCreate payload, so queued jobs can be run by a separate worker
+    options: dict[str, Any] | None = Field(default=None, sa_column=Column(JSON))
+    # Shard jobs point to the job they were split from, which only aggregates them
+    parent_id: UUID | None = Field(default=None, foreign_key="benchmarkjob.id", index=True)
+    worker_id: str | None = None
+    heartbeat_at: datetime | None = Field(default=None, sa_column=Column(DateTime(timezone=True)))
     created_at: datetime = Field(default_factory=utc_now, sa_column=Column(DateTime(timezone=True)))
     updated_at: datetime = Field(default_factory=utc_now, sa_column=Column(DateTime(timezone=True)))
 
     results: list["BenchmarkResult"] = Relationship(back_populates="job")
 
 
+class BenchmarkInstance(SQLModel, table=True):
+    """Dataset instance fields that are the same for every job, loaded from the dataset (see services.instances)."""
+
+    instance_id: str = Field(primary_key=True)
+    database_name: str
+    category: str | None = None
+    question: str
+    expected_sql: str | None = None
+
+
 class BenchmarkResult(SQLModel, table=True):
+    __table_args__ = (
+        # (job_id, id) serves keyset pagination over a job's results
+        Index("ix_benchmarkresult_job_id_id", "job_id", "id"),
+        # One result per instance and job, so resumed or taken-over jobs never duplicate rows
+        Index("uq_benchmarkresult_job_id_instance_id", "job_id", "instance_id", unique=True),
+        # (instance_id, job_id) serves comparing the same instances across jobs
+        Index("ix_benchmarkresult_instance_id_job_id", "instance_id", "job_id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
-    job_id: UUID = Field(foreign_key="benchmarkjob.id")
-    instance_id: str
+    job_id: UUID = Field(foreign_key="benchmarkjob.id", index=True)
+    instance_id: str = Field(foreign_key="benchmarkinstance.instance_id")
     database_name: str
-    question: str
+    category: str | None = None
+    # The question and expected SQL live in benchmarkinstance; only legacy rows have them here
+    question: str | None = None
     generated_sql: str | None = None
     expected_sql: str | None = None
     is_correct: bool | None = None
     error: str | None = None
-    latency_ms: float | None = None
+    error_class: str | None = None  # ErrorClass value, None when there was no error
+    mismatch_reason: str | None = None  # why the results differ, for wrong results
+    latency_ms: float | None = None  # final model endpoint attempt
+    call_latency_ms: float | None = None  # whole model call, including retries and backoff
+    attempts: int | None = None
+    attempt_latencies_ms: list[float] | None = Field(default=None, sa_column=Column(JSON))
+    # Per-phase durations, measured without the time spent waiting for a concurrency slot
+    ground_truth_ms: float | None = None
+    candidate_ms: float | None = None
+    compare_ms: float | None = None
 
     job: BenchmarkJob = Relationship(back_populates="results")
+
+
+class BenchmarkJobSummary(SQLModel, table=True):
+    """Per-job aggregates, incremented as results are persisted so polling a job stays O(1)."""
+
+    job_id: UUID = Field(foreign_key="benchmarkjob.id", primary_key=True)
+    total: int = 0
+    correct: int = 0
+    execution_error: int = 0
+    wrong_result: int = 0
+    total_latency_ms: float = 0.0
+
+
+class BenchmarkJobBreakdown(SQLModel, table=True):
+    """Per-job accuracy by database and by category, materialized when the job completes."""
+
+    job_id: UUID = Field(foreign_key="benchmarkjob.id", primary_key=True)
+    dimension: str = Field(primary_key=True)  # "database" or "category"
+    key: str = Field(primary_key=True)
+    total: int = 0
+    correct: int = 0
+    execution_error: int = 0
+
+
+class CandidateResultMemo(SQLModel, table=True):
+    """
+    Outcome of executing a candidate SQL on a benchmark database, keyed by the fingerprint of its
+    normalized text, so equivalent candidates from later jobs skip execution (see services.candidate_memo).
+    """
+
+    database_name: str = Field(primary_key=True)
+    fingerprint: str = Field(primary_key=True)
+    version: str = Field(primary_key=True)  # dataset version and comparison settings the digest depends on
+    digest: dict[str, Any] | None = Field(default=None, sa_column=Column(JSON))
+    error: str | None = None  # only errors that would occur again, e.g. syntax errors
+    created_at: datetime = Field(default_factory=utc_now, sa_column=Column(DateTime(timezone=True)))
@@ -1,30 +1,96 @@
 from datetime import datetime
+from typing import Literal
 from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+EvaluationMode = Literal["execution", "livesqlbench"]
 
 
 class BenchmarkCreate(BaseModel):
     endpoint_url: str
+    # Defaults to settings.EVALUATION_MODE
+    evaluation_mode: EvaluationMode | None = None
+    # Number of instances evaluated in parallel; defaults to settings.BENCHMARK_CONCURRENCY
+    concurrency: int | None = Field(default=None, ge=1)
+    # Optional tighter limits for model endpoint calls and benchmark DB executions
+    max_concurrent_requests: int | None = Field(default=None, ge=1)
+    max_concurrent_queries: int | None = Field(default=None, ge=1)
+    # Model endpoint client; unset values fall back to the MODEL_* settings
+    request_timeout: float | None = Field(default=None, gt=0)
+    connect_timeout: float | None = Field(default=None, gt=0)
+    max_retries: int | None = Field(default=None, ge=0)
+    rate_limit_per_second: float | None = Field(default=None, gt=0)
+    rate_limit_burst: int | None = Field(default=None, ge=1)
+    http2: bool | None = None
+    # Batch mode: send up to `batch_size` questions of the same database per request to
+    # `batch_endpoint_url` (default: `{endpoint_url}/batch`); concurrency then counts batches
+    batch_size: int | None = Field(default=None, ge=1)
+    batch_endpoint_url: str | None = None
+    # Subset selection; filters are combined, then a deterministic sample of `sample_size`
+    # instances (chosen by `sample_seed`) is taken. Unset means the whole dataset.
+    databases: list[str] | None = None
+    categories: list[str] | None = None
+    instance_ids: list[str] | None = None
+    sample_size: int | None = Field(default=None, ge=1)
+    sample_seed: int = 0
+    # Sharding: with `num_shards` alone the job is split into that many shard jobs, whose stats are
+    # rolled up into this one; with `shard_index` as well, the job runs only that shard
+    num_shards: int | None = Field(default=None, ge=1)
+    shard_index: int | None = Field(default=None, ge=0)
+
+    @model_validator(mode="after")
+    def check_shard(self) -> "BenchmarkCreate":
+        if self.shard_index is not None and (self.num_shards is None or self.shard_index >= self.num_shards):
+            raise ValueError("shard_index requires num_shards and must be lower than it")
+        return self
 
 
 class JobStatus(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     id: UUID
     status: str
+    parent_id: UUID | None = None
     created_at: datetime
     updated_at: datetime
 
 
 class BenchmarkResultSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
+    id: int
     instance_id: str
     database_name: str
-    question: str
+    category: str | None = None
+    question: str | None
     generated_sql: str | None
     is_correct: bool | None
     error: str | None
+    error_class: str | None
+    mismatch_reason: str | None
     latency_ms: float | None
+    call_latency_ms: float | None
+    attempts: int | None
+    ground_truth_ms: float | None = None
+    candidate_ms: float | None = None
+    compare_ms: float | None = None
+
+
+class BenchmarkResultPage(BaseModel):
+    items: list[BenchmarkResultSchema]
+    # Pass as `after` to fetch the next page; None when there are no more results
+    next_cursor: int | None
+
+
+class ResultFilter(BaseModel):
+    is_correct: bool | None = None
+    error_class: str | None = None
+    database_name: str | None = None
+
+
+class LatencyPercentiles(BaseModel):
+    p50: float | None
+    p95: float | None
+    p99: float | None
 
 
 class BenchmarkStats(BaseModel):
@@ -35,10 +101,49 @@ class BenchmarkStats(BaseModel):
     accuracy_score: float
     valid_sql_rate: float
     avg_latency_ms: float
+    # Only filled when requested, since they need a pass over the job's results
+    latency_percentiles: LatencyPercentiles | None = None
+    phase_latency_ms: dict[str, LatencyPercentiles] | None = None
 
 
 class JobDetail(JobStatus):
     stats: BenchmarkStats
+    # Set for sharded jobs, whose stats add up those of their shard jobs
+    shards: list[JobStatus] | None = None
+
+
+class AccuracyBreakdown(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    key: str
+    total: int
+    correct: int
+    execution_error: int
+    accuracy: float
+
+
+class LeaderboardEntry(BaseModel):
+    id: UUID
+    status: str
+    endpoint_url: str
+    created_at: datetime
+    stats: BenchmarkStats
+    by_database: list[AccuracyBreakdown]
+    by_category: list[AccuracyBreakdown]
+
+
+class InstanceDisagreement(BaseModel):
+    instance_id: str
+    database_name: str
+    category: str | None
+    correct_jobs: list[UUID]
+    incorrect_jobs: list[UUID]
+
+
+class JobComparison(BaseModel):
+    jobs: list[LeaderboardEntry]
+    # Instances evaluated by at least two of the jobs that some got right and others wrong
+    disagreements: list[InstanceDisagreement]
+    next_cursor: str | None
 
 
 class ColumnMeaning(BaseModel):
@@ -62,6 +167,23 @@ class DatabaseMetadata(BaseModel):
     knowledge_base: list[KnowledgeBaseItem]
 
 
+class ColumnMeaningsColumnar(BaseModel):
+    """Column meanings as parallel arrays, avoiding repeated keys for wide schemas."""
+
+    table_name: list[str]
+    column_name: list[str]
+    description: list[str]
+
+
+class DatabaseMetadataProjection(BaseModel):
+    """Subset of DatabaseMetadata; fields that were not requested are omitted."""
+
+    database_name: str
+    schema_ddl: str | None = None
+    column_meanings: list[ColumnMeaning] | ColumnMeaningsColumnar | None = None
+    knowledge_base: list[KnowledgeBaseItem] | None = None
+
+
 class BenchmarkDataItem(BaseModel):
     instance_id: str
     selected_database: str
@@ -77,3 +199,30 @@ class ManualEvaluationStats(BaseModel):
     valid_sql_rate: float
     is_correct: bool
     error: str | None
+    error_class: str | None = None
+
+
+class PredictionItem(BaseModel):
+    instance_id: str
+    generated_sql: str
+
+
+class BatchEvaluationItem(ManualEvaluationStats):
+    type: Literal["item"] = "item"
+    # Position of the prediction in the request; items are streamed as they complete
+    index: int
+    instance_id: str
+    # The prediction could not be scored (unknown instance or failing ground truth)
+    skipped: bool = False
+
+
+class BatchEvaluationSummary(BaseModel):
+    type: Literal["summary"] = "summary"
+    total: int
+    correct: int
+    execution_error: int
+    wrong_result: int
+    skipped: int
+    # Over the scored predictions, i.e. excluding skipped ones
+    accuracy_score: float
+    valid_sql_rate: float
@@ -0,0 +1,117 @@
+"""
+Parquet archive of completed jobs. Requires the optional `pyarrow` package.
+
+An archive is self-contained: every row carries the instance's question and expected SQL.
+Once archived, a job's result rows can be pruned from the results database; its stats,
+breakdowns and leaderboard entry keep being served from the job summary and breakdown tables,
+while its latency percentiles and cross-job comparisons are lost with the rows.
+"""
+
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import col, select
+
+from config import settings
+from models.models import BenchmarkInstance, BenchmarkJobBreakdown, BenchmarkJobSummary, BenchmarkResult
+
+_STRING_COLUMNS = (
+    "instance_id",
+    "database_name",
+    "category",
+    "question",
+    "generated_sql",
+    "expected_sql",
+    "error",
+    "error_class",
+    "mismatch_reason",
+)
+_FLOAT_COLUMNS = (
+    "latency_ms",
+    "call_latency_ms",
+    "ground_truth_ms",
+    "candidate_ms",
+    "compare_ms",
+)
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def _import_pyarrow() -> Any:
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ArchiveError("Parquet archives require pyarrow (uv sync --extra parquet)") from e
+    return pyarrow
+
+
+def _schema(pyarrow: Any) -> Any:
+    return pyarrow.schema(
+        [(name, pyarrow.string()) for name in _STRING_COLUMNS]
+        + [("is_correct", pyarrow.bool_()), ("attempts", pyarrow.int64())]
+        + [(name, pyarrow.float64()) for name in _FLOAT_COLUMNS]
+    )
+
+
+def _archive_row(result: BenchmarkResult, instance: BenchmarkInstance | None) -> dict[str, Any]:
+    row = {name: getattr(result, name) for name in (*_STRING_COLUMNS, *_FLOAT_COLUMNS)}
+    row["is_correct"] = result.is_correct
+    row["attempts"] = result.attempts
+    # Legacy rows carry their own question and expected SQL
+    row["question"] = result.question or (instance.question if instance else None)
+    row["expected_sql"] = result.expected_sql or (instance.expected_sql if instance else None)
+    return row
+
+
+async def archive_job(session: AsyncSession, job_id: UUID, path: str, prune: bool = False) -> int:
+    """
+    Writes a completed job's results to a Parquet file, one row group per export batch, and
+    optionally deletes them from the results database. Returns the number of archived results.
+    """
+    pyarrow = _import_pyarrow()
+    from services.benchmark_service import get_job, refresh_job_breakdown, shard_job_ids
+
+    job = await get_job(session, job_id)
+    if job is None:
+        raise ArchiveError(f"Job {job_id} not found")
+    if job.status != "completed":
+        raise ArchiveError(f"Job is {job.status}; only completed jobs can be archived")
+    owner_ids = await shard_job_ids(session, job_id)
+    if prune:
+        summaries = await session.execute(
+            select(BenchmarkJobSummary.job_id).where(col(BenchmarkJobSummary.job_id).in_(owner_ids))
+        )
+        if len(summaries.all()) < len(owner_ids):
+            raise ArchiveError("Only jobs with a summary can be pruned, their stats would be lost otherwise")
+
+    statement = (
+        select(BenchmarkResult, BenchmarkInstance)
+        .outerjoin(BenchmarkInstance, col(BenchmarkInstance.instance_id) == col(BenchmarkResult.instance_id))
+        .where(col(BenchmarkResult.job_id).in_(owner_ids))
+        .order_by(col(BenchmarkResult.id))
+        .execution_options(yield_per=settings.RESULT_EXPORT_BATCH_SIZE)
+    )
+    schema = _schema(pyarrow)
+    archived = 0
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        result = await session.stream(statement)
+        async for partition in result.partitions():
+            rows = [_archive_row(benchmark_result, instance) for benchmark_result, instance in partition]
+            writer.write_table(pyarrow.Table.from_pylist(rows, schema=schema))
+            archived += len(rows)
+
+    if prune:
+        breakdown = await session.execute(
+            select(BenchmarkJobBreakdown.job_id).where(col(BenchmarkJobBreakdown.job_id) == job_id).limit(1)
+        )
+        if breakdown.first() is None:
+            # Breakdowns are computed from results, so store them before the results go
+            await refresh_job_breakdown(session, job_id)
+        await session.execute(delete(BenchmarkResult).where(col(BenchmarkResult.job_id).in_(owner_ids)))
+        await session.commit()
+    return archived
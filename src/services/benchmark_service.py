@@ -1,19 +1,227 @@
+import asyncio
 import time
+from collections import defaultdict, deque
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import asynccontextmanager
 from datetime import UTC, datetime
+from typing import Any
 from uuid import UUID
 
-import httpx
+from sqlalchemy import ColumnElement, Select, and_, case, delete, func, insert, literal, not_, or_, update
+from sqlalchemy import select as sa_select
+from sqlalchemy.dialects.postgresql import array as pg_array
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
-from sqlmodel import desc, select
+from sqlalchemy.orm import Mapped
+from sqlmodel import col, desc, select
 
+from config import settings
 from db.session import engine
-from models.models import BenchmarkJob, BenchmarkResult
-from models.schemas import BenchmarkStats, JobDetail
-from services.dataset import get_benchmark_data
-from services.evaluation import compare_results, execute_query
+from models.models import (
+    EXECUTION_ERROR_CLASSES,
+    BenchmarkInstance,
+    BenchmarkJob,
+    BenchmarkJobBreakdown,
+    BenchmarkJobSummary,
+    BenchmarkResult,
+    ErrorClass,
+)
+from models.schemas import (
+    AccuracyBreakdown,
+    BenchmarkCreate,
+    BenchmarkResultPage,
+    BenchmarkResultSchema,
+    BenchmarkStats,
+    InstanceDisagreement,
+    JobComparison,
+    JobDetail,
+    JobStatus,
+    LatencyPercentiles,
+    LeaderboardEntry,
+    ResultFilter,
+)
+from services import metrics
+from services.dataset import get_benchmark_data, select_instances
+from services.evaluation import (
+    candidate_error_class,
+    compare_query_results,
+    execute_candidate,
+    execute_ground_truth,
+)
+from services.instances import sync_instances
+from services.job_events import job_events
+from services.livesql_evaluation import evaluate_livesql
+from services.model_client import GenerationResult, ModelClient, ModelClientConfig
+from services.result_writer import SUMMARY_FIELDS, ResultWriter
+
+
+class _JobContext:
+    """Per-job settings shared by the workers: concurrency limits and evaluation mode."""
+
+    def __init__(
+        self, concurrency: int, max_requests: int | None, max_queries: int | None, evaluation_mode: str
+    ) -> None:
+        self.concurrency = concurrency
+        self.requests = asyncio.Semaphore(max_requests or concurrency)
+        self.queries = asyncio.Semaphore(max_queries or concurrency)
+        self.evaluation_mode = evaluation_mode
+
+
+async def _evaluate_instance(
+    client: ModelClient, ctx: _JobContext, job_id: UUID, row: dict[str, Any]
+) -> BenchmarkResult:
+    async with ctx.requests:
+        generation = await client.generate(row.get("selected_database", ""), row.get("query", ""))
+    return await _score_instance(ctx, job_id, row, generation)
+
+
+async def _evaluate_batch(
+    client: ModelClient, ctx: _JobContext, job_id: UUID, rows: list[dict[str, Any]]
+) -> list[BenchmarkResult]:
+    """
+    Generates SQL for a batch of questions on the same database with one endpoint call,
+    then scores every instance concurrently (bounded by the query limit).
+    """
+    async with ctx.requests:
+        generations = await client.generate_batch(
+            rows[0].get("selected_database", ""), [row.get("query", "") for row in rows]
+        )
+    return list(
+        await asyncio.gather(
+            *(_score_instance(ctx, job_id, row, generation) for row, generation in zip(rows, generations, strict=True))
+        )
+    )
+
+
+def _batches(dataset: list[dict[str, Any]], batch_size: int) -> list[list[dict[str, Any]]]:
+    """Groups instances by database (so a batch shares its schema context) and chunks each group."""
+    by_database: dict[str, list[dict[str, Any]]] = {}
+    for row in dataset:
+        by_database.setdefault(row.get("selected_database", ""), []).append(row)
+    return [rows[i : i + batch_size] for rows in by_database.values() for i in range(0, len(rows), batch_size)]
+
+
+@asynccontextmanager
+async def _timed(timings: dict[str, float], phase: str) -> AsyncIterator[None]:
+    """Records the duration of a phase in milliseconds, on the monotonic clock."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings[phase] = elapsed * 1000
+        metrics.observe_phase(phase, elapsed)
+
+
+async def _score_instance(
+    ctx: _JobContext, job_id: UUID, row: dict[str, Any], generation: GenerationResult
+) -> BenchmarkResult:
+    instance_id = row.get("instance_id", "")
+    database_name = row.get("selected_database", "")
+    sol_sql = row.get("sol_sql", [])
+    expected_sql = sol_sql[0] if sol_sql and isinstance(sol_sql, list) else None
+
+    generated_sql, error_msg = generation.sql, generation.error
+    if generation.call_latency_ms is not None:
+        metrics.observe_phase("generation", generation.call_latency_ms / 1000)
+    error_class = ErrorClass.GENERATION if error_msg else None
+
+    # Evaluate correctness
+    is_correct = False
+    mismatch_reason = None
+    timings: dict[str, float] = {}
+    if generated_sql and ctx.evaluation_mode == "livesqlbench":
+        async with ctx.queries, _timed(timings, "candidate"):
+            verdict = await evaluate_livesql(row, generated_sql)
+        is_correct, mismatch_reason = verdict.is_correct, verdict.reason
+        if verdict.error:
+            error_msg, error_class = verdict.error, verdict.error_class
+    elif generated_sql and expected_sql:
+        # Execute expected SQL
+        async with ctx.queries, _timed(timings, "ground_truth"):
+            expected_res, expected_err = await execute_ground_truth(database_name, expected_sql)
+        if expected_err:
+            # If we can't execute the ground truth, we can't evaluate.
+            error_class = ErrorClass.HARNESS if expected_err.harness else ErrorClass.GROUND_TRUTH
+            error_msg = (
+                f"{error_msg}\nGround Truth Error: {expected_err}" if error_msg else f"Ground Truth Error: {expected_err}"
+            )
+
+        # Execute generated SQL
+        async with ctx.queries, _timed(timings, "candidate"):
+            generated_res, generated_err = await execute_candidate(database_name, generated_sql)
+        if generated_err:
+            error_class = candidate_error_class(generated_err)
+            error_msg = (
+                f"{error_msg}\nGenerated SQL Error: {generated_err}"
+                if error_msg
+                else f"Generated SQL Error: {generated_err}"
+            )
+
+        # Compare
+        if not expected_err and not generated_err:
+            async with ctx.queries, _timed(timings, "compare"):
+                comparison = await compare_query_results(
+                    database_name, expected_sql, expected_res, generated_sql, generated_res
+                )
+            is_correct = comparison.is_equal
+            mismatch_reason = comparison.reason
+
+    return BenchmarkResult(
+        job_id=job_id,
+        instance_id=instance_id,
+        database_name=database_name,
+        category=row.get("category"),
+        generated_sql=generated_sql,
+        is_correct=is_correct,
+        error=error_msg,
+        error_class=error_class,
+        mismatch_reason=mismatch_reason,
+        latency_ms=generation.latency_ms,
+        call_latency_ms=generation.call_latency_ms,
+        attempts=len(generation.attempt_latencies_ms),
+        attempt_latencies_ms=generation.attempt_latencies_ms,
+        ground_truth_ms=timings.get("ground_truth"),
+        candidate_ms=timings.get("candidate"),
+        compare_ms=timings.get("compare"),
+    )
+
 
+async def _completed_instance_ids(session: AsyncSession, job_id: UUID) -> set[str]:
+    statement = select(BenchmarkResult.instance_id).where(BenchmarkResult.job_id == job_id)
+    return set((await session.execute(statement)).scalars().all())
+
+
+async def _owns_job(session: AsyncSession, job_id: UUID, worker_id: str | None) -> bool:
+    """
+    Locks the job row until the caller commits. False if another worker has taken the job over,
+    in which case its final status is left to that worker. Always true outside queue workers.
+    """
+    statement = select(BenchmarkJob.worker_id).where(col(BenchmarkJob.id) == job_id).with_for_update()
+    owner = (await session.execute(statement)).scalar_one()
+    return worker_id is None or owner == worker_id
+
+
+async def run_benchmark(
+    job_id: UUID,
+    endpoint_url: str,
+    options: BenchmarkCreate | None = None,
+    resume: bool = False,
+    worker_id: str | None = None,
+) -> None:
+    """
+    Runs a benchmark job to completion. With `resume`, instances that already have a result
+    for this job are skipped, so an interrupted job continues where it stopped. Queue workers
+    pass their `worker_id`, so the final status is only written while they still own the job.
+    """
+    concurrency = (options.concurrency if options else None) or settings.BENCHMARK_CONCURRENCY
+    ctx = _JobContext(
+        concurrency,
+        (options.max_concurrent_requests if options else None) or settings.BENCHMARK_MAX_CONCURRENT_REQUESTS,
+        (options.max_concurrent_queries if options else None) or settings.BENCHMARK_MAX_CONCURRENT_QUERIES,
+        (options.evaluation_mode if options else None) or settings.EVALUATION_MODE,
+    )
 
-async def run_benchmark(job_id: UUID, endpoint_url: str) -> None:
     # Use a fresh session for the background task
     async_session = async_sessionmaker(engine, expire_on_commit=False)
 
@@ -25,173 +233,626 @@ async def run_benchmark(job_id: UUID, endpoint_url: str) -> None:
             job = results.scalar_one()
             job.status = "running"
             job.updated_at = datetime.now(UTC)
+            await job_events.publish(session, job_id, {"type": "status", "status": "running"})
+            if job.parent_id is not None:
+                await _update_parent_status(session, job.parent_id)
             await session.commit()
 
-            dataset = get_benchmark_data()
-
-            async with httpx.AsyncClient() as client:
-                for row in dataset:
-                    # ... (rest of the loop)
-                    instance_id = row.get("instance_id", "")
-                    database_name = row.get("selected_database", "")
-                    query = row.get("query", "")
-                    sol_sql = row.get("sol_sql", [])
-                    expected_sql = sol_sql[0] if sol_sql and isinstance(sol_sql, list) else None
-
-                    start_time = time.time()
-                    generated_sql = None
-                    error_msg = None
-
-                    try:
-                        response = await client.post(
-                            endpoint_url,
-                            json={"database": database_name, "query": query},
-                            timeout=60.0,
-                        )
-
-                        if response.status_code == 200:
-                            try:
-                                resp_json = response.json()
-                                if isinstance(resp_json, dict):
-                                    generated_sql = (
-                                        resp_json.get("sql") or resp_json.get("generated_sql") or str(resp_json)
-                                    )
-                                else:
-                                    generated_sql = str(resp_json)
-                            except Exception:
-                                generated_sql = response.text
+            # Results reference the instance table instead of repeating the question and expected SQL
+            await sync_instances(session)
+            dataset = _select_dataset(options)
+            if resume:
+                done = await _completed_instance_ids(session, job_id)
+                dataset = [row for row in dataset if row.get("instance_id", "") not in done]
+            batch_size = options.batch_size if options else None
+            units = _batches(dataset, batch_size) if batch_size else [[row] for row in dataset]
+            pending_units = iter(units)
+
+            client_config = ModelClientConfig.from_options(options, ctx.concurrency)
+            batch_url = (options.batch_endpoint_url if options else None) or f"{endpoint_url.rstrip('/')}/batch"
+            async with (
+                ModelClient(endpoint_url, client_config, batch_url=batch_url) as client,
+                ResultWriter(session, parent_id=job.parent_id) as writer,
+            ):
+
+                async def worker() -> None:
+                    # Each worker pulls the next instance (or batch) as soon as it is free, so at most
+                    # `concurrency` of them are in flight at any time.
+                    for unit in pending_units:
+                        if batch_size:
+                            unit_results = await _evaluate_batch(client, ctx, job_id, unit)
                         else:
-                            error_msg = f"Error: {response.status_code} - {response.text}"
-                    except Exception as e:
-                        error_msg = str(e)
-
-                    latency = (time.time() - start_time) * 1000
-
-                    # Evaluate correctness
-                    is_correct = False
-                    if generated_sql and expected_sql:
-                        # Execute expected SQL
-                        expected_res, expected_err = await execute_query(database_name, expected_sql)
-                        if expected_err:
-                            # If we can't execute the ground truth, we can't evaluate.
-                            # We might log this or mark error.
-                            # For now, append to error_msg
-                            error_msg = (
-                                f"{error_msg}\nGround Truth Error: {expected_err}"
-                                if error_msg
-                                else f"Ground Truth Error: {expected_err}"
-                            )
-
-                        # Execute generated SQL
-                        generated_res, generated_err = await execute_query(database_name, generated_sql)
-                        if generated_err:
-                            error_msg = (
-                                f"{error_msg}\nGenerated SQL Error: {generated_err}"
-                                if error_msg
-                                else f"Generated SQL Error: {generated_err}"
-                            )
-
-                        # Compare
-                        if not expected_err and not generated_err:
-                            is_correct = compare_results(expected_res, generated_res)
-
-                    result = BenchmarkResult(
-                        job_id=job_id,
-                        instance_id=instance_id,
-                        database_name=database_name,
-                        question=query,
-                        generated_sql=generated_sql,
-                        expected_sql=expected_sql,
-                        is_correct=is_correct,
-                        error=error_msg,
-                        latency_ms=latency,
-                    )
-                    session.add(result)
-                    await session.commit()
-
+                            unit_results = [await _evaluate_instance(client, ctx, job_id, unit[0])]
+                        for result in unit_results:
+                            await writer.add(result)
+
+                async with asyncio.TaskGroup() as tg:
+                    for _ in range(min(ctx.concurrency, len(units)) or 1):
+                        tg.create_task(worker())
+
+            if not await _owns_job(session, job_id, worker_id):
+                await session.rollback()
+                print(f"Benchmark job {job_id} was taken over by another worker")
+                return
             # Update status to completed
+            await refresh_job_breakdown(session, job_id)
             job.status = "completed"
             job.updated_at = datetime.now(UTC)
+            await job_events.publish(session, job_id, {"type": "status", "status": "completed"})
+            if job.parent_id is not None:
+                await _update_parent_status(session, job.parent_id)
             await session.commit()
         except Exception as e:
+            await session.rollback()
+            if not await _owns_job(session, job_id, worker_id):
+                await session.rollback()
+                print(f"Benchmark job {job_id} failed after being taken over by another worker: {e}")
+                return
             # Re-fetch job to update status to failed
             statement = select(BenchmarkJob).where(BenchmarkJob.id == job_id)
             results = await session.execute(statement)
             job = results.scalar_one()
             job.status = "failed"
             job.updated_at = datetime.now(UTC)
+            await job_events.publish(session, job_id, {"type": "status", "status": "failed"})
+            if job.parent_id is not None:
+                await _update_parent_status(session, job.parent_id)
             await session.commit()
             print(f"Benchmark job {job_id} failed: {e}")
 
 
-async def create_job(session: AsyncSession, endpoint_url: str) -> BenchmarkJob:
-    job = BenchmarkJob(endpoint_url=endpoint_url)
+class JobStateError(Exception):
+    pass
+
+
+def job_options(job: BenchmarkJob) -> BenchmarkCreate | None:
+    return BenchmarkCreate.model_validate(job.options) if job.options else None
+
+
+def _select_dataset(options: BenchmarkCreate | None) -> list[dict[str, Any]]:
+    if options is None:
+        return get_benchmark_data()
+    return select_instances(
+        databases=options.databases,
+        categories=options.categories,
+        instance_ids=options.instance_ids,
+        sample_size=options.sample_size,
+        sample_seed=options.sample_seed,
+        shard_index=options.shard_index,
+        num_shards=options.num_shards,
+    )
+
+
+async def create_job(
+    session: AsyncSession, endpoint_url: str, options: BenchmarkCreate | None = None, queued: bool = False
+) -> BenchmarkJob:
+    """
+    Creates a job. Queued jobs are left for a worker process to claim (see services.job_queue).
+    A job with `num_shards` but no `shard_index` gets one shard job per shard; it is never run
+    itself, its status and stats are derived from its shards (see get_shard_jobs).
+    """
+    job = BenchmarkJob(
+        endpoint_url=endpoint_url,
+        status="queued" if queued else "pending",
+        options=options.model_dump(mode="json") if options else None,
+    )
     session.add(job)
+    await session.flush()
+
+    runnable = [job]
+    if options is not None and options.num_shards is not None and options.shard_index is None:
+        # Pending, so workers never claim the parent
+        job.status = "pending"
+        runnable = [
+            BenchmarkJob(
+                endpoint_url=endpoint_url,
+                status="queued" if queued else "pending",
+                options=options.model_copy(update={"shard_index": index}).model_dump(mode="json"),
+                parent_id=job.id,
+            )
+            for index in range(options.num_shards)
+        ]
+        session.add_all(runnable)
+        await session.flush()
+
+    if settings.BENCHMARK_JOB_SUMMARY_ENABLED:
+        session.add_all(BenchmarkJobSummary(job_id=runnable_job.id) for runnable_job in runnable)
     await session.commit()
     await session.refresh(job)
     return job
 
 
+async def get_shard_jobs(session: AsyncSession, job_id: UUID) -> list[BenchmarkJob]:
+    statement = select(BenchmarkJob).where(col(BenchmarkJob.parent_id) == job_id).order_by(col(BenchmarkJob.created_at))
+    return list((await session.execute(statement)).scalars().all())
+
+
+async def run_shards(shards: list[BenchmarkJob]) -> None:
+    """Runs the shard jobs of a sharded job concurrently in this process."""
+    await asyncio.gather(*(run_benchmark(shard.id, shard.endpoint_url, job_options(shard)) for shard in shards))
+
+
+async def _update_parent_status(session: AsyncSession, parent_id: UUID) -> None:
+    """Derives a sharded job's status from its shards. The caller commits."""
+    # Locking the parent serializes shards finishing together, so the last one sees all the others
+    statement = select(BenchmarkJob).where(col(BenchmarkJob.id) == parent_id).with_for_update()
+    parent = (await session.execute(statement)).scalar_one()
+    shard_statuses = select(BenchmarkJob.status).where(col(BenchmarkJob.parent_id) == parent_id)
+    statuses = set((await session.execute(shard_statuses)).scalars().all())
+
+    if statuses == {"completed"}:
+        status = "completed"
+    elif statuses <= {"completed", "failed"}:
+        status = "failed"
+    elif "running" in statuses:
+        status = "running"
+    else:
+        return
+    if status != parent.status:
+        if status == "completed":
+            await refresh_job_breakdown(session, parent_id)
+        parent.status = status
+        parent.updated_at = datetime.now(UTC)
+        await job_events.publish(session, parent_id, {"type": "status", "status": status})
+
+
 async def get_job(session: AsyncSession, job_id: UUID) -> BenchmarkJob | None:
     statement = select(BenchmarkJob).where(BenchmarkJob.id == job_id)
     results = await session.execute(statement)
     return results.scalar_one_or_none()
 
 
-async def get_all_jobs(session: AsyncSession) -> list[BenchmarkJob]:
-    statement = select(BenchmarkJob).order_by(desc(BenchmarkJob.created_at))
-    results = await session.execute(statement)
-    return list(results.scalars().all())
-
+async def prepare_resume(session: AsyncSession, job_id: UUID, queued: bool = False) -> BenchmarkJob | None:
+    """
+    Marks a finished or failed job for resumption. The caller (or a worker, for queued jobs)
+    then runs it with resume=True, which only evaluates instances that have no result yet.
+    """
+    job = await get_job(session, job_id)
+    if job is None:
+        return None
+    if await get_shard_jobs(session, job_id):
+        raise JobStateError("Sharded jobs are resumed one shard job at a time")
+    if job.status not in ("failed", "completed"):
+        raise JobStateError(f"Job is {job.status}; only failed or completed jobs can be resumed")
+
+    job.status = "queued" if queued else "pending"
+    job.worker_id = None
+    job.updated_at = datetime.now(UTC)
+    await session.commit()
+    return job
 
-async def get_job_with_results(session: AsyncSession, job_id: UUID) -> JobDetail | None:
-    # In SQLModel/SQLAlchemy async, we might need to load relationships explicitly
-    # or use selectinload
-    from sqlalchemy.orm import selectinload
 
+async def fail_interrupted_jobs(session: AsyncSession) -> int:
+    """
+    Marks jobs that were running inside an API process (background mode, so without a worker)
+    as failed. Called on API startup, when no such job can still be running; they can then be resumed.
+    """
     statement = (
-        select(BenchmarkJob).where(BenchmarkJob.id == job_id).options(selectinload(BenchmarkJob.results))  # type: ignore
+        update(BenchmarkJob)
+        .where(col(BenchmarkJob.status).in_(("pending", "running")), col(BenchmarkJob.worker_id).is_(None))
+        .values(status="failed", updated_at=datetime.now(UTC))
+        .returning(col(BenchmarkJob.id))
     )
+    job_ids = (await session.execute(statement)).scalars().all()
+    for job_id in job_ids:
+        await job_events.publish(session, job_id, {"type": "status", "status": "failed"})
+    await session.commit()
+    return len(job_ids)
+
+
+async def get_all_jobs(session: AsyncSession) -> list[BenchmarkJob]:
+    statement = select(BenchmarkJob).order_by(desc(BenchmarkJob.created_at))
     results = await session.execute(statement)
-    job = results.scalar_one_or_none()
+    return list(results.scalars().all())
 
-    if not job:
-        return None
 
-    # Calculate stats
-    total = len(job.results)
-    correct = 0
-    execution_error = 0
-    wrong_result = 0
-    total_latency = 0.0
-
-    for res in job.results:
-        if res.is_correct:
-            correct += 1
-
-        # Check for execution error
-        # Assuming "Generated SQL Error" indicates execution failure
-        if res.error and "Generated SQL Error" in res.error:
-            execution_error += 1
-        elif not res.is_correct:
-            # If not correct and no execution error (or at least generated SQL didn't fail), it's a wrong result
-            # Note: If ground truth failed but generated didn't, it might fall here.
-            # Ideally we want to count only where generated SQL ran but produced wrong result.
-            # If generated_sql is None, it's also an error (generation failure).
-            # For simplicity, if not correct and not execution error -> wrong result.
-            wrong_result += 1
-
-        if res.latency_ms:
-            total_latency += res.latency_ms
-
-    stats = BenchmarkStats(
+def _build_stats(
+    total: int, correct: int, execution_error: int, wrong_result: int, total_latency_ms: float
+) -> BenchmarkStats:
+    return BenchmarkStats(
         total=total,
         correct=correct,
         execution_error=execution_error,
         wrong_result=wrong_result,
         accuracy_score=(correct / total) if total > 0 else 0.0,
         valid_sql_rate=((total - execution_error) / total) if total > 0 else 0.0,
-        avg_latency_ms=(total_latency / total) if total > 0 else 0.0,
+        avg_latency_ms=(total_latency_ms / total) if total > 0 else 0.0,
+    )
+
+
+def _is_execution_error() -> ColumnElement[bool]:
+    # Rows written before error_class existed are classified from the error text
+    return func.coalesce(
+        or_(
+            col(BenchmarkResult.error_class).in_(EXECUTION_ERROR_CLASSES),
+            and_(
+                col(BenchmarkResult.error_class).is_(None),
+                col(BenchmarkResult.error).like("%Generated SQL Error%"),
+            ),
+        ),
+        False,
+    )
+
+
+def _is_correct() -> ColumnElement[bool]:
+    return func.coalesce(col(BenchmarkResult.is_correct), False)
+
+
+async def _aggregate_totals(session: AsyncSession, job_ids: list[UUID]) -> dict[str, Any]:
+    """
+    Aggregates the jobs' results in a single SQL query, backed by the index on benchmarkresult.job_id.
+    """
+    is_execution_error = _is_execution_error()
+    is_correct = _is_correct()
+
+    statement = sa_select(
+        func.count(),
+        func.count().filter(is_correct),
+        func.count().filter(is_execution_error),
+        func.count().filter(and_(not_(is_execution_error), not_(is_correct))),
+        func.coalesce(func.sum(BenchmarkResult.latency_ms), 0.0),
+    ).where(col(BenchmarkResult.job_id).in_(job_ids))
+    return dict(zip(SUMMARY_FIELDS, (await session.execute(statement)).one()))
+
+
+async def shard_job_ids(session: AsyncSession, job_id: UUID) -> list[UUID]:
+    """The jobs holding a job's results: its shard jobs if it was sharded, otherwise the job itself."""
+    statement = select(BenchmarkJob.id).where(col(BenchmarkJob.parent_id) == job_id)
+    return list((await session.execute(statement)).scalars().all()) or [job_id]
+
+
+async def _result_owners(session: AsyncSession, job_ids: list[UUID]) -> dict[UUID, UUID]:
+    """Maps the jobs holding the results of `job_ids` to the job (of `job_ids`) they count for."""
+    owners = {job_id: job_id for job_id in job_ids}
+    statement = select(BenchmarkJob.id, BenchmarkJob.parent_id).where(col(BenchmarkJob.parent_id).in_(job_ids))
+    for shard_id, parent_id in (await session.execute(statement)).all():
+        owners.pop(parent_id, None)
+        owners[shard_id] = parent_id
+    return owners
+
+
+def _owner_column(owners: dict[UUID, UUID]) -> ColumnElement[UUID] | Mapped[UUID]:
+    shards = {job_id: owner for job_id, owner in owners.items() if job_id != owner}
+    if not shards:
+        return col(BenchmarkResult.job_id)
+    return case(shards, value=col(BenchmarkResult.job_id), else_=col(BenchmarkResult.job_id))
+
+
+async def compute_job_stats(session: AsyncSession, job_id: UUID) -> BenchmarkStats:
+    return _build_stats(**await _aggregate_totals(session, await shard_job_ids(session, job_id)))
+
+
+async def _job_totals(session: AsyncSession, job_id: UUID) -> dict[str, Any]:
+    # Sharded jobs add up the totals of their shard jobs
+    job_ids = await shard_job_ids(session, job_id)
+    summaries = []
+    if settings.BENCHMARK_JOB_SUMMARY_ENABLED:
+        statement = select(BenchmarkJobSummary).where(col(BenchmarkJobSummary.job_id).in_(job_ids))
+        summaries = list((await session.execute(statement)).scalars().all())
+    if len(summaries) < len(job_ids):
+        # Jobs created before summaries were enabled fall back to aggregating their results
+        return await _aggregate_totals(session, job_ids)
+    return {name: sum(getattr(summary, name) for summary in summaries) for name in SUMMARY_FIELDS}
+
+
+async def get_job_stats(session: AsyncSession, job_id: UUID) -> BenchmarkStats:
+    return _build_stats(**await _job_totals(session, job_id))
+
+
+_PERCENTILES = (0.5, 0.95, 0.99)
+
+# Result columns holding the duration of each phase; generation covers the whole model call
+_PHASE_COLUMNS = {
+    "generation": BenchmarkResult.call_latency_ms,
+    "ground_truth": BenchmarkResult.ground_truth_ms,
+    "candidate": BenchmarkResult.candidate_ms,
+    "compare": BenchmarkResult.compare_ms,
+}
+
+
+def _percentiles(values: list[float] | None) -> LatencyPercentiles:
+    p50, p95, p99 = values or (None, None, None)
+    return LatencyPercentiles(p50=p50, p95=p95, p99=p99)
+
+
+async def add_latency_percentiles(session: AsyncSession, job_id: UUID, stats: BenchmarkStats) -> BenchmarkStats:
+    """
+    Fills the p50/p95/p99 of the endpoint latency and of every phase, computed in one pass over
+    the job's results with percentile_cont.
+    """
+    fractions = pg_array([literal(fraction) for fraction in _PERCENTILES])
+    columns = [BenchmarkResult.latency_ms, *_PHASE_COLUMNS.values()]
+    statement = select(*(func.percentile_cont(fractions).within_group(col(column)) for column in columns)).where(
+        col(BenchmarkResult.job_id).in_(await shard_job_ids(session, job_id))
     )
+    latency, *phases = (await session.execute(statement)).one()
+    stats.latency_percentiles = _percentiles(latency)
+    stats.phase_latency_ms = {phase: _percentiles(values) for phase, values in zip(_PHASE_COLUMNS, phases)}
+    return stats
 
-    return JobDetail(id=job.id, status=job.status, created_at=job.created_at, updated_at=job.updated_at, stats=stats)
+
+async def get_job_with_results(
+    session: AsyncSession, job_id: UUID, percentiles: bool = False
+) -> JobDetail | None:
+    job = await get_job(session, job_id)
+    if not job:
+        return None
+
+    stats = await get_job_stats(session, job_id)
+    if percentiles:
+        stats = await add_latency_percentiles(session, job_id, stats)
+    shards = [JobStatus.model_validate(shard) for shard in await get_shard_jobs(session, job_id)]
+    return JobDetail(
+        id=job.id,
+        status=job.status,
+        parent_id=job.parent_id,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        stats=stats,
+        shards=shards or None,
+    )
+
+
+_BREAKDOWN_DIMENSIONS = {"database": BenchmarkResult.database_name, "category": BenchmarkResult.category}
+_BREAKDOWN_FIELDS = ("job_id", "dimension", "key", "total", "correct", "execution_error")
+
+
+def _breakdown_statement(owners: dict[UUID, UUID], dimension: str) -> Select[Any]:
+    key = func.coalesce(col(_BREAKDOWN_DIMENSIONS[dimension]), "")
+    owner = _owner_column(owners)
+    # sqlmodel's select is only typed for up to four columns
+    return (
+        sa_select(
+            owner,
+            literal(dimension),
+            key,
+            func.count(),
+            func.count().filter(_is_correct()),
+            func.count().filter(_is_execution_error()),
+        )
+        .where(col(BenchmarkResult.job_id).in_(list(owners)))
+        .group_by(owner, key)
+    )
+
+
+async def refresh_job_breakdown(session: AsyncSession, job_id: UUID) -> None:
+    """Materializes a job's accuracy by database and by category. The caller commits."""
+    await session.execute(delete(BenchmarkJobBreakdown).where(col(BenchmarkJobBreakdown.job_id) == job_id))
+    owners = await _result_owners(session, [job_id])
+    for dimension in _BREAKDOWN_DIMENSIONS:
+        await session.execute(
+            insert(BenchmarkJobBreakdown).from_select(_BREAKDOWN_FIELDS, _breakdown_statement(owners, dimension))
+        )
+
+
+async def _job_breakdowns(session: AsyncSession, jobs: list[BenchmarkJob]) -> dict[UUID, list[BenchmarkJobBreakdown]]:
+    statement = select(BenchmarkJobBreakdown).where(col(BenchmarkJobBreakdown.job_id).in_([job.id for job in jobs]))
+    breakdowns: dict[UUID, list[BenchmarkJobBreakdown]] = defaultdict(list)
+    for breakdown in (await session.execute(statement)).scalars():
+        breakdowns[breakdown.job_id].append(breakdown)
+
+    # Jobs still running are aggregated live; completed jobs from before breakdowns existed
+    # are aggregated once and stored
+    missing = [job for job in jobs if job.id not in breakdowns]
+    if missing:
+        completed = {job.id for job in missing if job.status == "completed"}
+        owners = await _result_owners(session, [job.id for job in missing])
+        backfill = []
+        for dimension in _BREAKDOWN_DIMENSIONS:
+            rows = await session.execute(_breakdown_statement(owners, dimension))
+            for row in rows:
+                values = dict(zip(_BREAKDOWN_FIELDS, row))
+                breakdowns[values["job_id"]].append(BenchmarkJobBreakdown(**values))
+                if values["job_id"] in completed:
+                    backfill.append(values)
+        if backfill:
+            # Concurrent requests may backfill the same job; the first one wins
+            await session.execute(pg_insert(BenchmarkJobBreakdown).on_conflict_do_nothing(), backfill)
+            await session.commit()
+    return breakdowns
+
+
+def _accuracy(breakdowns: list[BenchmarkJobBreakdown], dimension: str) -> list[AccuracyBreakdown]:
+    return [
+        AccuracyBreakdown(
+            key=b.key,
+            total=b.total,
+            correct=b.correct,
+            execution_error=b.execution_error,
+            accuracy=(b.correct / b.total) if b.total > 0 else 0.0,
+        )
+        for b in sorted(breakdowns, key=lambda b: b.key)
+        if b.dimension == dimension
+    ]
+
+
+async def _leaderboard_entries(
+    session: AsyncSession, ranked: list[tuple[BenchmarkJob, BenchmarkStats]]
+) -> list[LeaderboardEntry]:
+    breakdowns = await _job_breakdowns(session, [job for job, _ in ranked])
+    return [
+        LeaderboardEntry(
+            id=job.id,
+            status=job.status,
+            endpoint_url=job.endpoint_url,
+            created_at=job.created_at,
+            stats=stats,
+            by_database=_accuracy(breakdowns[job.id], "database"),
+            by_category=_accuracy(breakdowns[job.id], "category"),
+        )
+        for job, stats in ranked
+    ]
+
+
+async def get_leaderboard(session: AsyncSession, limit: int) -> list[LeaderboardEntry]:
+    """Completed jobs ranked by accuracy, read from the job summaries and the stored breakdowns."""
+    statement = (
+        select(BenchmarkJob, BenchmarkJobSummary)
+        .outerjoin(BenchmarkJobSummary, col(BenchmarkJobSummary.job_id) == col(BenchmarkJob.id))
+        # Shard jobs are ranked through the job they were split from
+        .where(col(BenchmarkJob.status) == "completed", col(BenchmarkJob.parent_id).is_(None))
+    )
+    ranked = []
+    for job, summary in (await session.execute(statement)).all():
+        if summary is not None and settings.BENCHMARK_JOB_SUMMARY_ENABLED:
+            totals = {name: getattr(summary, name) for name in SUMMARY_FIELDS}
+        else:
+            totals = await _job_totals(session, job.id)
+        ranked.append((job, _build_stats(**totals)))
+    ranked.sort(key=lambda item: (item[1].accuracy_score, item[1].total), reverse=True)
+    return await _leaderboard_entries(session, ranked[:limit])
+
+
+async def compare_jobs(
+    session: AsyncSession, job_ids: list[UUID], after: str | None = None, limit: int = 100
+) -> JobComparison | None:
+    """
+    Per-database and per-category accuracy of several jobs, and the instances they disagree on,
+    paginated by instance_id. Returns None if one of the jobs does not exist.
+    """
+    job_ids = list(dict.fromkeys(job_ids))
+    jobs = await session.execute(select(BenchmarkJob).where(col(BenchmarkJob.id).in_(job_ids)))
+    jobs_by_id = {job.id: job for job in jobs.scalars()}
+    if len(jobs_by_id) != len(job_ids):
+        return None
+    ranked = [(jobs_by_id[job_id], await get_job_stats(session, job_id)) for job_id in job_ids]
+
+    is_correct = _is_correct()
+    owners = await _result_owners(session, job_ids)
+    owner = _owner_column(owners)
+    statement = (
+        sa_select(
+            col(BenchmarkResult.instance_id),
+            func.min(col(BenchmarkResult.database_name)),
+            func.min(col(BenchmarkResult.category)),
+            func.array_agg(owner).filter(is_correct),
+            func.array_agg(owner).filter(not_(is_correct)),
+        )
+        .where(col(BenchmarkResult.job_id).in_(list(owners)))
+        .group_by(col(BenchmarkResult.instance_id))
+        .having(and_(func.bool_or(is_correct), not_(func.bool_and(is_correct))))
+    )
+    if after is not None:
+        statement = statement.where(col(BenchmarkResult.instance_id) > after)
+    statement = statement.order_by(col(BenchmarkResult.instance_id)).limit(limit + 1)
+    rows = (await session.execute(statement)).all()
+
+    disagreements = [
+        InstanceDisagreement(
+            instance_id=instance_id,
+            database_name=database_name,
+            category=category,
+            correct_jobs=correct_jobs,
+            incorrect_jobs=incorrect_jobs,
+        )
+        for instance_id, database_name, category, correct_jobs, incorrect_jobs in rows[:limit]
+    ]
+    next_cursor = disagreements[-1].instance_id if len(rows) > limit else None
+    return JobComparison(
+        jobs=await _leaderboard_entries(session, ranked), disagreements=disagreements, next_cursor=next_cursor
+    )
+
+
+def _results_statement(job_id: UUID, filters: ResultFilter) -> Select[tuple[BenchmarkResult, str]]:
+    # The question is None for results whose instance is missing (outer join)
+    statement = (
+        sa_select(BenchmarkResult, col(BenchmarkInstance.question))
+        .outerjoin(BenchmarkInstance, col(BenchmarkInstance.instance_id) == col(BenchmarkResult.instance_id))
+        .where(col(BenchmarkResult.job_id) == job_id)
+    )
+    if filters.is_correct is not None:
+        statement = statement.where(func.coalesce(col(BenchmarkResult.is_correct), False) == filters.is_correct)
+    if filters.error_class is not None:
+        statement = statement.where(col(BenchmarkResult.error_class) == filters.error_class)
+    if filters.database_name is not None:
+        statement = statement.where(col(BenchmarkResult.database_name) == filters.database_name)
+    return statement.order_by(col(BenchmarkResult.id))
+
+
+def _result_schema(result: BenchmarkResult, question: str | None) -> BenchmarkResultSchema:
+    schema = BenchmarkResultSchema.model_validate(result)
+    # Legacy rows carry their own question
+    if schema.question is None:
+        schema.question = question
+    return schema
+
+
+async def get_job_results_page(
+    session: AsyncSession, job_id: UUID, filters: ResultFilter, after: int | None = None, limit: int = 100
+) -> BenchmarkResultPage:
+    statement = _results_statement(job_id, filters)
+    if after is not None:
+        statement = statement.where(col(BenchmarkResult.id) > after)
+    # Fetch one extra row to know whether another page exists
+    rows = (await session.execute(statement.limit(limit + 1))).all()
+    items = [_result_schema(result, question) for result, question in rows[:limit]]
+    next_cursor = items[-1].id if len(rows) > limit else None
+    return BenchmarkResultPage(items=items, next_cursor=next_cursor)
+
+
+async def stream_job_results(job_id: UUID, filters: ResultFilter) -> AsyncGenerator[BenchmarkResultSchema]:
+    """
+    Yields a job's results from a server-side cursor, so exports never hold the whole job in memory.
+    Uses its own session because it outlives the request handler.
+    """
+    async_session = async_sessionmaker(engine, expire_on_commit=False)
+    async with async_session() as session:
+        result = await session.stream(
+            _results_statement(job_id, filters).execution_options(yield_per=settings.RESULT_EXPORT_BATCH_SIZE)
+        )
+        async for row, question in result:
+            yield _result_schema(row, question)
+
+
+_TERMINAL_STATUSES = ("completed", "failed")
+
+
+async def stream_job_events(job_id: UUID) -> AsyncGenerator[dict[str, Any] | None]:
+    """
+    Yields a job's status and progress as they change: a snapshot first, then one progress event
+    per persisted batch of results, until the job completes or fails. Yields None when nothing
+    happened for JOB_EVENTS_KEEPALIVE seconds, so the caller can keep the connection alive.
+    Uses its own session because it outlives the request handler.
+    """
+    async with job_events.subscribe(job_id) as queue:
+        # Subscribe before reading the snapshot, so no event is missed in between
+        async_session = async_sessionmaker(engine, expire_on_commit=False)
+        async with async_session() as session:
+            job = await get_job(session, job_id)
+            if job is None:
+                return
+            totals = await _job_totals(session, job_id)
+        status = job.status
+        started_total, started_at = totals["total"], time.monotonic()
+        latest_errors: deque[dict[str, Any]] = deque(maxlen=10)
+
+        def progress() -> dict[str, Any]:
+            elapsed = time.monotonic() - started_at
+            return {
+                "type": "progress",
+                **_build_stats(**totals).model_dump(),
+                # Instances per second since the stream was opened
+                "throughput": (totals["total"] - started_total) / elapsed if elapsed > 0 else 0.0,
+                "latest_errors": list(latest_errors),
+            }
+
+        yield {"type": "status", "status": status}
+        yield progress()
+        while status not in _TERMINAL_STATUSES:
+            try:
+                event = await asyncio.wait_for(queue.get(), settings.JOB_EVENTS_KEEPALIVE)
+            except TimeoutError:
+                yield None
+                continue
+
+            if event["type"] == "status":
+                status = event["status"]
+                yield {"type": "status", "status": status}
+            elif event["type"] == "progress":
+                # Running totals are exact; increments are only used for jobs without a summary
+                if event.get("totals") is not None:
+                    totals = event["totals"]
+                else:
+                    totals = {name: totals[name] + event["increment"][name] for name in SUMMARY_FIELDS}
+                latest_errors.extend(event.get("errors") or [])
+                yield progress()
@@ -0,0 +1,177 @@
+"""
+Memoization of candidate SQL executions across jobs.
+
+Candidates are keyed by a fingerprint of their normalized text: comments removed, whitespace
+collapsed and everything outside string literals and quoted identifiers lowercased (Postgres folds
+unquoted identifiers to lowercase, so this never merges queries that could behave differently).
+Results are stored in the results database, fronted by an in-memory LRU.
+"""
+
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+from dataclasses import asdict
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import col, select
+
+from config import settings
+from db.session import engine
+from models.models import CandidateResultMemo
+from services.comparison import ResultDigest
+from services.ground_truth_cache import gt_cache
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(
+    r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+    |(?P<string>'(?:[^']|'')*')
+    |(?P<identifier>"(?:[^"]|"")*")
+    |(?P<dollar>\$(?P<tag>[A-Za-z_][A-Za-z0-9_]*|)\$.*?\$(?P=tag)\$)
+    |(?P<space>\s+)
+    |(?P<other>[^\s'"$/-]+|.)
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+
+# No space is needed around these to keep tokens apart
+_TIGHT = {"(", ")", ","}
+
+
+def normalize_sql(sql: str) -> str:
+    parts: list[str] = []
+    separated = False
+    for match in _TOKEN.finditer(sql):
+        kind = match.lastgroup
+        if kind in ("comment", "space"):
+            separated = True
+            continue
+        token = match.group().lower() if kind == "other" else match.group()
+        for piece in re.split(r"([(),])", token) if kind == "other" else [token]:
+            if not piece:
+                continue
+            if separated and parts and parts[-1] not in _TIGHT and piece not in _TIGHT:
+                parts.append(" ")
+            separated = False
+            parts.append(piece)
+    return "".join(parts).rstrip("; ")
+
+
+def split_sql(sql: str) -> list[str]:
+    """Splits a script on the semicolons outside strings, identifiers and comments, dropping empty statements."""
+    statements: list[str] = []
+    start = 0
+    for match in _TOKEN.finditer(sql):
+        if match.lastgroup != "other":
+            continue
+        offset = match.group().find(";")
+        while offset != -1:
+            statements.append(sql[start : match.start() + offset])
+            start = match.start() + offset + 1
+            offset = match.group().find(";", offset + 1)
+    statements.append(sql[start:])
+    return [statement.strip() for statement in statements if normalize_sql(statement)]
+
+
+def fingerprint_sql(sql: str) -> str:
+    return hashlib.sha256(normalize_sql(sql).encode()).hexdigest()
+
+
+# SQLSTATE classes of errors that are a property of the query rather than of the moment it ran:
+# cardinality violations, data exceptions, syntax errors and access rule violations
+_DETERMINISTIC_SQLSTATE_CLASSES = ("21", "22", "42")
+_DETERMINISTIC_SQLSTATES = ("25006",)  # writing in the read-only sandbox
+
+
+def is_deterministic_error(sqlstate: str | None) -> bool:
+    if not sqlstate:
+        return False
+    return sqlstate[:2] in _DETERMINISTIC_SQLSTATE_CLASSES or sqlstate in _DETERMINISTIC_SQLSTATES
+
+
+class CandidateMemo:
+    """
+    (database, fingerprint) -> result digest or deterministic error message.
+    If the results database is unreachable, the memo disables itself for the process and
+    candidates are simply executed.
+    """
+
+    def __init__(self, max_entries: int = 10000, enabled: bool = True) -> None:
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: OrderedDict[tuple[str, str], tuple[ResultDigest | None, str | None]] = OrderedDict()
+
+    @property
+    def version(self) -> str:
+        # Digests also depend on the row cap, since capped digests are marked truncated
+        return f"{gt_cache.version}-r{settings.COMPARISON_MAX_ROWS}"
+
+    def _remember(self, key: tuple[str, str], entry: tuple[ResultDigest | None, str | None]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disable(self, error: Exception) -> None:
+        logger.warning("Candidate memo disabled, the results database is not usable: %s", error)
+        self.enabled = False
+
+    async def get(self, database_name: str, sql: str) -> tuple[ResultDigest | None, str | None] | None:
+        """Returns the stored (digest, error) of an equivalent candidate, or None if there is none."""
+        if not self.enabled:
+            return None
+        key = (database_name, fingerprint_sql(sql))
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+
+        statement = select(CandidateResultMemo.digest, CandidateResultMemo.error).where(
+            col(CandidateResultMemo.database_name) == database_name,
+            col(CandidateResultMemo.fingerprint) == key[1],
+            col(CandidateResultMemo.version) == self.version,
+        )
+        try:
+            async with engine.connect() as conn:
+                row = (await conn.execute(statement)).one_or_none()
+        except Exception as e:
+            self._disable(e)
+            return None
+        if row is None:
+            return None
+        digest, error = row
+        entry = (ResultDigest(**digest) if digest is not None else None, error)
+        self._remember(key, entry)
+        return entry
+
+    async def put(self, database_name: str, sql: str, digest: ResultDigest | None, error: str | None) -> None:
+        if not self.enabled:
+            return
+        key = (database_name, fingerprint_sql(sql))
+        self._remember(key, (digest, error))
+        statement = (
+            pg_insert(CandidateResultMemo)
+            .values(
+                database_name=database_name,
+                fingerprint=key[1],
+                version=self.version,
+                digest=asdict(digest) if digest is not None else None,
+                error=error,
+            )
+            .on_conflict_do_nothing()
+        )
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(statement)
+        except Exception as e:
+            self._disable(e)
+
+    def clear_memory(self) -> None:
+        self._entries.clear()
+
+
+candidate_memo = CandidateMemo(
+    max_entries=settings.CANDIDATE_MEMO_MAX_ENTRIES, enabled=settings.CANDIDATE_MEMO_ENABLED
+)
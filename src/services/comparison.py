@@ -0,0 +1,104 @@
+import hashlib
+import json
+import math
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from decimal import ROUND_HALF_EVEN, Context, Decimal
+from typing import Any
+from uuid import UUID
+
+_HASH_MODULUS = 2**64
+
+# Bumped whenever canonical_value changes, so stored digests (ground-truth cache, candidate memo) are recomputed
+DIGEST_VERSION = 2
+
+
+def _decimal_text(number: Decimal, float_places: int) -> str:
+    # Exact: the precision covers every digit up to `float_places`, so large values never collapse together
+    precision = max(number.adjusted(), 0) + float_places + 2
+    rounded = number.quantize(Decimal(1).scaleb(-float_places), ROUND_HALF_EVEN, Context(prec=precision))
+    if rounded.is_zero():
+        return "0"
+    return format(rounded.normalize(Context(prec=precision)), "f")
+
+
+def canonical_value(value: Any, float_places: int) -> str:
+    """
+    Stable textual form of a result value, used for order-insensitive hashing.
+    Numbers that round to the same value at `float_places` decimals map to the same string (so 1,
+    1.0 and Decimal("1.000") compare equal), and JSON/array values are canonicalized recursively.
+    Integers and Decimals are rounded exactly; only real floats go through float rounding.
+    Rounding is not an epsilon: two numbers closer than 10**-float_places can still round apart
+    (0.1234576 and 0.1234574 at 6 places), since a hash cannot see how close two values are.
+    """
+    if value is None or isinstance(value, bool):
+        return repr(value)
+    if isinstance(value, int):
+        return _decimal_text(Decimal(value), float_places)
+    if isinstance(value, Decimal):
+        if not value.is_finite():
+            return repr(float(value))
+        return _decimal_text(value, float_places)
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            return repr(value)
+        # The shortest repr of the rounded float, so 0.1 and Decimal("0.1") give the same text
+        return _decimal_text(Decimal(repr(round(value, float_places))), float_places)
+    if isinstance(value, str):
+        return repr(value)
+    if isinstance(value, list | tuple):
+        return "[" + ",".join(canonical_value(item, float_places) for item in value) + "]"
+    if isinstance(value, dict):
+        items = sorted((str(key), canonical_value(item, float_places)) for key, item in value.items())
+        return "{" + ",".join(f"{key!r}:{item}" for key, item in items) + "}"
+    if isinstance(value, UUID):
+        return f"uuid:{value}"
+    if isinstance(value, bytes | bytearray | memoryview):
+        return f"bytes:{bytes(value).hex()}"
+    if isinstance(value, datetime | date | time | timedelta):
+        return f"{type(value).__name__}:{value.isoformat() if not isinstance(value, timedelta) else value}"
+    return f"{type(value).__name__}:{json.dumps(value, default=str, sort_keys=True)}"
+
+
+def row_hash(row: Sequence[Any], float_places: int) -> int:
+    payload = "\x1f".join(canonical_value(value, float_places) for value in row)
+    return int.from_bytes(hashlib.blake2b(payload.encode(), digest_size=8).digest(), "big")
+
+
+@dataclass
+class ResultDigest:
+    """
+    Order-insensitive multiset checksum of a result set.
+    The checksum is the sum of per-row hashes modulo 2**64, so it can be built from streamed rows
+    and duplicates are accounted for. `truncated` means the row cap was hit before the end.
+    """
+
+    row_count: int = 0
+    column_count: int = 0
+    checksum: int = 0
+    truncated: bool = False
+
+    def add(self, row: Sequence[Any], float_places: int) -> None:
+        self.row_count += 1
+        self.checksum = (self.checksum + row_hash(row, float_places)) % _HASH_MODULUS
+
+
+@dataclass
+class ComparisonResult:
+    is_equal: bool
+    reason: str | None = None
+
+
+def compare_digests(expected: ResultDigest, generated: ResultDigest) -> ComparisonResult:
+    if expected.truncated or generated.truncated:
+        raise ValueError("Truncated digests cannot be compared")
+    if expected.row_count != generated.row_count:
+        return ComparisonResult(False, f"Row count differs: expected {expected.row_count}, got {generated.row_count}")
+    if expected.row_count and expected.column_count != generated.column_count:
+        return ComparisonResult(
+            False, f"Column count differs: expected {expected.column_count}, got {generated.column_count}"
+        )
+    if expected.checksum != generated.checksum:
+        return ComparisonResult(False, "Row values differ")
+    return ComparisonResult(True)
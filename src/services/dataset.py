@@ -1,28 +1,151 @@
+import hashlib
 import json
+import os
+from collections import defaultdict
 from typing import Any
 
 from config import settings
 
 
-def get_benchmark_data() -> list[dict[str, Any]]:
-    input_data = {}
-    with open(settings.BENCHMARK_INPUT_FILE_PATH) as f:
-        for line in f:
-            if line.strip():
-                item = json.loads(line)
-                input_data[item["instance_id"]] = item
+class DatasetStore:
+    """
+    In-memory, indexed view of the merged benchmark dataset.
+
+    The input and ground-truth files are parsed once and re-read only when either file's mtime
+    changes. Records are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, input_path: str, gt_path: str) -> None:
+        self.input_path = input_path
+        self.gt_path = gt_path
+        self._mtimes: tuple[int, int] | None = None
+        self._items: list[dict[str, Any]] = []
+        self._by_id: dict[str, dict[str, Any]] = {}
+        self._positions: dict[str, int] = {}
+        self._by_database: dict[str, list[dict[str, Any]]] = {}
+        self._by_category: dict[str, list[dict[str, Any]]] = {}
+
+    def _current_mtimes(self) -> tuple[int, int]:
+        return os.stat(self.input_path).st_mtime_ns, os.stat(self.gt_path).st_mtime_ns
+
+    def _refresh(self) -> None:
+        mtimes = self._current_mtimes()
+        if mtimes != self._mtimes:
+            self._load()
+            self._mtimes = mtimes
+
+    def _load(self) -> None:
+        input_data = _read_jsonl(self.input_path)
+        gt_data = _read_jsonl(self.gt_path)
+
+        items = []
+        by_database: dict[str, list[dict[str, Any]]] = defaultdict(list)
+        by_category: dict[str, list[dict[str, Any]]] = defaultdict(list)
+        for instance_id, item in input_data.items():
+            if instance_id in gt_data:
+                item.update(gt_data[instance_id])
+                items.append(item)
+                by_database[item.get("selected_database", "")].append(item)
+                by_category[item.get("category", "")].append(item)
+
+        self._items = items
+        self._by_id = {item["instance_id"]: item for item in items}
+        self._positions = {item["instance_id"]: position for position, item in enumerate(items)}
+        self._by_database = dict(by_database)
+        self._by_category = dict(by_category)
+
+    def version(self) -> tuple[int, int]:
+        """Changes whenever the dataset is reloaded."""
+        self._refresh()
+        assert self._mtimes is not None
+        return self._mtimes
+
+    def all(self) -> list[dict[str, Any]]:
+        self._refresh()
+        return list(self._items)
+
+    def get(self, instance_id: str) -> dict[str, Any] | None:
+        self._refresh()
+        return self._by_id.get(instance_id)
 
-    gt_data = {}
-    with open(settings.BENCHMARK_GT_FILE_PATH) as f:
+    def in_dataset_order(self, items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        self._refresh()
+        return sorted(items, key=lambda item: self._positions[item["instance_id"]])
+
+    def by_database(self, database_name: str) -> list[dict[str, Any]]:
+        self._refresh()
+        return list(self._by_database.get(database_name, []))
+
+    def by_category(self, category: str) -> list[dict[str, Any]]:
+        self._refresh()
+        return list(self._by_category.get(category, []))
+
+
+def _read_jsonl(path: str) -> dict[str, dict[str, Any]]:
+    data = {}
+    with open(path) as f:
         for line in f:
             if line.strip():
                 item = json.loads(line)
-                gt_data[item["instance_id"]] = item
+                data[item["instance_id"]] = item
+    return data
+
+
+dataset_store = DatasetStore(settings.BENCHMARK_INPUT_FILE_PATH, settings.BENCHMARK_GT_FILE_PATH)
+
+
+def get_benchmark_data() -> list[dict[str, Any]]:
+    return dataset_store.all()
+
+
+def get_instance(instance_id: str) -> dict[str, Any] | None:
+    return dataset_store.get(instance_id)
+
+
+def _stable_hash(*parts: str) -> int:
+    return int.from_bytes(hashlib.blake2b("\0".join(parts).encode(), digest_size=8).digest(), "big")
+
 
-    merged_data = []
-    for instance_id, item in input_data.items():
-        if instance_id in gt_data:
-            item.update(gt_data[instance_id])
-            merged_data.append(item)
+def select_instances(
+    store: DatasetStore = dataset_store,
+    *,
+    databases: list[str] | None = None,
+    categories: list[str] | None = None,
+    instance_ids: list[str] | None = None,
+    sample_size: int | None = None,
+    sample_seed: int = 0,
+    shard_index: int | None = None,
+    num_shards: int | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Narrows the dataset to a subset and/or one shard of it, keeping the dataset order.
 
-    return merged_data
+    The most selective filter is served from the store's indexes and the others are applied to
+    what it returns. Sampling and sharding hash the instance id instead of using positions, so
+    the same seed picks the same instances and an instance stays in the same shard when the
+    dataset grows.
+    """
+    if instance_ids is not None:
+        items = [item for instance_id in dict.fromkeys(instance_ids) if (item := store.get(instance_id)) is not None]
+    elif databases is not None:
+        items = [item for name in dict.fromkeys(databases) for item in store.by_database(name)]
+    elif categories is not None:
+        items = [item for name in dict.fromkeys(categories) for item in store.by_category(name)]
+    else:
+        items = store.all()
+    if databases is not None and instance_ids is not None:
+        wanted_databases = set(databases)
+        items = [item for item in items if item.get("selected_database", "") in wanted_databases]
+    if categories is not None and (instance_ids is not None or databases is not None):
+        wanted_categories = set(categories)
+        items = [item for item in items if item.get("category", "") in wanted_categories]
+    if instance_ids is not None or databases is not None or categories is not None:
+        # Index lookups return the instances grouped by key
+        items = store.in_dataset_order(items)
+    if sample_size is not None and sample_size < len(items):
+        ranked = sorted(items, key=lambda item: _stable_hash(str(sample_seed), item["instance_id"]))
+        sampled = {item["instance_id"] for item in ranked[:sample_size]}
+        items = [item for item in items if item["instance_id"] in sampled]
+    if shard_index is not None and num_shards is not None:
+        items = [item for item in items if _stable_hash(item["instance_id"]) % num_shards == shard_index]
+    return items
@@ -1,11 +1,20 @@
+import asyncio
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from typing import Any, cast
 
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import AsyncConnection
 
 from config import settings
-from models.schemas import ManualEvaluationStats
-from services.dataset import get_benchmark_data
+from db.bench_engines import bench_engines
+from models.models import ErrorClass
+from models.schemas import BatchEvaluationItem, BatchEvaluationSummary, ManualEvaluationStats, PredictionItem
+from services.candidate_memo import CandidateMemo, candidate_memo, is_deterministic_error, normalize_sql
+from services.comparison import ComparisonResult, ResultDigest, compare_digests
+from services.dataset import get_benchmark_data, get_instance
+from services.ground_truth_cache import gt_cache
 
 
 class EvaluationError(Exception):
@@ -20,18 +29,26 @@ class GroundTruthQueryError(EvaluationError):
     pass
 
 
-async def manual_evaluate_query(instance_id: str, generated_sql: str) -> ManualEvaluationStats:
+class HarnessError(EvaluationError):
+    """The evaluation could not run (e.g. no pooled connection), so the SQL was not judged."""
+
+
+async def manual_evaluate_query(
+    instance_id: str,
+    generated_sql: str,
+    evaluation_mode: str | None = None,
+    memo: CandidateMemo | None = candidate_memo,
+) -> ManualEvaluationStats:
     """
     Service function to manually evaluate a generated SQL query against the ground truth.
+    `memo` is the candidate memo to consult (None executes the candidate unconditionally).
     """
-    dataset = get_benchmark_data()
-    instance = next((item for item in dataset if item["instance_id"] == instance_id), None)
+    instance = get_instance(instance_id)
 
     if not instance:
         raise InstanceNotFoundError("Instance not found")
 
     db_name = cast(str, instance.get("selected_database"))
-    print(f"DATABASE USED FOR EVALUATION: {db_name}")  # Temporary debug log
     sol_sql_list = cast(list[str], instance.get("sol_sql", []))
 
     if not db_name:
@@ -40,15 +57,22 @@ async def manual_evaluate_query(instance_id: str, generated_sql: str) -> ManualE
     if not sol_sql_list:
         raise InstanceNotFoundError("Ground truth SQL not found for instance")
 
+    if (evaluation_mode or settings.EVALUATION_MODE) == "livesqlbench":
+        return await _manual_evaluate_livesql(instance, generated_sql)
+
     ground_truth_sql = sol_sql_list[0]
 
     # Execute ground truth query
-    gt_result, gt_error = await execute_query(db_name, ground_truth_sql)
+    gt_result, gt_error = await execute_ground_truth(db_name, ground_truth_sql)
+    if gt_error and gt_error.harness:
+        raise HarnessError(str(gt_error))
     if gt_error:
         raise GroundTruthQueryError(f"Error executing ground truth query: {gt_error}")
 
     # Execute generated query
-    gen_result, gen_error = await execute_query(db_name, generated_sql)
+    gen_result, gen_error = await execute_candidate(db_name, generated_sql, memo)
+    if gen_error and gen_error.harness:
+        raise HarnessError(str(gen_error))
     if gen_error:
         return ManualEvaluationStats(
             correct=0,
@@ -57,12 +81,13 @@ async def manual_evaluate_query(instance_id: str, generated_sql: str) -> ManualE
             accuracy_score=0.0,
             valid_sql_rate=0.0,
             is_correct=False,
-            error=gen_error,
+            error=str(gen_error),
+            error_class=candidate_error_class(gen_error),
         )
 
-    is_correct = compare_results(gt_result, gen_result)
+    comparison = await compare_query_results(db_name, ground_truth_sql, gt_result, generated_sql, gen_result)
 
-    if is_correct:
+    if comparison.is_equal:
         return ManualEvaluationStats(
             correct=1,
             execution_error=0,
@@ -80,48 +105,350 @@ async def manual_evaluate_query(instance_id: str, generated_sql: str) -> ManualE
             accuracy_score=0.0,
             valid_sql_rate=1.0,
             is_correct=False,
-            error="The result of the query is not correct",
+            error=f"The result of the query is not correct: {comparison.reason}",
         )
 
 
-async def execute_query(database_name: str, query: str) -> tuple[list[Any] | None, str | None]:
+@dataclass
+class QueryError:
+    message: str
+    timed_out: bool = False
+    sqlstate: str | None = None
+    # The harness failed, not the query: it says nothing about the SQL
+    harness: bool = False
+
+    def __str__(self) -> str:
+        return self.message
+
+
+# lock_not_available (lock_timeout fired) and deadlock_detected: another evaluation held the lock
+_CONCURRENCY_SQLSTATES = ("55P03", "40P01")
+
+
+def query_error(error: BaseException) -> QueryError:
+    if isinstance(error, TimeoutError):
+        return QueryError("Query cancelled: statement timeout exceeded", timed_out=True)
+    if isinstance(error, exc.TimeoutError):
+        # Raised by the pool when no connection could be checked out in time
+        return QueryError(f"No benchmark database connection available: {error}", harness=True)
+    # asyncpg's QueryCanceledError (SQLSTATE 57014), raised when statement_timeout fires server side
+    current: BaseException | None = error
+    while current is not None:
+        sqlstate = getattr(current, "sqlstate", None) or getattr(current, "pgcode", None)
+        if sqlstate:
+            return QueryError(
+                str(error),
+                timed_out=sqlstate == "57014",
+                sqlstate=sqlstate,
+                harness=sqlstate in _CONCURRENCY_SQLSTATES,
+            )
+        current = getattr(current, "orig", None) or current.__cause__
+    return QueryError(str(error))
+
+
+def candidate_error_class(error: QueryError) -> ErrorClass:
+    """Error class of a failed candidate; harness failures are not held against the model."""
+    if error.harness:
+        return ErrorClass.HARNESS
+    return ErrorClass.TIMEOUT if error.timed_out else ErrorClass.EXECUTION
+
+
+@asynccontextmanager
+async def sandboxed(
+    database_name: str, read_only: bool = True, deadline: float | None = None
+) -> AsyncGenerator[AsyncConnection]:
     """
-    Executes a query on the specified benchmark database.
-    Returns a tuple of (result_rows, error_message).
+    Sandboxed connection for benchmark queries: read-only transaction (rolled back afterwards) with
+    the configured statement_timeout, lock_timeout and work_mem, and a client-side deadline as a backstop.
+    The deadline defaults to one statement's worth; callers running several statements pass their own.
     """
-    # Construct connection string for the specific database
-    base_url = settings.BENCHMARK_DB_URL
-    if "/postgres" in base_url:
-        db_url = base_url.replace("/postgres", f"/{database_name}")
-    else:
-        return None, f"Invalid BENCHMARK_DB_URL format: {base_url}"
+    timeout_ms = settings.QUERY_STATEMENT_TIMEOUT_MS
+    if deadline is None and timeout_ms:
+        deadline = timeout_ms / 1000 + settings.QUERY_CANCEL_GRACE
+    async with bench_engines.sandbox(
+        database_name,
+        read_only=read_only,
+        statement_timeout_ms=timeout_ms,
+        lock_timeout_ms=settings.QUERY_LOCK_TIMEOUT_MS,
+        work_mem=settings.QUERY_WORK_MEM or None,
+    ) as conn:
+        # Waiting for a pooled connection does not count against the deadline
+        async with asyncio.timeout(deadline):
+            yield conn
+
+
+async def _manual_evaluate_livesql(instance: dict[str, Any], generated_sql: str) -> ManualEvaluationStats:
+    # Imported here because livesql_evaluation builds on this module
+    from services.livesql_evaluation import evaluate_livesql
 
+    verdict = await evaluate_livesql(instance, generated_sql)
+    if verdict.error_class == ErrorClass.HARNESS:
+        raise HarnessError(verdict.error or "Evaluation failed")
+    if verdict.error_class == ErrorClass.GROUND_TRUTH:
+        raise GroundTruthQueryError(f"Error preparing the instance: {verdict.error}")
+    if verdict.error:
+        return ManualEvaluationStats(
+            correct=0,
+            execution_error=1,
+            wrong_result=0,
+            accuracy_score=0.0,
+            valid_sql_rate=0.0,
+            is_correct=False,
+            error=verdict.error,
+            error_class=verdict.error_class,
+        )
+    if not verdict.is_correct:
+        return ManualEvaluationStats(
+            correct=0,
+            execution_error=0,
+            wrong_result=1,
+            accuracy_score=0.0,
+            valid_sql_rate=1.0,
+            is_correct=False,
+            error=f"The result of the query is not correct: {verdict.reason}",
+        )
+    return ManualEvaluationStats(
+        correct=1,
+        execution_error=0,
+        wrong_result=0,
+        accuracy_score=1.0,
+        valid_sql_rate=1.0,
+        is_correct=True,
+        error=None,
+    )
+
+
+def _skipped_item(index: int, prediction: PredictionItem, error: str, error_class: str | None) -> BatchEvaluationItem:
+    return BatchEvaluationItem(
+        index=index,
+        instance_id=prediction.instance_id,
+        skipped=True,
+        correct=0,
+        execution_error=0,
+        wrong_result=0,
+        accuracy_score=0.0,
+        valid_sql_rate=0.0,
+        is_correct=False,
+        error=error,
+        error_class=error_class,
+    )
+
+
+async def _evaluate_prediction(
+    index: int, prediction: PredictionItem, evaluation_mode: str | None, memo: CandidateMemo | None
+) -> BatchEvaluationItem:
     try:
-        engine = create_async_engine(db_url, echo=False)
-        async with engine.connect() as conn:
-            result = await conn.execute(text(query))
-            rows = result.fetchall()
-            return [tuple(row) for row in rows], None
+        stats = await manual_evaluate_query(prediction.instance_id, prediction.generated_sql, evaluation_mode, memo)
+    except InstanceNotFoundError as e:
+        return _skipped_item(index, prediction, str(e), None)
+    except GroundTruthQueryError as e:
+        return _skipped_item(index, prediction, str(e), ErrorClass.GROUND_TRUTH)
+    except HarnessError as e:
+        return _skipped_item(index, prediction, str(e), ErrorClass.HARNESS)
     except Exception as e:
-        return None, str(e)
+        return _skipped_item(index, prediction, f"An unexpected error occurred: {e}", None)
+    return BatchEvaluationItem(index=index, instance_id=prediction.instance_id, **stats.model_dump())
+
+
+async def batch_evaluate(
+    predictions: list[PredictionItem],
+    evaluation_mode: str | None = None,
+    concurrency: int | None = None,
+    memo: CandidateMemo | None = candidate_memo,
+) -> AsyncGenerator[BatchEvaluationItem | BatchEvaluationSummary]:
+    """
+    Evaluates predictions concurrently, yielding each item as soon as it is scored and then a summary.
+    Predictions are taken in database order, so the queries in flight mostly share a database and
+    reuse its pooled connections and cached ground truth.
+    """
+    concurrency = concurrency or settings.BATCH_EVALUATION_CONCURRENCY
+
+    def database(prediction: PredictionItem) -> str:
+        instance = get_instance(prediction.instance_id)
+        return instance.get("selected_database", "") if instance else ""
+
+    pending = iter(sorted(enumerate(predictions), key=lambda pair: database(pair[1])))
+    scored: asyncio.Queue[BatchEvaluationItem] = asyncio.Queue()
+
+    async def worker() -> None:
+        for index, prediction in pending:
+            await scored.put(await _evaluate_prediction(index, prediction, evaluation_mode, memo))
+
+    correct = execution_error = wrong_result = skipped = 0
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(predictions)))]
+    try:
+        for _ in predictions:
+            item = await scored.get()
+            skipped += item.skipped
+            correct += item.correct
+            execution_error += item.execution_error
+            wrong_result += item.wrong_result
+            yield item
     finally:
-        await engine.dispose()
+        # Stops the evaluation when the client goes away
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    yield batch_summary(len(predictions), correct, execution_error, wrong_result, skipped)
+
+
+def batch_summary(
+    total: int, correct: int, execution_error: int, wrong_result: int, skipped: int
+) -> BatchEvaluationSummary:
+    scored_total = total - skipped
+    return BatchEvaluationSummary(
+        total=total,
+        correct=correct,
+        execution_error=execution_error,
+        wrong_result=wrong_result,
+        skipped=skipped,
+        accuracy_score=(correct / scored_total) if scored_total > 0 else 0.0,
+        valid_sql_rate=((scored_total - execution_error) / scored_total) if scored_total > 0 else 0.0,
+    )
 
 
-def compare_results(expected_rows: list[Any] | None, generated_rows: list[Any] | None) -> bool:
+async def digest_query(
+    database_name: str, query: str, max_rows: int | None = None
+) -> tuple[ResultDigest | None, QueryError | None]:
     """
-    Compares two sets of results.
+    Executes a query on the specified benchmark database, streaming rows from a server-side
+    cursor into an order-insensitive digest instead of materializing them.
+    Stops after `max_rows` rows (default settings.COMPARISON_MAX_ROWS) and marks the digest truncated.
+    Returns a tuple of (digest, error_message).
     """
-    if expected_rows is None or generated_rows is None:
-        return False
+    try:
+        async with sandboxed(database_name) as conn:
+            return await digest_on(conn, query, max_rows), None
+    except Exception as e:
+        return None, query_error(e)
+
+
+async def digest_on(conn: AsyncConnection, query: str, max_rows: int | None = None) -> ResultDigest:
+    """Streams `query` on an open connection into a digest; see digest_query."""
+    max_rows = max_rows or settings.COMPARISON_MAX_ROWS
+    places = settings.COMPARISON_FLOAT_PLACES
+    result = await conn.stream(text(query))
+    digest = ResultDigest(column_count=len(result.keys()))
+    async for partition in result.partitions(1000):
+        for row in partition:
+            if digest.row_count >= max_rows:
+                digest.truncated = True
+                break
+            digest.add(row, places)
+        if digest.truncated:
+            break
+    await result.close()
+    return digest
+
+
+async def execute_candidate(
+    database_name: str, query: str, memo: CandidateMemo | None = candidate_memo
+) -> tuple[ResultDigest | None, QueryError | None]:
+    """
+    Like digest_query, but reuses the stored outcome of an equivalent candidate (same normalized
+    fingerprint) on the same database. Only results and errors that would recur are stored.
+    Without a `memo` the candidate is always executed.
+    """
+    if memo is None:
+        return await digest_query(database_name, query)
+    memoized = await memo.get(database_name, query)
+    if memoized is not None:
+        digest, message = memoized
+        return digest, QueryError(message) if message is not None else None
+
+    digest, error = await digest_query(database_name, query)
+    if error is None:
+        await memo.put(database_name, query, digest, None)
+    elif is_deterministic_error(error.sqlstate):
+        await memo.put(database_name, query, None, str(error))
+    return digest, error
 
-    if len(expected_rows) != len(generated_rows):
-        return False
 
+async def execute_ground_truth(database_name: str, query: str) -> tuple[ResultDigest | None, QueryError | None]:
+    """
+    Like digest_query, but serves ground-truth digests from the ground-truth cache when possible.
+    """
+    digest = await gt_cache.get(database_name, query)
+    if digest is not None:
+        return digest, None
+
+    digest, error = await digest_query(database_name, query)
+    if digest is not None and error is None:
+        await gt_cache.put(database_name, query, digest)
+    return digest, error
+
+
+async def compare_in_database(database_name: str, expected_sql: str, generated_sql: str) -> ComparisonResult:
+    """
+    Compares two queries inside Postgres with EXCEPT ALL in both directions, so large results
+    never leave the database. Exact comparison only: no float tolerance. Each result is still
+    materialized, so both are capped at QUERY_MAX_ROWS.
+    """
+    limit = settings.QUERY_MAX_ROWS
+    # Normalized, so comments and trailing semicolons cannot break out of the CTEs
+    expected = normalize_sql(expected_sql)
+    generated = normalize_sql(generated_sql)
+    query = (
+        f"WITH e AS MATERIALIZED (SELECT * FROM ({expected}) AS e LIMIT {limit + 1}), "
+        f"g AS MATERIALIZED (SELECT * FROM ({generated}) AS g LIMIT {limit + 1}) "
+        "SELECT (SELECT count(*) FROM e), (SELECT count(*) FROM g), "
+        "(SELECT count(*) FROM (TABLE e EXCEPT ALL TABLE g) AS missing), "
+        "(SELECT count(*) FROM (TABLE g EXCEPT ALL TABLE e) AS extra)"
+    )
     try:
-        return set(expected_rows) == set(generated_rows)
-    except TypeError:
-        try:
-            return sorted(expected_rows, key=lambda x: str(x)) == sorted(generated_rows, key=lambda x: str(x))
-        except Exception:
-            return expected_rows == generated_rows
\ No newline at end of file
+        async with sandboxed(database_name) as conn:
+            expected_rows, generated_rows, missing, extra = (await conn.execute(text(query))).one()
+    except Exception as e:
+        return ComparisonResult(
+            False, f"Results too large to compare in memory and not comparable in SQL: {query_error(e)}"
+        )
+    if expected_rows > limit or generated_rows > limit:
+        side = "Expected" if expected_rows > limit else "Generated"
+        return ComparisonResult(False, f"{side} result exceeds {limit} rows")
+    if missing or extra:
+        return ComparisonResult(False, f"{missing} expected rows missing, {extra} unexpected rows")
+    return ComparisonResult(True)
+
+
+async def compare_query_results(
+    database_name: str,
+    expected_sql: str,
+    expected: ResultDigest | None,
+    generated_sql: str,
+    generated: ResultDigest | None,
+) -> ComparisonResult:
+    if expected is None or generated is None:
+        return ComparisonResult(False, "Missing result")
+    if expected.truncated or generated.truncated:
+        return await compare_in_database(database_name, expected_sql, generated_sql)
+    return compare_digests(expected, generated)
+
+
+async def warm_ground_truth_cache(concurrency: int = 4) -> tuple[int, int]:
+    """
+    Precomputes the ground truth of every dataset instance into the cache.
+    Returns a tuple of (cached, failed).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    cached = 0
+    failed = 0
+
+    async def warm(database_name: str, query: str) -> None:
+        nonlocal cached, failed
+        async with semaphore:
+            _, error = await execute_ground_truth(database_name, query)
+        if error:
+            failed += 1
+            print(f"Ground truth failed on {database_name}: {error}")
+        else:
+            cached += 1
+
+    async with asyncio.TaskGroup() as tg:
+        for item in get_benchmark_data():
+            sol_sql = item.get("sol_sql", [])
+            db_name = item.get("selected_database")
+            if db_name and sol_sql and isinstance(sol_sql, list):
+                tg.create_task(warm(db_name, sol_sql[0]))
+
+    return cached, failed
@@ -0,0 +1,144 @@
+import asyncio
+import contextlib
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+
+from sqlalchemy.engine import make_url
+
+from config import settings
+from services.comparison import DIGEST_VERSION, ResultDigest
+
+
+def dataset_version() -> str:
+    """
+    Version stamp for ground-truth results.
+    Uses GROUND_TRUTH_CACHE_VERSION if set, otherwise derives one from the ground-truth file,
+    the benchmark database server and the database dumps, so editing the dataset or reloading
+    the benchmark databases automatically invalidates previously cached results.
+    """
+    if settings.GROUND_TRUTH_CACHE_VERSION:
+        return settings.GROUND_TRUTH_CACHE_VERSION
+    try:
+        stat = os.stat(settings.BENCHMARK_GT_FILE_PATH)
+        gt_stamp = f"{settings.BENCHMARK_GT_FILE_PATH}:{stat.st_size}:{stat.st_mtime_ns}"
+    except OSError:
+        gt_stamp = "unversioned"
+    stamp = f"{gt_stamp}|{_benchmark_db_stamp()}"
+    return hashlib.sha256(stamp.encode()).hexdigest()[:16]
+
+
+def _benchmark_db_stamp() -> str:
+    # The server (without credentials), plus the newest mtime and total size of the dump files
+    url = make_url(settings.BENCHMARK_DB_URL)
+    newest, total_size = 0, 0
+    for root, _dirs, files in os.walk(settings.BENCHMARK_DB_DUMP_PATH):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            newest, total_size = max(newest, stat.st_mtime_ns), total_size + stat.st_size
+    return f"{url.host}:{url.port}:{newest}:{total_size}"
+
+
+def sql_hash(sql: str) -> str:
+    return hashlib.sha256(sql.encode()).hexdigest()
+
+
+class GroundTruthCache:
+    """
+    Cache of ground-truth result digests keyed by (database, SQL hash, dataset version).
+
+    Entries live in an in-memory LRU bounded by `max_entries` and are spilled to `cache_dir`
+    (one pickle per entry, partitioned by version) so they survive restarts and are shared
+    by every process pointing at the same directory. Only successful executions are cached,
+    and digests are a few integers each, so even the whole dataset fits comfortably in memory.
+    """
+
+    def __init__(self, max_entries: int = 2048, cache_dir: str | None = None, version: str | None = None) -> None:
+        self.max_entries = max_entries
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._version = version
+        self._entries: OrderedDict[tuple[str, str, str], ResultDigest] = OrderedDict()
+
+    @property
+    def version(self) -> str:
+        if self._version is None:
+            # Digests depend on the float tolerance and on how values are canonicalized
+            self._version = f"{dataset_version()}-f{settings.COMPARISON_FLOAT_PLACES}-d{DIGEST_VERSION}"
+        return self._version
+
+    def _key(self, database_name: str, sql: str) -> tuple[str, str, str]:
+        return (database_name, sql_hash(sql), self.version)
+
+    def _path(self, key: tuple[str, str, str]) -> Path | None:
+        if self.cache_dir is None:
+            return None
+        database_name, query_hash, version = key
+        return self.cache_dir / version / database_name / f"{query_hash}.pickle"
+
+    def _remember(self, key: tuple[str, str, str], digest: ResultDigest) -> None:
+        self._entries[key] = digest
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, database_name: str, sql: str) -> ResultDigest | None:
+        key = self._key(database_name, sql)
+        digest = self._entries.get(key)
+        if digest is not None:
+            self._entries.move_to_end(key)
+            return digest
+
+        path = self._path(key)
+        if path is None:
+            return None
+        digest = await asyncio.to_thread(_read_pickle, path)
+        if digest is not None:
+            self._remember(key, digest)
+        return digest
+
+    async def put(self, database_name: str, sql: str, digest: ResultDigest) -> None:
+        key = self._key(database_name, sql)
+        self._remember(key, digest)
+        path = self._path(key)
+        if path is not None:
+            await asyncio.to_thread(_write_pickle, path, digest)
+
+    def clear_memory(self) -> None:
+        self._entries.clear()
+
+
+def _read_pickle(path: Path) -> ResultDigest | None:
+    try:
+        with open(path, "rb") as f:
+            digest: object = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    return digest if isinstance(digest, ResultDigest) else None
+
+
+def _write_pickle(path: Path, digest: ResultDigest) -> None:
+    tmp_path = None
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A unique temporary file per write, so concurrent puts of the same key never share one
+        with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as f:
+            tmp_path = f.name
+            pickle.dump(digest, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except (OSError, pickle.PicklingError, TypeError, AttributeError):
+        # Entries that cannot be written simply stay in memory only
+        if tmp_path is not None:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+
+
+gt_cache = GroundTruthCache(
+    max_entries=settings.GROUND_TRUTH_CACHE_MAX_ENTRIES,
+    cache_dir=settings.GROUND_TRUTH_CACHE_DIR or None,
+)
@@ -0,0 +1,47 @@
+import asyncio
+from typing import Any
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import BenchmarkInstance
+from services.dataset import dataset_store
+
+_SYNC_CHUNK_SIZE = 1000
+_UPDATED_FIELDS = ("database_name", "category", "question", "expected_sql")
+
+_sync_lock = asyncio.Lock()
+_synced_version: tuple[int, int] | None = None
+
+
+def _instance_row(item: dict[str, Any]) -> dict[str, Any]:
+    sol_sql = item.get("sol_sql") or []
+    return {
+        "instance_id": item["instance_id"],
+        "database_name": item.get("selected_database", ""),
+        "category": item.get("category"),
+        "question": item.get("query", ""),
+        "expected_sql": sol_sql[0] if isinstance(sol_sql, list) and sol_sql else None,
+    }
+
+
+async def sync_instances(session: AsyncSession) -> None:
+    """
+    Upserts the dataset's instances into benchmarkinstance, which results reference.
+    Runs once per dataset version and process; commits.
+    """
+    global _synced_version
+    async with _sync_lock:
+        version = dataset_store.version()
+        if version == _synced_version:
+            return
+
+        rows = [_instance_row(item) for item in dataset_store.all()]
+        for start in range(0, len(rows), _SYNC_CHUNK_SIZE):
+            statement = pg_insert(BenchmarkInstance).values(rows[start : start + _SYNC_CHUNK_SIZE])
+            statement = statement.on_conflict_do_update(
+                index_elements=["instance_id"], set_={name: statement.excluded[name] for name in _UPDATED_FIELDS}
+            )
+            await session.execute(statement)
+        await session.commit()
+        _synced_version = version
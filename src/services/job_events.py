@@ -0,0 +1,143 @@
+"""
+Publish/subscribe of benchmark job events (progress and status changes).
+
+Events are published inside the transaction that stores what they describe and delivered once
+it commits. With JOB_EXECUTION_MODE=background jobs run in the API process and events go through
+an in-process broker; with JOB_EXECUTION_MODE=queue the workers publish them with Postgres
+NOTIFY and the API forwards them to its subscribers from a single LISTEN connection.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy import event as sa_event
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config import settings
+from db.session import engine
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "benchmark_job_events"
+
+# NOTIFY payloads must stay below 8000 bytes
+_MAX_ERRORS_PER_EVENT = 5
+_MAX_ERROR_LENGTH = 300
+_PENDING_KEY = "job_events_pending"
+_SUBSCRIBER_QUEUE_SIZE = 1000
+_LISTEN_RETRY_DELAY = 5.0
+
+
+def _use_notify() -> bool:
+    return settings.JOB_EXECUTION_MODE == "queue"
+
+
+def error_summary(instance_id: str, error_class: str | None, error: str | None) -> dict[str, Any]:
+    return {"instance_id": instance_id, "error_class": error_class, "error": (error or "")[:_MAX_ERROR_LENGTH]}
+
+
+class JobEventBroker:
+    def __init__(self) -> None:
+        self._subscribers: dict[str, set[asyncio.Queue[dict[str, Any]]]] = defaultdict(set)
+        self._listener: asyncio.Task[None] | None = None
+
+    async def publish(self, session: AsyncSession, job_id: UUID, event: dict[str, Any]) -> None:
+        """Publishes an event for a job once the session's current transaction commits."""
+        event = {**event, "job_id": str(job_id)}
+        if "errors" in event:
+            event["errors"] = event["errors"][-_MAX_ERRORS_PER_EVENT:]
+        if _use_notify():
+            # NOTIFY is transactional: listeners only receive it on commit
+            await session.execute(select(func.pg_notify(CHANNEL, json.dumps(event, default=str))))
+        else:
+            self._pending(session.sync_session).append(event)
+
+    def _pending(self, session: Session) -> list[dict[str, Any]]:
+        pending: list[dict[str, Any]] | None = session.info.get(_PENDING_KEY)
+        if pending is None:
+            pending = session.info[_PENDING_KEY] = []
+            sa_event.listen(session, "after_commit", self._after_commit)
+            sa_event.listen(session, "after_rollback", self._after_rollback)
+        return pending
+
+    def _after_commit(self, session: Session) -> None:
+        pending = session.info.get(_PENDING_KEY) or []
+        for event in pending:
+            self.dispatch(event)
+        pending.clear()
+
+    def _after_rollback(self, session: Session) -> None:
+        session.info.get(_PENDING_KEY, []).clear()
+
+    def dispatch(self, event: dict[str, Any]) -> None:
+        for queue in self._subscribers.get(event["job_id"], ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Progress events carry running totals, so a slow subscriber can skip some
+                logger.warning("Dropping job event for a slow subscriber of job %s", event["job_id"])
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, job_id: UUID) -> AsyncIterator[asyncio.Queue[dict[str, Any]]]:
+        if _use_notify() and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+        queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=_SUBSCRIBER_QUEUE_SIZE)
+        key = str(job_id)
+        self._subscribers[key].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[key].discard(queue)
+            if not self._subscribers[key]:
+                del self._subscribers[key]
+
+    def _on_notify(self, _connection: Any, _pid: int, _channel: str, payload: str) -> None:
+        try:
+            self.dispatch(json.loads(payload))
+        except (ValueError, KeyError):
+            logger.warning("Ignoring malformed job event: %s", payload[:200])
+
+    async def _listen(self) -> None:
+        # One LISTEN connection per API process, kept open (and re-opened) while the process lives
+        while True:
+            try:
+                async with engine.connect() as conn:
+                    driver = (await conn.get_raw_connection()).driver_connection
+                    assert driver is not None
+                    closed: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+
+                    def on_termination(_conn: Any) -> None:
+                        if not closed.done():
+                            closed.set_result(None)
+
+                    driver.add_termination_listener(on_termination)
+                    await driver.add_listener(CHANNEL, self._on_notify)
+                    try:
+                        await closed
+                    finally:
+                        if not driver.is_closed():
+                            await driver.remove_listener(CHANNEL, self._on_notify)
+                raise ConnectionError("connection closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Job event listener lost its connection (%s), reconnecting", e)
+                await asyncio.sleep(_LISTEN_RETRY_DELAY)
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._listener
+            self._listener = None
+
+
+job_events = JobEventBroker()
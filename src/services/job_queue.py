@@ -0,0 +1,114 @@
+import asyncio
+import contextlib
+from datetime import UTC, datetime, timedelta
+from uuid import UUID
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import col, select
+
+from config import settings
+from db.session import engine
+from models.models import BenchmarkJob
+from services.benchmark_service import job_options, run_benchmark
+from services.job_events import job_events
+
+
+async def claim_job(worker_id: str) -> BenchmarkJob | None:
+    """
+    Atomically claims the oldest queued job, or a running job whose worker stopped heartbeating.
+    Uses SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers never claim the same job.
+    """
+    stale_before = datetime.now(UTC) - timedelta(seconds=settings.WORKER_STALE_AFTER)
+    async_session = async_sessionmaker(engine, expire_on_commit=False)
+    async with async_session() as session:
+        statement = (
+            select(BenchmarkJob)
+            .where(
+                or_(
+                    col(BenchmarkJob.status) == "queued",
+                    and_(
+                        col(BenchmarkJob.status) == "running",
+                        col(BenchmarkJob.worker_id).is_not(None),
+                        col(BenchmarkJob.heartbeat_at) < stale_before,
+                    ),
+                )
+            )
+            .order_by(col(BenchmarkJob.created_at))
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        job = (await session.execute(statement)).scalar_one_or_none()
+        if job is None:
+            return None
+
+        now = datetime.now(UTC)
+        job.status = "running"
+        job.worker_id = worker_id
+        job.heartbeat_at = now
+        job.updated_at = now
+        await session.commit()
+        return job
+
+
+async def _set_worker_state(job_id: UUID, worker_id: str, values: dict[str, object]) -> None:
+    # Only touch the job while this worker still owns it
+    async_session = async_sessionmaker(engine, expire_on_commit=False)
+    async with async_session() as session:
+        statement = (
+            update(BenchmarkJob)
+            .where(col(BenchmarkJob.id) == job_id, col(BenchmarkJob.worker_id) == worker_id)
+            .values(values)
+        )
+        await session.execute(statement)
+        if "status" in values:
+            await job_events.publish(session, job_id, {"type": "status", "status": values["status"]})
+        await session.commit()
+
+
+async def _heartbeat(job_id: UUID, worker_id: str) -> None:
+    while True:
+        await asyncio.sleep(settings.WORKER_HEARTBEAT_INTERVAL)
+        try:
+            await _set_worker_state(job_id, worker_id, {"heartbeat_at": datetime.now(UTC)})
+        except Exception as e:
+            print(f"Heartbeat for job {job_id} failed: {e}")
+
+
+async def process_job(job: BenchmarkJob, worker_id: str) -> None:
+    """
+    Runs a claimed job while heartbeating. Already evaluated instances are skipped, so a job
+    taken over from a crashed worker resumes at instance granularity.
+    If the worker is shut down mid-job, the job is put back in the queue.
+    """
+    options = job_options(job)
+    heartbeat = asyncio.create_task(_heartbeat(job.id, worker_id))
+    try:
+        await run_benchmark(job.id, job.endpoint_url, options, resume=True, worker_id=worker_id)
+    except asyncio.CancelledError:
+        await _set_worker_state(
+            job.id, worker_id, {"status": "queued", "worker_id": None, "updated_at": datetime.now(UTC)}
+        )
+        raise
+    finally:
+        heartbeat.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await heartbeat
+
+
+async def work(worker_id: str, stop: asyncio.Event) -> None:
+    """Claims and runs jobs one at a time until `stop` is set."""
+    while not stop.is_set():
+        try:
+            job = await claim_job(worker_id)
+        except Exception as e:
+            print(f"Worker {worker_id} failed to claim a job: {e}")
+            job = None
+
+        if job is None:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(stop.wait(), timeout=settings.WORKER_POLL_INTERVAL)
+            continue
+
+        print(f"Worker {worker_id} running job {job.id}")
+        await process_job(job, worker_id)
@@ -0,0 +1,244 @@
+"""
+LiveSQLBench execution semantics.
+
+Each instance is evaluated inside a single transaction on the target database that is always rolled
+back: `preprocess_sql` runs first, then the candidate SQL (in a savepoint), then the instance's
+`test_cases`. Test cases are the dataset's Python snippets defining
+`test_case(pred_sqls, sol_sqls, db_name, conn)`; they run against a DB-API view of the same
+connection, with the helpers of the official evaluator (`ex_base`, `execute_queries`,
+`perform_query_on_postgresql_databases`) in scope. Instances without test cases are scored with
+`ex_base`, which compares candidate and solution results under the instance `conditions`.
+
+Postgres DDL is transactional, so rolling back restores the database without `clean_up_sqls` or a
+cloned database. For the same reason none of the candidate's statements may control the transaction.
+The candidate is split into statements, which run one by one as prepared statements; the whole
+instance shares LIVESQL_INSTANCE_TIMEOUT while each statement keeps the statement timeout.
+
+Uncommitted writes still hold their locks until the rollback, so instances of the same database
+would block each other: they are evaluated one at a time per database in each process, and
+`lock_timeout` turns waits on other processes into harness errors rather than hanging until the
+statement timeout. Instances of different databases run concurrently.
+"""
+
+import asyncio
+import re
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import Connection
+
+from config import settings
+from models.models import ErrorClass
+from services.candidate_memo import normalize_sql, split_sql
+from services.comparison import canonical_value
+from services.evaluation import candidate_error_class, query_error, sandboxed
+
+# One evaluation at a time per database; see the module docstring
+_database_locks: dict[str, asyncio.Lock] = {}
+
+# Statements that would end the evaluation transaction and make the candidate's changes permanent
+_TRANSACTION_CONTROL = re.compile(r"^(begin|start|commit|end|rollback|abort|savepoint|release|prepare transaction)\b")
+
+
+@dataclass
+class LiveSqlVerdict:
+    is_correct: bool
+    error: str | None = None
+    error_class: ErrorClass | None = None
+    # Why a candidate that executed was judged wrong
+    reason: str | None = None
+
+
+class _Savepoint:
+    """Savepoint on a DB-API connection that is always rolled back, isolating one step."""
+
+    _counter = 0
+
+    def __init__(self, conn: Any) -> None:
+        _Savepoint._counter += 1
+        self.name = f"lsb_{_Savepoint._counter}"
+        self.cursor = conn.cursor()
+
+    def __enter__(self) -> Any:
+        self.cursor.execute(f"SAVEPOINT {self.name}")
+        return self.cursor
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.cursor.execute(f"ROLLBACK TO SAVEPOINT {self.name}")
+        self.cursor.execute(f"RELEASE SAVEPOINT {self.name}")
+
+
+def _run(cursor: Any, query: str) -> list[tuple[Any, ...]]:
+    cursor.execute(query)
+    if not cursor.description:
+        return []
+    rows = cursor.fetchmany(settings.QUERY_MAX_ROWS + 1)
+    if len(rows) > settings.QUERY_MAX_ROWS:
+        raise RuntimeError(f"Result exceeds {settings.QUERY_MAX_ROWS} rows")
+    return [tuple(row) for row in rows]
+
+
+async def _execute_candidate(driver: Any, statements: list[str]) -> None:
+    # Extended query protocol, one statement at a time, unlike the simple protocol used for preprocess_sql
+    for sql in statements:
+        statement = await driver.prepare(sql)
+        cursor = await statement.cursor()
+        if len(await cursor.fetch(settings.QUERY_MAX_ROWS + 1)) > settings.QUERY_MAX_ROWS:
+            raise RuntimeError(f"Result exceeds {settings.QUERY_MAX_ROWS} rows")
+
+
+def perform_query_on_postgresql_databases(
+    query: str, db_name: str, conn: Any = None, return_columns: bool = False, timeout: int = 60
+) -> tuple[Any, ...]:
+    cursor = conn.cursor()
+    rows = _run(cursor, query)
+    if return_columns:
+        columns = [column[0] for column in cursor.description or []]
+        return rows, columns, conn
+    return rows, conn
+
+
+def execute_queries(
+    queries: list[str], db_name: str, conn: Any, logger: Any = None, section_title: str = "", is_solution: bool = True
+) -> tuple[list[tuple[Any, ...]] | None, bool, bool]:
+    """Runs `queries` in order; returns (result of the last one, execution_error, timeout_error)."""
+    result: list[tuple[Any, ...]] | None = None
+    cursor = conn.cursor()
+    for query in queries:
+        try:
+            result = _run(cursor, query)
+        except Exception as e:
+            error = query_error(e)
+            if error.harness:
+                # Lock conflicts with another evaluation say nothing about the queries
+                raise
+            return None, not error.timed_out, error.timed_out
+    return result, False, False
+
+
+def _normalize(rows: list[tuple[Any, ...]], conditions: dict[str, Any]) -> list[str]:
+    places = conditions.get("decimal", settings.COMPARISON_FLOAT_PLACES)
+    if not isinstance(places, int) or places < 0:
+        places = settings.COMPARISON_FLOAT_PLACES
+    normalized = [canonical_value(row, places) for row in rows]
+    if conditions.get("distinct"):
+        normalized = list(dict.fromkeys(normalized))
+    if not conditions.get("order"):
+        normalized.sort()
+    return normalized
+
+
+def ex_base(
+    pred_sqls: list[str], sol_sqls: list[str], db_name: str, conn: Any, conditions: dict[str, Any] | None = None
+) -> int:
+    """Returns 1 when the candidate and the solution produce the same result, 0 otherwise."""
+    conditions = conditions or {}
+    with _Savepoint(conn):
+        pred, pred_error, pred_timeout = execute_queries(pred_sqls, db_name, conn)
+    if pred_error or pred_timeout or pred is None:
+        return 0
+    with _Savepoint(conn):
+        sol, sol_error, sol_timeout = execute_queries(sol_sqls, db_name, conn)
+    if sol_error or sol_timeout or sol is None:
+        return 0
+    return int(_normalize(pred, conditions) == _normalize(sol, conditions))
+
+
+_HELPERS = {
+    "ex_base": ex_base,
+    "execute_queries": execute_queries,
+    "perform_query_on_postgresql_databases": perform_query_on_postgresql_databases,
+}
+
+
+def _run_test_cases(
+    sync_conn: Connection,
+    test_cases: list[str],
+    pred_sqls: list[str],
+    sol_sqls: list[str],
+    db_name: str,
+    conditions: dict[str, Any],
+) -> str | None:
+    """Runs on the greenlet-adapted sync connection. Returns the failure reason, or None if all pass."""
+    conn = sync_conn.connection.dbapi_connection
+    if not test_cases:
+        with _Savepoint(conn):
+            if ex_base(pred_sqls, sol_sqls, db_name, conn, conditions) != 1:
+                return "Result differs from the solution"
+        return None
+
+    for number, source in enumerate(test_cases, start=1):
+        namespace: dict[str, Any] = dict(_HELPERS)
+        try:
+            exec(compile(source, f"<test_case {number}>", "exec"), namespace)
+            test_case = namespace.get("test_case")
+            if test_case is None:
+                return f"Test case {number} does not define test_case"
+            with _Savepoint(conn):
+                outcome = test_case(pred_sqls, sol_sqls, db_name, conn)
+        except AssertionError as e:
+            return f"Test case {number} failed{f': {e}' if str(e) else ''}"
+        except Exception as e:
+            if query_error(e).harness:
+                raise
+            return f"Test case {number} raised {type(e).__name__}: {e}"
+        if outcome is False or outcome == 0:
+            return f"Test case {number} failed"
+    return None
+
+
+async def evaluate_livesql(instance: dict[str, Any], generated_sql: str) -> LiveSqlVerdict:
+    db_name = instance.get("selected_database", "")
+    preprocess_sqls = instance.get("preprocess_sql") or []
+    sol_sqls = instance.get("sol_sql") or []
+    test_cases = instance.get("test_cases") or []
+    conditions = instance.get("conditions") or {}
+    pred_sqls = split_sql(generated_sql)
+    if not pred_sqls:
+        return LiveSqlVerdict(False, "Generated SQL Error: no SQL statement", ErrorClass.EXECUTION)
+    if any(_TRANSACTION_CONTROL.match(normalize_sql(sql)) for sql in pred_sqls):
+        return LiveSqlVerdict(
+            False, "Generated SQL Error: transaction control statements are not allowed", ErrorClass.EXECUTION
+        )
+
+    lock = _database_locks.setdefault(db_name, asyncio.Lock())
+    try:
+        async with lock, sandboxed(db_name, read_only=False, deadline=settings.LIVESQL_INSTANCE_TIMEOUT) as conn:
+            driver = (await conn.get_raw_connection()).driver_connection
+            assert driver is not None
+
+            try:
+                for sql in preprocess_sqls:
+                    # Simple query protocol, so multi-statement scripts are accepted
+                    await driver.execute(sql)
+            except Exception as e:
+                if query_error(e).harness:
+                    raise
+                return LiveSqlVerdict(False, f"Preprocess Error: {query_error(e)}", ErrorClass.GROUND_TRUTH)
+
+            candidate = await conn.begin_nested()
+            try:
+                await _execute_candidate(driver, pred_sqls)
+            except Exception as e:
+                error = query_error(e)
+                if error.harness:
+                    raise
+                return LiveSqlVerdict(False, f"Generated SQL Error: {error}", candidate_error_class(error))
+            if not test_cases:
+                # ex_base runs the candidate again next to the solution
+                await candidate.rollback()
+
+            reason = await conn.run_sync(_run_test_cases, test_cases, pred_sqls, sol_sqls, db_name, conditions)
+            return LiveSqlVerdict(reason is None, reason=reason)
+    except TimeoutError:
+        # The client-side deadline of the whole instance, not of one statement
+        timeout = settings.LIVESQL_INSTANCE_TIMEOUT
+        return LiveSqlVerdict(False, f"Evaluation Error: instance exceeded {timeout}s", ErrorClass.TIMEOUT)
+    except Exception as e:
+        # Connection or sandbox failures, not the candidate's: the instance cannot be evaluated
+        error = query_error(e)
+        if error.harness:
+            return LiveSqlVerdict(False, f"Evaluation Error: {error}", ErrorClass.HARNESS)
+        if error.timed_out:
+            return LiveSqlVerdict(False, f"Generated SQL Error: {error}", ErrorClass.TIMEOUT)
+        return LiveSqlVerdict(False, f"Evaluation Error: {error}", ErrorClass.GROUND_TRUTH)
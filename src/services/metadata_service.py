@@ -1,12 +1,230 @@
+import hashlib
 import json
 import os
+import re
+import threading
+from dataclasses import dataclass, field
 from pathlib import Path
 
+from pydantic import BaseModel
+
 from config import settings
-from models.schemas import ColumnMeaning, DatabaseMetadata, KnowledgeBaseItem
+from models.schemas import (
+    ColumnMeaning,
+    ColumnMeaningsColumnar,
+    DatabaseMetadata,
+    DatabaseMetadataProjection,
+    KnowledgeBaseItem,
+)
+
+METADATA_FIELDS = ("schema_ddl", "column_meanings", "knowledge_base")
+# Table names may be schema-qualified, and each part quoted or not: public.t, "public"."t"
+_IDENTIFIER = r'(?:"[^"]+"|\w+)'
+_CREATE_TABLE = re.compile(
+    rf"^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?({_IDENTIFIER}(?:\s*\.\s*{_IDENTIFIER})*)",
+    re.IGNORECASE | re.MULTILINE,
+)
+_MAX_PROJECTIONS_PER_DATABASE = 128
+
+
+@dataclass
+class SerializedBody:
+    body: bytes
+    etag: str
+
+    @classmethod
+    def of(cls, model: BaseModel, exclude: set[str] | None = None) -> "SerializedBody":
+        body = model.model_dump_json(exclude=exclude).encode()
+        return cls(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+@dataclass
+class MetadataIndex:
+    """Per-table view of a database's metadata, used to build projections."""
+
+    ddl_preamble: str
+    ddl_by_table: dict[str, str]
+    columns_by_table: dict[str, list[ColumnMeaning]]
+    kb_by_id: dict[int, KnowledgeBaseItem]
+
+    @classmethod
+    def build(cls, metadata: DatabaseMetadata) -> "MetadataIndex":
+        preamble, ddl_by_table = _split_ddl(metadata.schema_ddl)
+        columns_by_table: dict[str, list[ColumnMeaning]] = {}
+        for meaning in metadata.column_meanings:
+            columns_by_table.setdefault(meaning.table_name.lower(), []).append(meaning)
+        kb_by_id = {item.id: item for item in metadata.knowledge_base}
+        return cls(preamble, ddl_by_table, columns_by_table, kb_by_id)
+
+    def tables(self) -> list[str]:
+        return list(dict.fromkeys([*self.ddl_by_table, *self.columns_by_table]))
+
+
+@dataclass
+class SerializedMetadata:
+    metadata: DatabaseMetadata
+    # Pre-serialized JSON response body and its strong ETag
+    body: bytes
+    etag: str
+    mtimes: tuple[int | None, ...]
+    index: MetadataIndex
+    projections: dict[tuple[object, ...], SerializedBody] = field(default_factory=dict)
+
+
+def _split_ddl(schema_ddl: str) -> tuple[str, dict[str, str]]:
+    """Splits a schema dump into the text before the first CREATE TABLE and one block per table."""
+    matches = list(_CREATE_TABLE.finditer(schema_ddl))
+    if not matches:
+        return schema_ddl, {}
+    blocks = {}
+    for match, following in zip(matches, [*matches[1:], None], strict=True):
+        end = following.start() if following else len(schema_ddl)
+        table_name = re.findall(_IDENTIFIER, match.group(1))[-1].strip('"').lower()
+        blocks[table_name] = schema_ddl[match.start() : end].strip() + "\n"
+    return schema_ddl[: matches[0].start()], blocks
+
+
+def _metadata_files(database_name: str) -> list[Path]:
+    db_path = Path(settings.METADATA_PATH) / database_name
+    return [
+        db_path,
+        db_path / f"{database_name}_schema.txt",
+        db_path / f"{database_name}_column_meaning_base.json",
+        db_path / f"{database_name}_kb.jsonl",
+    ]
+
+
+def _mtimes(paths: list[Path]) -> tuple[int | None, ...]:
+    mtimes: list[int | None] = []
+    for path in paths:
+        try:
+            mtimes.append(path.stat().st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+class MetadataCache:
+    """
+    In-process cache of database metadata and its serialized response.
+    An entry is rebuilt when the mtime of the database directory or any of its files changes.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[str, SerializedMetadata] = {}
+        self._lock = threading.Lock()
+
+    def get(self, database_name: str) -> SerializedMetadata:
+        mtimes = _mtimes(_metadata_files(database_name))
+        entry = self._entries.get(database_name)
+        if entry is not None and entry.mtimes == mtimes:
+            return entry
+
+        with self._lock:
+            metadata = load_database_metadata(database_name)
+            body = metadata.model_dump_json().encode()
+            entry = SerializedMetadata(
+                metadata=metadata,
+                body=body,
+                etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+                mtimes=mtimes,
+                index=MetadataIndex.build(metadata),
+            )
+            self._entries[database_name] = entry
+            return entry
+
+    def warm(self) -> int:
+        """Loads every database returned by list_databases. Returns the number loaded."""
+        loaded = 0
+        for database_name in list_databases():
+            try:
+                self.get(database_name)
+                loaded += 1
+            except Exception as e:
+                print(f"Failed to load metadata for {database_name}: {e}")
+        return loaded
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+metadata_cache = MetadataCache()
+
+
+def get_serialized_metadata(database_name: str) -> SerializedMetadata:
+    return metadata_cache.get(database_name)
 
 
 def get_database_metadata(database_name: str) -> DatabaseMetadata:
+    return metadata_cache.get(database_name).metadata
+
+
+def get_metadata_projection(
+    database_name: str,
+    fields: list[str] | None = None,
+    tables: list[str] | None = None,
+    kb_ids: list[int] | None = None,
+    columnar: bool = False,
+) -> SerializedBody:
+    """
+    Serialized subset of a database's metadata: only the requested `fields`, DDL and column
+    meanings restricted to `tables`, knowledge base restricted to `kb_ids`, and optionally
+    column meanings in columnar form. Projections are memoized per cache entry.
+    """
+    entry = metadata_cache.get(database_name)
+    selected = [f for f in METADATA_FIELDS if f in fields] if fields else list(METADATA_FIELDS)
+    wanted_tables = sorted({t.lower() for t in tables}) if tables else None
+    wanted_kb = sorted(set(kb_ids)) if kb_ids else None
+
+    key = (tuple(selected), tuple(wanted_tables or ()), tuple(wanted_kb or ()), columnar)
+    cached = entry.projections.get(key)
+    if cached is not None:
+        return cached
+
+    index = entry.index
+    projection = DatabaseMetadataProjection(database_name=database_name)
+    if "schema_ddl" in selected:
+        if wanted_tables is None:
+            projection.schema_ddl = entry.metadata.schema_ddl
+        else:
+            projection.schema_ddl = "\n".join(index.ddl_by_table[t] for t in wanted_tables if t in index.ddl_by_table)
+    if "column_meanings" in selected:
+        if wanted_tables is None:
+            meanings = entry.metadata.column_meanings
+        else:
+            meanings = [m for t in wanted_tables for m in index.columns_by_table.get(t, [])]
+        projection.column_meanings = _columnar(meanings) if columnar else meanings
+    if "knowledge_base" in selected:
+        if wanted_kb is None:
+            projection.knowledge_base = entry.metadata.knowledge_base
+        else:
+            projection.knowledge_base = [index.kb_by_id[i] for i in wanted_kb if i in index.kb_by_id]
+
+    # Only the fields that were not requested are left out; nulls inside them (a KB item's definition) are kept
+    serialized = SerializedBody.of(projection, exclude={f for f in METADATA_FIELDS if f not in selected})
+    if len(entry.projections) >= _MAX_PROJECTIONS_PER_DATABASE:
+        entry.projections.clear()
+    entry.projections[key] = serialized
+    return serialized
+
+
+def _columnar(meanings: list[ColumnMeaning]) -> ColumnMeaningsColumnar:
+    return ColumnMeaningsColumnar(
+        table_name=[m.table_name for m in meanings],
+        column_name=[m.column_name for m in meanings],
+        description=[m.description for m in meanings],
+    )
+
+
+def list_tables(database_name: str) -> list[str]:
+    return metadata_cache.get(database_name).index.tables()
+
+
+def get_knowledge_item(database_name: str, item_id: int) -> KnowledgeBaseItem | None:
+    return metadata_cache.get(database_name).index.kb_by_id.get(item_id)
+
+
+def load_database_metadata(database_name: str) -> DatabaseMetadata:
     db_path = Path(settings.METADATA_PATH) / database_name
 
     if not db_path.exists():
@@ -0,0 +1,82 @@
+"""
+Optional Prometheus metrics for the API and the workers.
+
+Metrics are only collected when METRICS_ENABLED is set and `prometheus_client` is installed;
+otherwise every function here is a no-op, so the hot path never depends on the exporter.
+"""
+
+import logging
+from typing import Any
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import prometheus_client
+except ImportError:  # optional dependency
+    prometheus_client = None
+
+PHASES = ("generation", "ground_truth", "candidate", "compare", "persist")
+
+_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_phase_seconds: Any = None
+_results_total: Any = None
+_http_seconds: Any = None
+
+
+def enabled() -> bool:
+    return _phase_seconds is not None
+
+
+def setup() -> bool:
+    """Registers the collectors once. Returns whether metrics are being collected."""
+    global _phase_seconds, _results_total, _http_seconds
+    if enabled() or not settings.METRICS_ENABLED:
+        return enabled()
+    if prometheus_client is None:
+        logger.warning("METRICS_ENABLED is set but prometheus_client is not installed; metrics are disabled")
+        return False
+
+    _phase_seconds = prometheus_client.Histogram(
+        "t2sql_benchmark_phase_seconds",
+        "Duration of each benchmark evaluation phase",
+        ["phase"],
+        buckets=_LATENCY_BUCKETS,
+    )
+    _results_total = prometheus_client.Counter(
+        "t2sql_benchmark_results_total", "Benchmark results persisted, by error class", ["error_class"]
+    )
+    _http_seconds = prometheus_client.Histogram(
+        "t2sql_http_request_seconds",
+        "API request duration",
+        ["method", "route", "status"],
+        buckets=_LATENCY_BUCKETS,
+    )
+    return True
+
+
+def observe_phase(phase: str, seconds: float) -> None:
+    if _phase_seconds is not None:
+        _phase_seconds.labels(phase).observe(seconds)
+
+
+def count_result(error_class: str | None) -> None:
+    if _results_total is not None:
+        _results_total.labels(error_class or "none").inc()
+
+
+def observe_request(method: str, route: str, status: int, seconds: float) -> None:
+    if _http_seconds is not None:
+        _http_seconds.labels(method, route, str(status)).observe(seconds)
+
+
+def asgi_app() -> Any:
+    """ASGI app serving the metrics, to be mounted by the API."""
+    return prometheus_client.make_asgi_app()
+
+
+def start_http_server(port: int) -> None:
+    """Serves the metrics on their own port, for processes without an HTTP server (workers)."""
+    prometheus_client.start_http_server(port)
@@ -0,0 +1,258 @@
+import asyncio
+import importlib.util
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from types import TracebackType
+
+import httpx
+
+from config import settings
+from models.schemas import BenchmarkCreate
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+@dataclass
+class ModelClientConfig:
+    request_timeout: float
+    connect_timeout: float
+    max_retries: int
+    backoff_base: float
+    backoff_max: float
+    rate_limit_per_second: float | None
+    rate_limit_burst: int
+    http2: bool
+    max_connections: int
+    max_keepalive_connections: int
+
+    @classmethod
+    def from_options(cls, options: BenchmarkCreate | None, concurrency: int = 1) -> "ModelClientConfig":
+        def pick[T](value: T | None, default: T) -> T:
+            return default if value is None else value
+
+        return cls(
+            request_timeout=pick(options.request_timeout if options else None, settings.MODEL_REQUEST_TIMEOUT),
+            connect_timeout=pick(options.connect_timeout if options else None, settings.MODEL_CONNECT_TIMEOUT),
+            max_retries=pick(options.max_retries if options else None, settings.MODEL_MAX_RETRIES),
+            backoff_base=settings.MODEL_RETRY_BACKOFF_BASE,
+            backoff_max=settings.MODEL_RETRY_BACKOFF_MAX,
+            rate_limit_per_second=pick(
+                options.rate_limit_per_second if options else None, settings.MODEL_RATE_LIMIT_PER_SECOND
+            ),
+            rate_limit_burst=pick(options.rate_limit_burst if options else None, settings.MODEL_RATE_LIMIT_BURST),
+            http2=pick(options.http2 if options else None, settings.MODEL_HTTP2),
+            # Never pool fewer connections than requests that can be in flight
+            max_connections=max(settings.MODEL_MAX_CONNECTIONS, concurrency),
+            max_keepalive_connections=max(settings.MODEL_MAX_KEEPALIVE_CONNECTIONS, concurrency),
+        )
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, holding at most `burst` tokens."""
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class GenerationResult:
+    sql: str | None = None
+    error: str | None = None
+    # Latency of the final attempt, i.e. how long the model took to answer
+    latency_ms: float = 0.0
+    # Whole call, including failed attempts and backoff (but not rate-limit waits before the first attempt)
+    call_latency_ms: float = 0.0
+    attempt_latencies_ms: list[float] = field(default_factory=list)
+
+
+def parse_sql(response: httpx.Response) -> str:
+    try:
+        resp_json = response.json()
+    except Exception:
+        return response.text
+    if isinstance(resp_json, dict):
+        return resp_json.get("sql") or resp_json.get("generated_sql") or str(resp_json)
+    return str(resp_json)
+
+
+def retry_after_seconds(response: httpx.Response) -> float | None:
+    value: str | None = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(UTC)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class ModelClient:
+    """
+    HTTP client for the model endpoint with connection pooling, optional HTTP/2, token-bucket
+    rate limiting and retries with full-jitter exponential backoff that honors Retry-After.
+    Retries cover 429/5xx responses and transport errors (including timeouts).
+    """
+
+    def __init__(self, endpoint_url: str, config: ModelClientConfig, batch_url: str | None = None) -> None:
+        self.endpoint_url = endpoint_url
+        self.batch_url = batch_url
+        self.config = config
+        self.bucket = (
+            TokenBucket(config.rate_limit_per_second, config.rate_limit_burst) if config.rate_limit_per_second else None
+        )
+
+        http2 = config.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning(
+                "HTTP/2 requested but the 'h2' package is not installed (install the http2 extra); using HTTP/1.1"
+            )
+            http2 = False
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+            ),
+            timeout=httpx.Timeout(config.request_timeout, connect=config.connect_timeout),
+        )
+
+    async def __aenter__(self) -> "ModelClient":
+        return self
+
+    async def __aexit__(
+        self, exc_type: type[BaseException] | None, exc: BaseException | None, tb: TracebackType | None
+    ) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    def _backoff(self, attempt: int, retry_after: float | None) -> float:
+        delay = random.uniform(0, min(self.config.backoff_max, self.config.backoff_base * 2**attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.config.backoff_max))
+        return delay
+
+    async def post(
+        self, payload: object, url: str | None = None
+    ) -> tuple[httpx.Response | None, str | None, list[float], float]:
+        """
+        Sends `payload` to `url` (default: the endpoint URL), retrying as configured.
+        Returns (response, error_message, attempt_latencies_ms, call_latency_ms).
+        """
+        attempts: list[float] = []
+        call_start: float | None = None
+        attempt = 0
+        while True:
+            if self.bucket:
+                await self.bucket.acquire()
+            start = time.perf_counter()
+            call_start = call_start or start
+            retry_after = None
+            try:
+                response = await self._client.post(url or self.endpoint_url, json=payload)
+                attempts.append((time.perf_counter() - start) * 1000)
+                if response.status_code == 200:
+                    return response, None, attempts, (time.perf_counter() - call_start) * 1000
+                error = f"Error: {response.status_code} - {response.text}"
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    return response, error, attempts, (time.perf_counter() - call_start) * 1000
+                retry_after = retry_after_seconds(response)
+            except httpx.TransportError as e:
+                attempts.append((time.perf_counter() - start) * 1000)
+                error = str(e) or type(e).__name__
+            except Exception as e:
+                attempts.append((time.perf_counter() - start) * 1000)
+                return None, str(e), attempts, (time.perf_counter() - call_start) * 1000
+
+            if attempt >= self.config.max_retries:
+                return None, error, attempts, (time.perf_counter() - call_start) * 1000
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+            attempt += 1
+
+    async def generate(self, database_name: str, query: str) -> GenerationResult:
+        response, error, attempts, call_latency = await self.post({"database": database_name, "query": query})
+        result = GenerationResult(
+            error=error,
+            latency_ms=attempts[-1] if attempts else 0.0,
+            call_latency_ms=call_latency,
+            attempt_latencies_ms=attempts,
+        )
+        if error is None and response is not None:
+            result.sql = parse_sql(response)
+        return result
+
+    async def generate_batch(self, database_name: str, queries: list[str]) -> list[GenerationResult]:
+        """
+        Sends several questions on the same database in one request:
+        `{"database": ..., "queries": [...]}` answered by `{"sql": [...]}` (one answer per query, in order).
+        The call latency is amortized evenly over the items of the batch.
+        """
+        if not self.batch_url:
+            raise ValueError("No batch endpoint configured")
+        response, error, attempts, call_latency = await self.post(
+            {"database": database_name, "queries": queries}, url=self.batch_url
+        )
+        answers: list[str] | None = None
+        if error is None and response is not None:
+            answers = parse_batch_sql(response)
+            if answers is None:
+                error = f"Invalid batch response: {response.text}"
+            elif len(answers) != len(queries):
+                error = f"Batch response has {len(answers)} answers for {len(queries)} questions"
+                answers = None
+
+        n = len(queries)
+        amortized = [latency / n for latency in attempts]
+        return [
+            GenerationResult(
+                sql=answers[i] if answers else None,
+                error=error,
+                latency_ms=amortized[-1] if amortized else 0.0,
+                call_latency_ms=call_latency / n,
+                attempt_latencies_ms=list(amortized),
+            )
+            for i in range(n)
+        ]
+
+
+def parse_batch_sql(response: httpx.Response) -> list[str] | None:
+    try:
+        resp_json = response.json()
+    except Exception:
+        return None
+    if isinstance(resp_json, dict):
+        resp_json = resp_json.get("sql") or resp_json.get("generated_sql") or resp_json.get("results")
+    if not isinstance(resp_json, list):
+        return None
+    answers = []
+    for item in resp_json:
+        if isinstance(item, dict):
+            answers.append(item.get("sql") or item.get("generated_sql") or str(item))
+        else:
+            answers.append(str(item))
+    return answers
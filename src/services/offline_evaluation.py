@@ -0,0 +1,177 @@
+"""
+Offline evaluation of saved predictions, without the HTTP server.
+
+Predictions are grouped by benchmark database and each database is evaluated in its own worker
+process, with its own connection pool. Results go to a local JSONL or Parquet file and can
+optionally be stored in the results database as a completed job. The candidate memo lives in the
+results database too, so it is only consulted when asked for.
+"""
+
+import asyncio
+import json
+import os
+from collections import defaultdict
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import UTC, datetime
+from typing import Any
+from uuid import UUID
+
+from db.bench_engines import bench_engines
+from models.schemas import BatchEvaluationItem, BatchEvaluationSummary, PredictionItem
+from services.candidate_memo import candidate_memo
+from services.dataset import get_instance
+from services.evaluation import batch_evaluate, batch_summary
+
+
+def read_predictions(path: str) -> list[PredictionItem]:
+    with open(path) as f:
+        return [PredictionItem.model_validate_json(line) for line in f if line.strip()]
+
+
+def _evaluate_database(
+    predictions: list[tuple[int, PredictionItem]], evaluation_mode: str | None, concurrency: int, memo: bool
+) -> list[dict[str, Any]]:
+    """Runs in a worker process: evaluates the predictions of one database."""
+    return asyncio.run(_evaluate_database_async(predictions, evaluation_mode, concurrency, memo))
+
+
+async def _evaluate_database_async(
+    predictions: list[tuple[int, PredictionItem]], evaluation_mode: str | None, concurrency: int, memo: bool
+) -> list[dict[str, Any]]:
+    indices = [index for index, _ in predictions]
+    items = []
+    try:
+        async for result in batch_evaluate(
+            [p for _, p in predictions], evaluation_mode, concurrency, candidate_memo if memo else None
+        ):
+            if isinstance(result, BatchEvaluationItem):
+                # batch_evaluate numbers the predictions of this database only
+                result.index = indices[result.index]
+                items.append(result.model_dump(mode="json"))
+    finally:
+        await bench_engines.dispose_all()
+    return items
+
+
+def evaluate_offline(
+    predictions: list[PredictionItem],
+    evaluation_mode: str | None = None,
+    processes: int | None = None,
+    concurrency: int = 4,
+    memo: bool = False,
+) -> Iterator[list[dict[str, Any]]]:
+    """
+    Evaluates predictions in a process pool, one task per database, and yields the items of each
+    database as soon as it is done. `concurrency` bounds the predictions in flight per process.
+    With `memo`, candidates are looked up in and added to the candidate memo of the results database.
+    """
+    by_database: dict[str, list[tuple[int, PredictionItem]]] = defaultdict(list)
+    for index, prediction in enumerate(predictions):
+        instance = get_instance(prediction.instance_id)
+        by_database[instance.get("selected_database", "") if instance else ""].append((index, prediction))
+    if not by_database:
+        return
+
+    processes = processes or min(len(by_database), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [
+            pool.submit(_evaluate_database, group, evaluation_mode, concurrency, memo) for group in by_database.values()
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def summarize(items: list[dict[str, Any]]) -> BatchEvaluationSummary:
+    return batch_summary(
+        len(items),
+        sum(item["correct"] for item in items),
+        sum(item["execution_error"] for item in items),
+        sum(item["wrong_result"] for item in items),
+        sum(item["skipped"] for item in items),
+    )
+
+
+class JsonlResultWriter:
+    """Appends items as they arrive, so a long sweep leaves partial results behind."""
+
+    def __init__(self, path: str) -> None:
+        self._file = open(path, "w")
+
+    def write(self, items: list[dict[str, Any]]) -> None:
+        for item in items:
+            self._file.write(json.dumps(item) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetResultWriter:
+    """Writes all items at the end. Requires the optional `pyarrow` package."""
+
+    def __init__(self, path: str) -> None:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError("Parquet output requires pyarrow (uv sync --extra parquet)") from e
+        self.path = path
+        self._items: list[dict[str, Any]] = []
+
+    def write(self, items: list[dict[str, Any]]) -> None:
+        self._items.extend(items)
+
+    def close(self) -> None:
+        import pyarrow
+        import pyarrow.parquet
+
+        self._items.sort(key=lambda item: item["index"])
+        pyarrow.parquet.write_table(pyarrow.Table.from_pylist(self._items), self.path)
+
+
+async def persist_results(
+    items: list[dict[str, Any]], predictions: list[PredictionItem], endpoint_label: str
+) -> UUID:
+    """
+    Stores the evaluated predictions in the results database as a completed job, so they show up
+    in the API (leaderboard, comparison, exports). Predictions for unknown instances are left out.
+    """
+    # Imported here so evaluating to a file never needs the results database
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from db.session import engine, init_db
+    from models.models import BenchmarkResult
+    from services.benchmark_service import create_job, refresh_job_breakdown
+    from services.instances import sync_instances
+    from services.result_writer import ResultWriter
+
+    await init_db()
+    async_session = async_sessionmaker(engine, expire_on_commit=False)
+    try:
+        async with async_session() as session:
+            await sync_instances(session)
+            job = await create_job(session, endpoint_label)
+            async with ResultWriter(session) as writer:
+                for item in items:
+                    instance = get_instance(item["instance_id"])
+                    if instance is None:
+                        continue
+                    await writer.add(
+                        BenchmarkResult(
+                            job_id=job.id,
+                            instance_id=item["instance_id"],
+                            database_name=instance.get("selected_database", ""),
+                            category=instance.get("category"),
+                            generated_sql=predictions[item["index"]].generated_sql,
+                            is_correct=item["is_correct"],
+                            error=item["error"],
+                            error_class=item["error_class"],
+                        )
+                    )
+            await refresh_job_breakdown(session, job.id)
+            job.status = "completed"
+            job.updated_at = datetime.now(UTC)
+            await session.commit()
+            return job.id
+    finally:
+        await engine.dispose()
@@ -0,0 +1,162 @@
+import asyncio
+import contextlib
+import time
+from types import TracebackType
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import col
+
+from config import settings
+from models.models import EXECUTION_ERROR_CLASSES, BenchmarkJobSummary, BenchmarkResult
+from services import metrics
+from services.job_events import error_summary, job_events
+
+SUMMARY_FIELDS = ("total", "correct", "execution_error", "wrong_result", "total_latency_ms")
+
+
+def summary_increment(result: BenchmarkResult) -> dict[str, Any]:
+    """Classifies a result the same way the aggregate stats query does."""
+    execution_error = result.error_class in EXECUTION_ERROR_CLASSES
+    return {
+        "total": 1,
+        "correct": int(bool(result.is_correct)),
+        "execution_error": int(execution_error),
+        "wrong_result": int(not execution_error and not result.is_correct),
+        "total_latency_ms": result.latency_ms or 0.0,
+    }
+
+
+class ResultWriter:
+    """
+    Buffers BenchmarkResult rows and writes them in batches, one transaction per flush.
+
+    A flush happens when `batch_size` rows are buffered, when `flush_interval` seconds have passed
+    since the last one, and when the writer is closed (also on failure). Results, and the job
+    summary, therefore become visible to readers at flush boundaries.
+    Results of a shard job also count for `parent_id`, whose subscribers get their progress too.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        batch_size: int | None = None,
+        flush_interval: float | None = None,
+        parent_id: UUID | None = None,
+    ):
+        self.session = session
+        self.parent_id = parent_id
+        self.batch_size = batch_size or settings.BENCHMARK_RESULT_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.BENCHMARK_RESULT_FLUSH_INTERVAL
+        self._buffer: list[BenchmarkResult] = []
+        self._lock = asyncio.Lock()
+        self._last_flush = time.monotonic()
+        self._ticker: asyncio.Task[None] | None = None
+
+    async def __aenter__(self) -> "ResultWriter":
+        self._ticker = asyncio.create_task(self._tick())
+        return self
+
+    async def __aexit__(
+        self, exc_type: type[BaseException] | None, exc: BaseException | None, tb: TracebackType | None
+    ) -> None:
+        if self._ticker:
+            self._ticker.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._ticker
+        if exc is None:
+            await self.flush()
+            return
+        # Keep whatever was evaluated before the failure, without masking the original error
+        try:
+            await self.session.rollback()
+            await self.flush()
+        except Exception as flush_error:
+            print(f"Failed to flush {len(self._buffer)} buffered results: {flush_error}")
+
+    async def add(self, result: BenchmarkResult) -> None:
+        async with self._lock:
+            self._buffer.append(result)
+            if len(self._buffer) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+                await self._flush_locked()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            await self._flush_locked()
+
+    async def _tick(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                await self.flush()
+
+    async def _flush_locked(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+
+        start = time.perf_counter()
+        rows = [result.model_dump(exclude={"id"}) for result in self._buffer]
+        # Results already stored for the same (job_id, instance_id) are skipped, e.g. when a job
+        # is resumed or taken over from a worker that was still finishing its last batch.
+        statement = (
+            pg_insert(BenchmarkResult)
+            .on_conflict_do_nothing(index_elements=["job_id", "instance_id"])
+            .returning(col(BenchmarkResult.id), col(BenchmarkResult.job_id), col(BenchmarkResult.instance_id))
+        )
+        inserted = {
+            (job_id, instance_id): result_id
+            for result_id, job_id, instance_id in await self.session.execute(statement, rows)
+        }
+        results = [r for r in self._buffer if (r.job_id, r.instance_id) in inserted]
+
+        increments: dict[UUID, dict[str, Any]] = {}
+        for result in results:
+            job_increment = increments.setdefault(result.job_id, dict.fromkeys(SUMMARY_FIELDS, 0))
+            for name, value in summary_increment(result).items():
+                job_increment[name] += value
+        totals = await self._update_summaries(increments) if settings.BENCHMARK_JOB_SUMMARY_ENABLED else {}
+        await self._publish_progress(results, increments, totals)
+
+        if inserted:
+            # Every result of the batch is charged an equal share of the time it took to write it.
+            # Only exported as a metric, since storing it per result would take another UPDATE per batch
+            metrics.observe_phase("persist", (time.perf_counter() - start) / len(inserted))
+            for result in results:
+                metrics.count_result(result.error_class)
+
+        await self.session.commit()
+        self._buffer.clear()
+
+    async def _update_summaries(self, increments: dict[UUID, dict[str, Any]]) -> dict[UUID, dict[str, Any]]:
+        """Adds the increments to the job summaries and returns the updated totals."""
+        totals = {}
+        for job_id, increment in increments.items():
+            # Jobs without a summary row (created while summaries were disabled) are left untouched
+            # and keep using the aggregate query, so a partial summary is never reported.
+            statement = (
+                update(BenchmarkJobSummary)
+                .where(col(BenchmarkJobSummary.job_id) == job_id)
+                .values({name: getattr(BenchmarkJobSummary, name) + value for name, value in increment.items()})
+                .returning(*(getattr(BenchmarkJobSummary, name) for name in SUMMARY_FIELDS))
+            )
+            row = (await self.session.execute(statement)).one_or_none()
+            if row is not None:
+                totals[job_id] = dict(zip(SUMMARY_FIELDS, row))
+        return totals
+
+    async def _publish_progress(
+        self, results: list[BenchmarkResult], increments: dict[UUID, dict[str, Any]], totals: dict[UUID, dict[str, Any]]
+    ) -> None:
+        for job_id, increment in increments.items():
+            errors = [
+                error_summary(r.instance_id, r.error_class, r.error) for r in results if r.job_id == job_id and r.error
+            ]
+            event = {"type": "progress", "increment": increment, "totals": totals.get(job_id), "errors": errors}
+            await job_events.publish(self.session, job_id, event)
+            if self.parent_id is not None:
+                # The parent has no summary of its own, so its subscribers add up the increments
+                await job_events.publish(self.session, self.parent_id, {**event, "totals": None})
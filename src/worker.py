@@ -0,0 +1,49 @@
+"""
+Standalone benchmark worker. Claims queued jobs from the results database and runs them.
+Start as many processes as needed, on any machine that can reach both databases.
+
+Usage (with `src` on PYTHONPATH):
+    python -m worker [--slots N] [--worker-id ID]
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+
+from config import settings
+from db.bench_engines import bench_engines
+from db.session import init_db
+from services import metrics
+from services.job_queue import work
+
+
+async def _run(worker_id: str, slots: int) -> None:
+    await init_db()
+    if metrics.setup():
+        metrics.start_http_server(settings.WORKER_METRICS_PORT)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    tasks = [asyncio.create_task(work(f"{worker_id}/{slot}", stop)) for slot in range(slots)]
+    await stop.wait()
+    # Cancelling in-flight jobs puts them back in the queue for another worker
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await bench_engines.dispose_all()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="worker", description="T2SQL benchmark job worker")
+    parser.add_argument("--slots", type=int, default=1, help="Number of jobs run concurrently by this process")
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+    args = parser.parse_args(argv)
+    asyncio.run(_run(args.worker_id, args.slots))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import json
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from config import settings
+from services.metadata_service import metadata_cache
+
+SCHEMA_DDL = """-- dump header
+CREATE TABLE "public"."Sites" (
+    site_id integer PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS readings (
+    site_id integer,
+    value numeric
+);
+"""
+
+
+@pytest.fixture
+def metadata_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    """A METADATA_PATH holding one database, `solar`, with two tables and two knowledge items."""
+    db_path = tmp_path / "solar"
+    db_path.mkdir()
+    (db_path / "solar_schema.txt").write_text(SCHEMA_DDL, encoding="utf-8")
+    meanings = {
+        "solar|sites|site_id": "Site identifier",
+        "solar|readings|site_id": "Site the reading belongs to",
+        "solar|readings|value": {"column_meaning": "Measured output"},
+    }
+    (db_path / "solar_column_meaning_base.json").write_text(json.dumps(meanings), encoding="utf-8")
+    knowledge = [
+        {"id": 1, "knowledge": "Yield", "description": "Output per site", "definition": "SUM(value)", "type": "metric"},
+        {"id": 2, "knowledge": "Site", "description": "A panel site", "definition": None, "type": "domain"},
+    ]
+    (db_path / "solar_kb.jsonl").write_text("\n".join(json.dumps(item) for item in knowledge), encoding="utf-8")
+
+    monkeypatch.setattr(settings, "METADATA_PATH", str(tmp_path))
+    metadata_cache.clear()
+    yield tmp_path
+    metadata_cache.clear()
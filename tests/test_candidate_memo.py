@@ -0,0 +1,54 @@
+import pytest
+
+from services.candidate_memo import fingerprint_sql, is_deterministic_error, normalize_sql, split_sql
+
+
+@pytest.mark.parametrize(
+    ("sql", "normalized"),
+    [
+        ("SELECT  *\n FROM t ;", "select * from t"),
+        ("select count( * ) from t where a in ( 1 , 2 )", "select count(*)from t where a in(1,2)"),
+        ("SELECT 1 -- trailing comment\n", "select 1"),
+        ("SELECT /* block\ncomment */ a FROM t", "select a from t"),
+        ("SELECT 'Mixed  Case' FROM \"Table  X\"", "select 'Mixed  Case' from \"Table  X\""),
+        ("SELECT $tag$ A  b $tag$", "select $tag$ A  b $tag$"),
+    ],
+)
+def test_normalize_sql(sql: str, normalized: str) -> None:
+    assert normalize_sql(sql) == normalized
+
+
+def test_normalize_sql_keeps_tokens_apart() -> None:
+    assert normalize_sql("SELECT a\nFROM t") != normalize_sql("SELECT aFROM t")
+    assert normalize_sql("SELECT 'a' || 'b'") == "select 'a' || 'b'"
+
+
+def test_fingerprint_sql_ignores_formatting_only() -> None:
+    assert fingerprint_sql("SELECT a FROM t;") == fingerprint_sql("select a\n  from t -- done")
+    assert fingerprint_sql("SELECT 'A' FROM t") != fingerprint_sql("SELECT 'a' FROM t")
+
+
+@pytest.mark.parametrize(
+    ("sqlstate", "deterministic"),
+    [
+        ("42P01", True),
+        ("22012", True),
+        ("21000", True),
+        ("25006", True),
+        ("57014", False),
+        ("40P01", False),
+        (None, False),
+    ],
+)
+def test_is_deterministic_error(sqlstate: str | None, deterministic: bool) -> None:
+    assert is_deterministic_error(sqlstate) is deterministic
+
+
+def test_split_sql_on_top_level_semicolons() -> None:
+    script = "INSERT INTO t VALUES (';');UPDATE \"a;b\" SET x = 1; -- done; really\n; SELECT $f$a;b$f$ /* ; */;"
+    assert split_sql(script) == ["INSERT INTO t VALUES (';')", 'UPDATE "a;b" SET x = 1', "SELECT $f$a;b$f$ /* ; */"]
+
+
+def test_split_sql_drops_empty_statements() -> None:
+    assert split_sql("SELECT 1") == ["SELECT 1"]
+    assert split_sql(" ; -- nothing\n;") == []
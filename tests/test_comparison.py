@@ -0,0 +1,80 @@
+import math
+from decimal import Decimal
+
+import pytest
+
+from services.comparison import ResultDigest, canonical_value, compare_digests
+
+
+def digest(rows: list[tuple[object, ...]], float_places: int = 6) -> ResultDigest:
+    result = ResultDigest(column_count=len(rows[0]) if rows else 0)
+    for row in rows:
+        result.add(row, float_places)
+    return result
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        (1, 1.0, Decimal("1"), Decimal("1.000")),
+        (0.1, Decimal("0.1"), Decimal("0.1000000")),
+        (0, 0.0, -0.0, Decimal("-0.0000001")),
+        (2.5000001, Decimal("2.5000001")),
+    ],
+)
+def test_canonical_value_treats_equal_numbers_alike(values: tuple[object, ...]) -> None:
+    assert len({canonical_value(value, 6) for value in values}) == 1
+
+
+def test_canonical_value_keeps_large_numbers_exact() -> None:
+    big = 12345678901234567890
+    assert canonical_value(big, 6) == canonical_value(Decimal(big), 6) == "12345678901234567890"
+    assert canonical_value(big, 6) != canonical_value(big + 1, 6)
+    assert canonical_value(Decimal("12345678901234567.125"), 2) == "12345678901234567.12"
+
+
+def test_canonical_value_rounds_at_float_places() -> None:
+    assert canonical_value(Decimal("0.1234576"), 6) != canonical_value(0.1234574, 6)
+    assert canonical_value(1.23456789, 2) == canonical_value(Decimal("1.23"), 2) == "1.23"
+
+
+def test_canonical_value_non_finite() -> None:
+    assert canonical_value(math.nan, 6) == canonical_value(Decimal("NaN"), 6)
+    assert canonical_value(math.inf, 6) == canonical_value(Decimal("Infinity"), 6)
+    assert canonical_value(math.inf, 6) != canonical_value(-math.inf, 6)
+
+
+def test_canonical_value_distinguishes_types() -> None:
+    assert canonical_value(True, 6) != canonical_value(1, 6)
+    assert canonical_value(None, 6) != canonical_value("None", 6)
+    assert canonical_value("1", 6) != canonical_value(1, 6)
+
+
+def test_canonical_value_nested_values() -> None:
+    assert canonical_value({"b": 1, "a": [1.0, None]}, 6) == canonical_value({"a": (1, None), "b": Decimal("1")}, 6)
+    assert canonical_value([1, 2], 6) != canonical_value([2, 1], 6)
+
+
+def test_compare_digests_ignores_row_order() -> None:
+    expected = digest([(1, "a"), (2, "b"), (2, "b")])
+    generated = digest([(2, "b"), (1.0, "a"), (Decimal(2), "b")])
+    assert compare_digests(expected, generated).is_equal
+
+
+def test_compare_digests_counts_duplicates() -> None:
+    result = compare_digests(digest([(1,), (1,), (2,)]), digest([(1,), (2,), (2,)]))
+    assert not result.is_equal
+    assert result.reason == "Row values differ"
+
+
+def test_compare_digests_reports_shape_differences() -> None:
+    rows = compare_digests(digest([(1,)]), digest([(1,), (1,)]))
+    assert not rows.is_equal and rows.reason == "Row count differs: expected 1, got 2"
+    columns = compare_digests(digest([(1,)]), digest([(1, 2)]))
+    assert not columns.is_equal and columns.reason == "Column count differs: expected 1, got 2"
+    assert compare_digests(ResultDigest(column_count=1), ResultDigest(column_count=3)).is_equal
+
+
+def test_compare_digests_rejects_truncated() -> None:
+    with pytest.raises(ValueError):
+        compare_digests(ResultDigest(truncated=True), ResultDigest())
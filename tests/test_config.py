@@ -0,0 +1,16 @@
+import pytest
+from pydantic import ValidationError
+
+from config import Settings
+
+
+def test_default_row_caps_leave_room_for_sql_comparison() -> None:
+    defaults = Settings()
+    assert defaults.COMPARISON_MAX_ROWS < defaults.QUERY_MAX_ROWS
+
+
+def test_comparison_cap_must_be_below_query_cap(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("COMPARISON_MAX_ROWS", "100")
+    monkeypatch.setenv("QUERY_MAX_ROWS", "100")
+    with pytest.raises(ValidationError, match="COMPARISON_MAX_ROWS"):
+        Settings()
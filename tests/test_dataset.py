@@ -0,0 +1,63 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from services.dataset import DatasetStore, select_instances
+
+INSTANCES = [
+    ("a1", "alpha", "Query"),
+    ("b1", "beta", "Management"),
+    ("a2", "alpha", "Management"),
+    ("b2", "beta", "Query"),
+    ("a3", "alpha", "Query"),
+]
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> DatasetStore:
+    input_path = tmp_path / "input.jsonl"
+    gt_path = tmp_path / "gt.jsonl"
+    input_path.write_text(
+        "\n".join(
+            json.dumps({"instance_id": instance_id, "selected_database": database, "category": category})
+            for instance_id, database, category in INSTANCES
+        )
+    )
+    # Instances without ground truth are not part of the dataset
+    gt_path.write_text(
+        "\n".join(json.dumps({"instance_id": instance_id, "sol_sql": ["SELECT 1"]}) for instance_id, *_ in INSTANCES)
+    )
+    return DatasetStore(str(input_path), str(gt_path))
+
+
+def ids(items: list[dict[str, object]]) -> list[str]:
+    return [str(item["instance_id"]) for item in items]
+
+
+def test_select_instances_without_filters(store: DatasetStore) -> None:
+    assert ids(select_instances(store)) == ["a1", "b1", "a2", "b2", "a3"]
+
+
+def test_select_instances_keeps_dataset_order(store: DatasetStore) -> None:
+    assert ids(select_instances(store, instance_ids=["a3", "b1", "a3", "missing"])) == ["b1", "a3"]
+    assert ids(select_instances(store, databases=["beta", "alpha"])) == ["a1", "b1", "a2", "b2", "a3"]
+
+
+def test_select_instances_combines_filters(store: DatasetStore) -> None:
+    assert ids(select_instances(store, databases=["alpha"], categories=["Query"])) == ["a1", "a3"]
+    assert ids(select_instances(store, instance_ids=["a1", "b1", "b2"], databases=["beta"])) == ["b1", "b2"]
+    assert ids(select_instances(store, instance_ids=["a1", "a2"], categories=["Management"])) == ["a2"]
+
+
+def test_select_instances_sample_is_stable(store: DatasetStore) -> None:
+    first = ids(select_instances(store, sample_size=3, sample_seed=7))
+    assert len(first) == 3
+    assert first == ids(select_instances(store, sample_size=3, sample_seed=7))
+    assert set(first) <= {instance_id for instance_id, *_ in INSTANCES}
+    assert len(select_instances(store, sample_size=10)) == len(INSTANCES)
+
+
+def test_select_instances_shards_partition_the_dataset(store: DatasetStore) -> None:
+    shards = [ids(select_instances(store, shard_index=index, num_shards=3)) for index in range(3)]
+    assert sorted(instance_id for shard in shards for instance_id in shard) == sorted(ids(select_instances(store)))
@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import exc
+
+from models.models import ErrorClass
+from services import evaluation
+from services.comparison import ResultDigest
+from services.evaluation import QueryError, candidate_error_class, execute_candidate, query_error
+
+
+class DriverError(Exception):
+    def __init__(self, sqlstate: str) -> None:
+        super().__init__(f"error {sqlstate}")
+        self.sqlstate = sqlstate
+
+
+def wrapped(sqlstate: str) -> exc.DBAPIError:
+    return exc.DBAPIError("SELECT 1", None, DriverError(sqlstate))
+
+
+@pytest.mark.parametrize(
+    ("error", "error_class"),
+    [
+        (wrapped("42P01"), ErrorClass.EXECUTION),
+        (wrapped("57014"), ErrorClass.TIMEOUT),
+        (TimeoutError(), ErrorClass.TIMEOUT),
+        (wrapped("55P03"), ErrorClass.HARNESS),
+        (wrapped("40P01"), ErrorClass.HARNESS),
+        (exc.TimeoutError("QueuePool limit reached"), ErrorClass.HARNESS),
+    ],
+)
+def test_candidate_error_class(error: Exception, error_class: ErrorClass) -> None:
+    assert candidate_error_class(query_error(error)) == error_class
+
+
+def test_query_error_finds_the_driver_sqlstate() -> None:
+    error = query_error(wrapped("22012"))
+    assert error.sqlstate == "22012"
+    assert not error.timed_out and not error.harness
+
+
+async def test_execute_candidate_without_memo_always_executes(monkeypatch: pytest.MonkeyPatch) -> None:
+    executed = []
+
+    async def digest_query(database_name: str, query: str) -> tuple[ResultDigest | None, QueryError | None]:
+        executed.append((database_name, query))
+        return ResultDigest(row_count=1, column_count=1), None
+
+    async def unreachable(*args: object) -> None:
+        raise AssertionError("the memo must not be consulted")
+
+    monkeypatch.setattr(evaluation, "digest_query", digest_query)
+    monkeypatch.setattr(evaluation.candidate_memo, "get", unreachable)
+    monkeypatch.setattr(evaluation.candidate_memo, "put", unreachable)
+    digest, error = await execute_candidate("solar", "SELECT 1", None)
+    assert error is None and digest is not None and digest.row_count == 1
+    assert executed == [("solar", "SELECT 1")]
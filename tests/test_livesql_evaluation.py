@@ -0,0 +1,28 @@
+import pytest
+
+from models.models import ErrorClass
+from services.livesql_evaluation import _normalize, evaluate_livesql
+
+INSTANCE = {"selected_database": "solar", "sol_sql": ["SELECT 1"]}
+
+
+@pytest.mark.parametrize(
+    "sql", ["COMMIT", "UPDATE t SET a = 1; COMMIT", "DELETE FROM t;\n/* then */ begin", "SELECT 1; ROLLBACK;"]
+)
+async def test_transaction_control_is_rejected_in_any_statement(sql: str) -> None:
+    verdict = await evaluate_livesql(INSTANCE, sql)
+    assert not verdict.is_correct
+    assert verdict.error_class == ErrorClass.EXECUTION
+    assert verdict.error is not None and "transaction control" in verdict.error
+
+
+async def test_empty_candidate_is_an_execution_error() -> None:
+    verdict = await evaluate_livesql(INSTANCE, " ; -- nothing")
+    assert verdict.error_class == ErrorClass.EXECUTION
+
+
+def test_normalize_conditions() -> None:
+    rows = [(2, "b"), (1.0000001, "a"), (2, "b")]
+    assert _normalize(rows, {}) == sorted(_normalize(rows, {"order": True}))
+    assert len(_normalize(rows, {"distinct": True})) == 2
+    assert _normalize([(1.04,)], {"decimal": 1}) == _normalize([(1,)], {"decimal": 1})
@@ -0,0 +1,35 @@
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.metadata import router
+
+
+@pytest.fixture
+def client(metadata_dir: Path) -> TestClient:
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_kb_ids_accept_repeated_and_comma_separated(client: TestClient) -> None:
+    response = client.get("/metadata/solar", params=[("fields", "knowledge_base"), ("kb_ids", "2,1"), ("kb_ids", "7")])
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()["knowledge_base"]] == [1, 2]
+
+
+def test_invalid_kb_ids_are_rejected(client: TestClient) -> None:
+    response = client.get("/metadata/solar", params={"kb_ids": "1,two"})
+    assert response.status_code == 422
+    assert "two" in response.json()["detail"]
+
+
+def test_unknown_fields_are_rejected(client: TestClient) -> None:
+    assert client.get("/metadata/solar", params={"fields": "schema_ddl,indexes"}).status_code == 422
+
+
+def test_etag_revalidation(client: TestClient) -> None:
+    etag = client.get("/metadata/solar").headers["ETag"]
+    assert client.get("/metadata/solar", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
@@ -0,0 +1,60 @@
+import json
+from pathlib import Path
+
+from services.metadata_service import _split_ddl, get_metadata_projection, list_tables
+
+
+def test_split_ddl_blocks_per_table() -> None:
+    preamble, blocks = _split_ddl(
+        'SET search_path = public;\nCREATE TABLE a (x int);\ncreate table if not exists "S"."B" (y int);\n'
+    )
+    assert preamble == "SET search_path = public;\n"
+    assert blocks == {"a": "CREATE TABLE a (x int);\n", "b": 'create table if not exists "S"."B" (y int);\n'}
+
+
+def test_split_ddl_without_tables() -> None:
+    assert _split_ddl("-- nothing here\n") == ("-- nothing here\n", {})
+
+
+def test_list_tables(metadata_dir: Path) -> None:
+    assert list_tables("solar") == ["sites", "readings"]
+
+
+def test_projection_of_requested_fields(metadata_dir: Path) -> None:
+    body = json.loads(get_metadata_projection("solar", fields=["knowledge_base"]).body)
+    assert set(body) == {"database_name", "knowledge_base"}
+    assert [item["id"] for item in body["knowledge_base"]] == [1, 2]
+
+
+def test_projection_restricted_to_tables(metadata_dir: Path) -> None:
+    body = json.loads(
+        get_metadata_projection("solar", fields=["schema_ddl", "column_meanings"], tables=["READINGS"]).body
+    )
+    assert body["schema_ddl"].startswith("CREATE TABLE IF NOT EXISTS readings")
+    assert "Sites" not in body["schema_ddl"]
+    assert [meaning["column_name"] for meaning in body["column_meanings"]] == ["site_id", "value"]
+
+
+def test_projection_columnar(metadata_dir: Path) -> None:
+    body = json.loads(get_metadata_projection("solar", fields=["column_meanings"], columnar=True).body)
+    assert body["column_meanings"] == {
+        "table_name": ["sites", "readings", "readings"],
+        "column_name": ["site_id", "site_id", "value"],
+        "description": ["Site identifier", "Site the reading belongs to", "Measured output"],
+    }
+
+
+def test_projection_restricted_to_kb_ids(metadata_dir: Path) -> None:
+    body = json.loads(get_metadata_projection("solar", fields=["knowledge_base"], kb_ids=[2, 5]).body)
+    assert [item["id"] for item in body["knowledge_base"]] == [2]
+
+
+def test_projection_is_memoized(metadata_dir: Path) -> None:
+    first = get_metadata_projection("solar", tables=["sites"])
+    assert get_metadata_projection("solar", tables=["SITES", "sites"]) is first
+    assert first.etag != get_metadata_projection("solar", tables=["readings"]).etag
+
+
+def test_projection_keeps_nested_nulls(metadata_dir: Path) -> None:
+    body = json.loads(get_metadata_projection("solar", fields=["knowledge_base"], kb_ids=[2]).body)
+    assert body["knowledge_base"][0]["definition"] is None
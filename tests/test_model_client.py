@@ -0,0 +1,68 @@
+import asyncio
+import time
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from services.model_client import TokenBucket, parse_batch_sql, retry_after_seconds
+
+
+def response(content: object = None, headers: dict[str, str] | None = None) -> httpx.Response:
+    if isinstance(content, str):
+        return httpx.Response(200, text=content, headers=headers)
+    return httpx.Response(200, json=content, headers=headers)
+
+
+async def test_token_bucket_allows_burst_then_waits() -> None:
+    bucket = TokenBucket(rate=20, burst=2)
+    started = time.monotonic()
+    await bucket.acquire()
+    await bucket.acquire()
+    assert time.monotonic() - started < 0.04
+    await bucket.acquire()
+    assert time.monotonic() - started >= 0.04
+
+
+async def test_token_bucket_serializes_waiters() -> None:
+    bucket = TokenBucket(rate=50, burst=1)
+    started = time.monotonic()
+    await asyncio.gather(*(bucket.acquire() for _ in range(4)))
+    # One token is available up front and the other three arrive 20ms apart
+    assert time.monotonic() - started >= 0.05
+
+
+def test_token_bucket_capacity_is_at_least_one() -> None:
+    assert TokenBucket(rate=1, burst=0).capacity == 1
+
+
+@pytest.mark.parametrize(("value", "seconds"), [("3", 3.0), ("0.5", 0.5), ("-2", 0.0), ("soon", None)])
+def test_retry_after_seconds(value: str, seconds: float | None) -> None:
+    assert retry_after_seconds(response({}, {"Retry-After": value})) == seconds
+
+
+def test_retry_after_seconds_http_date() -> None:
+    later = format_datetime(datetime.now(UTC) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= (retry_after_seconds(response({}, {"Retry-After": later})) or 0) <= 30
+    earlier = format_datetime(datetime.now(UTC) - timedelta(seconds=30), usegmt=True)
+    assert retry_after_seconds(response({}, {"Retry-After": earlier})) == 0.0
+
+
+def test_retry_after_seconds_missing() -> None:
+    assert retry_after_seconds(response({})) is None
+
+
+@pytest.mark.parametrize(
+    ("content", "answers"),
+    [
+        (["SELECT 1", "SELECT 2"], ["SELECT 1", "SELECT 2"]),
+        ({"sql": ["SELECT 1"]}, ["SELECT 1"]),
+        ({"results": [{"sql": "SELECT 1"}, {"generated_sql": "SELECT 2"}]}, ["SELECT 1", "SELECT 2"]),
+        ({"sql": "SELECT 1"}, None),
+        ({"other": []}, None),
+        ("not json", None),
+    ],
+)
+def test_parse_batch_sql(content: object, answers: list[str] | None) -> None:
+    assert parse_batch_sql(response(content)) == answers